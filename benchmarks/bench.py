@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+'''
+Micro-benchmarks for the menu, help text, localisation and config round-trip paths.
+
+    python benchmarks/bench.py                      # compare against benchmarks/baseline.json
+    python benchmarks/bench.py --update-baseline    # record new baseline numbers
+    python benchmarks/bench.py -k menu              # only run benchmarks whose name contains "menu"
+
+Exits with status 1 if any benchmark is slower than its baseline by more than --threshold.
+'''
+
+import argparse
+import atexit
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(bench_dir, os.pardir))
+sys.path.insert(0, parent_dir)
+
+from meshtastic.protobuf import config_pb2, module_config_pb2
+
+from ui.control_ui import get_wrapped_help_text, help_text, layout_help_text
+from ui.default_config import format_json_single_line_arrays, loaded_config
+from ui.menus import generate_menu_from_protobuf, extract_fields
+from utilities.config_io import config_export, config_import, export_config
+from utilities.control_utils import parse_ini_file
+from utilities.localisation import load_catalogue
+from utilities.mock_interface import MockInterface
+
+baseline_file = os.path.join(bench_dir, "baseline.json")
+translation_file = os.path.join(parent_dir, "localisations", "en.ini")
+
+
+def expand_menu(menu):
+    """Open every submenu so lazily built levels are included in the measurement."""
+    if isinstance(menu, dict):
+        for key in menu:
+            expand_menu(menu[key])
+
+
+def bench_generate_menu(interface):
+    return lambda: generate_menu_from_protobuf(interface)
+
+
+def bench_generate_menu_expanded(interface):
+    return lambda: expand_menu(generate_menu_from_protobuf(interface))
+
+
+def bench_extract_fields_config(interface):
+    return lambda: expand_menu(extract_fields(config_pb2.Config(), interface.localNode.localConfig))
+
+
+def bench_extract_fields_module_config(interface):
+    return lambda: expand_menu(extract_fields(module_config_pb2.ModuleConfig(), interface.localNode.moduleConfig))
+
+
+def bench_config_export(interface):
+    return lambda: config_export(interface)
+
+
+def bench_config_export_protobuf(interface):
+    return lambda: export_config(interface, io.BytesIO(), "protobuf")
+
+
+def bench_config_import(interface):
+    fd, profile = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(config_export(interface))
+    atexit.register(os.remove, profile)
+    return lambda: config_import(interface, profile)
+
+
+def bench_config_import_protobuf(interface):
+    fd, profile = tempfile.mkstemp(suffix=".pb")
+    with os.fdopen(fd, "wb") as file:
+        export_config(interface, file, "protobuf")
+    atexit.register(os.remove, profile)
+    return lambda: config_import(interface, profile)
+
+
+def bench_parse_ini_file(interface):
+    return lambda: parse_ini_file(translation_file)
+
+
+def bench_load_catalogue(interface):
+    return lambda: load_catalogue("en")
+
+
+def bench_wrapped_help_text(interface):
+    # The longest help entry is the worst case for every cursor move
+    key = max(help_text, key=lambda k: len(help_text[k]))
+    path, option = key.split(".")[:-1], key.split(".")[-1]
+    return lambda: get_wrapped_help_text(help_text, path, option, 80, 6)
+
+
+def bench_wrapped_help_text_uncached(interface):
+    key = max(help_text, key=lambda k: len(help_text[k]))
+    path, option = key.split(".")[:-1], key.split(".")[-1]
+
+    def run():
+        layout_help_text.cache_clear()
+        get_wrapped_help_text(help_text, path, option, 80, 6)
+    return run
+
+
+def bench_format_json(interface):
+    return lambda: format_json_single_line_arrays(loaded_config)
+
+
+benchmarks = {
+    "generate_menu_from_protobuf": bench_generate_menu,
+    "generate_menu_from_protobuf[expanded]": bench_generate_menu_expanded,
+    "extract_fields[Config]": bench_extract_fields_config,
+    "extract_fields[ModuleConfig]": bench_extract_fields_module_config,
+    "config_export": bench_config_export,
+    "config_export[protobuf]": bench_config_export_protobuf,
+    "config_import": bench_config_import,
+    "config_import[protobuf]": bench_config_import_protobuf,
+    "parse_ini_file": bench_parse_ini_file,
+    "load_catalogue": bench_load_catalogue,
+    "get_wrapped_help_text": bench_wrapped_help_text,
+    "get_wrapped_help_text[uncached]": bench_wrapped_help_text_uncached,
+    "format_json_single_line_arrays": bench_format_json,
+}
+
+
+def measure(func, min_time=0.2, repeats=5):
+    """Return the median seconds per call over several timed batches."""
+    func()  # Warm up caches and lazy imports
+
+    # Size each batch so it runs for roughly min_time / repeats
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeats:
+            break
+        number *= 2
+
+    samples = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def load_baseline():
+    if not os.path.exists(baseline_file):
+        return {}
+    with open(baseline_file, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(results):
+    with open(baseline_file, "w", encoding="utf-8") as file:
+        json.dump({name: round(seconds, 9) for name, seconds in sorted(results.items())}, file, indent=4)
+        file.write("\n")
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds * 1e6:9.2f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("-k", dest="filter", help="Only run benchmarks whose name contains this string.")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to benchmarks/baseline.json.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Fail when a benchmark exceeds baseline by this factor (default 1.5).")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Approximate seconds to spend timing each benchmark.")
+    args = parser.parse_args()
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+
+    print(f"{'BENCHMARK':<40} {'TIME':>12} {'BASELINE':>12} {'RATIO':>7}")
+    for name, setup in benchmarks.items():
+        if args.filter and args.filter not in name:
+            continue
+        func = setup(MockInterface(seed=0))
+        seconds = measure(func, min_time=args.min_time)
+        results[name] = seconds
+
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            flag = "  REGRESSION" if ratio > args.threshold else ""
+            print(f"{name:<40} {format_time(seconds)} {format_time(baseline[name])} {ratio:6.2f}x{flag}")
+            if flag:
+                regressions.append(name)
+        else:
+            print(f"{name:<40} {format_time(seconds)} {'-':>12} {'-':>7}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        save_baseline(baseline)
+        print(f"Baseline written to {baseline_file}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than {args.threshold}x baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+'''
+Import-time profile of the startup paths, measured with `python -X importtime` in fresh interpreters.
+
+    python benchmarks/import_time.py                # profile every scenario
+    python benchmarks/import_time.py -k help        # only scenarios whose name contains "help"
+    python benchmarks/import_time.py --budget 50    # also fail if a scenario imports for longer than 50 ms
+
+Each scenario lists modules it must not import: `--help` must not load meshtastic or read
+config.json, the splash must go up before meshtastic loads, and a TCP session must not load
+the BLE stack or yaml. Exits with status 1 if a scenario imports one of them or is over budget.
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(bench_dir, os.pardir))
+
+# name: (interpreter arguments, modules that must not be imported)
+scenarios = {
+    "interpreter": (["-c", "pass"], []),  # What every run pays before main.py imports anything
+    "--help": (["main.py", "--help"], ["meshtastic", "google.protobuf", "yaml", "ui.default_config"]),
+    "splash": (["-c", "import main, ui.colors, ui.splash"], ["meshtastic", "google.protobuf", "yaml"]),
+    "session[tcp]": (
+        ["-c", "import main, ui.control_ui, utilities.loader, utilities.node_cache, meshtastic.tcp_interface"],
+        ["meshtastic.ble_interface", "bleak", "yaml"],
+    ),
+}
+
+
+def profile(arguments):
+    """
+    Run one interpreter with -X importtime.
+    :return: {module: (self us, cumulative us)} for every module it imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments],
+        cwd=parent_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def forbidden_imports(modules, forbidden):
+    return sorted(name for name in modules if any(name == f or name.startswith(f + ".") for f in forbidden))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the import time of the startup paths.")
+    parser.add_argument("-k", dest="filter", help="Only run scenarios whose name contains this string.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per scenario; the median is reported.")
+    parser.add_argument("--top", type=int, default=8, help="How many of the slowest imports to list per scenario.")
+    parser.add_argument("--budget", type=float, default=None, help="Fail when a scenario's imports take longer than this many ms.")
+    args = parser.parse_args()
+
+    failures = []
+    for name, (arguments, forbidden) in scenarios.items():
+        if args.filter and args.filter not in name:
+            continue
+        runs = [profile(arguments) for _ in range(args.repeats)]
+        total_ms = statistics.median(sum(s for s, _ in run.values()) for run in runs) / 1e3
+        modules = runs[-1]
+
+        print(f"{name:<20} {total_ms:8.1f} ms  {len(modules)} modules")
+        slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for module, (self_us, cumulative_us) in slowest:
+            print(f"    {module:<44} {self_us / 1e3:7.1f} ms self {cumulative_us / 1e3:8.1f} ms total")
+
+        leaked = forbidden_imports(modules, forbidden)
+        if leaked:
+            print(f"    imports {', '.join(leaked[:5])}{' ...' if len(leaked) > 5 else ''}")
+            failures.append(name)
+        elif args.budget is not None and total_ms > args.budget:
+            print(f"    over the {args.budget:.0f} ms budget")
+            failures.append(name)
+
+    if failures:
+        print(f"{len(failures)} scenario(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,37 +13,88 @@ import logging
 import sys
 import traceback
 
-import ui.default_config as config
-from utilities.input_handlers import get_list_input
-from ui.colors import setup_colors
-from ui.splash import draw_splash
-from ui.control_ui import set_region, settings_menu
 from utilities.arg_parser import setup_parser
-from utilities.interfaces import initialize_interface
+
+# Everything else is imported where it is first needed: `--help` touches neither config.json
+# nor meshtastic, and the splash is on screen before the meshtastic and protobuf modules load.
+# Run benchmarks/import_time.py after changing what gets imported at startup.
 
 
 def main(stdscr):
     output_capture = io.StringIO()
     try:
         with contextlib.redirect_stdout(output_capture), contextlib.redirect_stderr(output_capture):   
+            from ui.colors import setup_colors
+            from ui.splash import draw_splash, wait_on_splash
             setup_colors()
             draw_splash(stdscr)
+
+            from ui.control_ui import set_language, set_region, settings_menu
+            from utilities.input_handlers import get_list_input
+            from utilities.interfaces import reconnect_after_write, remembered_node_id, transport_from_args
+            from utilities.loader import BackgroundConnection
+            from utilities.node_cache import CachedInterface, load_snapshot, save_snapshot
             curses.curs_set(0)
             stdscr.keypad(True)
 
             parser = setup_parser()
             args = parser.parse_args()
-            interface = initialize_interface(args)
-
-            if interface.localNode.localConfig.lora.region == 0:
-                confirmation = get_list_input("Your region is UNSET.  Set it now?", "Yes",  ["Yes", "No"])
-                if confirmation == "Yes":
-                    set_region(interface)
-                    interface.close()
-                    interface = initialize_interface(args)
+            if args.lang:
+                set_language(args.lang)
+            if args.dashboard:
+                from ui.dashboard import run_dashboard
+                run_dashboard(stdscr, args)
+                return
+            # Connect and download the config on a worker thread while the UI keeps drawing
+            connection = BackgroundConnection(args)
+
+            # Draw the menu straight from the last snapshot of this node if there is one
+            snapshot = None if args.dest else load_snapshot(remembered_node_id(transport_from_args(args)))
+            cached_interface = CachedInterface(snapshot) if snapshot else None
+
+            if cached_interface and cached_interface.localNode.localConfig.lora.region != 0:
+                interface = cached_interface
+            else:
+                # Leave the splash as soon as the node's own info and LoRa config have landed
+                wait_on_splash(stdscr, connection, lambda: connection.usable_interface() is not None and connection.progress.has("config.lora"))
+                interface = connection.interface or connection.usable_interface()
+                if interface is None:
+                    logging.critical("Could not connect to a node")
+                    return
+
+                if interface.localNode.localConfig.lora.region == 0:
+                    wait_on_splash(stdscr, connection, lambda: False)  # Finish the download before writing to the node
+                    interface = connection.interface
+                    if interface is None:
+                        logging.critical("Lost the node while downloading its config")
+                        return
+                    confirmation = get_list_input("Your region is UNSET.  Set it now?", "Yes",  ["Yes", "No"])
+                    if confirmation == "Yes":
+                        set_region(interface)
+                        interface = reconnect_after_write(interface, args, ["lora"])
+                if connection.done.is_set():
+                    save_snapshot(interface)
+                    connection = None
+
+            if args.dest:
+                # The connected node only relays; fetch the remote node's config in the background
+                from utilities.remote import RemoteConnection
+                if connection is not None:
+                    wait_on_splash(stdscr, connection, lambda: False)
+                    interface = connection.interface
+                    if interface is None:
+                        logging.critical("Lost the node while downloading its config")
+                        return
+                try:
+                    connection = RemoteConnection(interface, args.dest, args.admin_interval)
+                except ValueError as ex:
+                    logging.critical(f"Can't administer {args.dest}: {ex}")
+                    return
+                interface = connection.interface
             stdscr.clear()
             stdscr.refresh()
-            settings_menu(stdscr, interface)
+            interface = settings_menu(stdscr, interface, connection, watch=args.watch)
+            save_snapshot(interface)
 
     except Exception as e:
         console_output = output_capture.getvalue()
@@ -53,13 +104,44 @@ def main(stdscr):
         raise
 
 
-logging.basicConfig( # Run `tail -f client.log` in another terminal to view live
-    filename=config.log_file_path,
-    level=logging.WARNING,  # DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+def setup_logging():
+    import ui.default_config as config
+    logging.basicConfig( # Run `tail -f client.log` in another terminal to view live
+        filename=config.log_file_path,
+        level=logging.WARNING,  # DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    return config
+
 
 if __name__ == "__main__":
+    parser = setup_parser()
+    args = parser.parse_args()
+    if args.dry_run and not (args.validate or args.provision or args.restore):
+        parser.error("--dry-run only works with --validate, --provision or --restore")
+    config = setup_logging()
+    if args.validate or (args.provision and args.dry_run):
+        from utilities.config_validate import run_validation
+        sys.exit(run_validation(args.validate or [args.provision], dry_run=args.dry_run))
+    if args.provision:
+        from utilities.fleet import run_provisioning
+        sys.exit(run_provisioning(args))
+    if args.export:
+        from utilities.config_io import run_export
+        sys.exit(run_export(args))
+    if args.drift:
+        from utilities.drift import run_drift
+        sys.exit(run_drift(args))
+    if args.backup:
+        from utilities.backup import run_backup
+        sys.exit(run_backup(args))
+    if args.restore:
+        from utilities.backup import run_restore
+        sys.exit(run_restore(args))
+    if args.dashboard and not (args.ports or args.hosts):
+        print("No targets given. Use --ports and/or --hosts with --dashboard.")
+        sys.exit(2)
+
     log_file = config.log_file_path
     log_f = open(log_file, "a", buffering=1)  # Enable line-buffering for immediate log writes
 
@@ -0,0 +1,21 @@
+from utilities.config_validate import validate_configuration
+
+
+def errors_for(configuration):
+    errors, _ = validate_configuration(configuration)
+    return dict(errors)
+
+
+def test_bad_base64_bytes_value_is_a_validation_error():
+    errors = errors_for({"config": {"security": {"publicKey": "base64:abc"}}})
+    assert "can not be set to 'base64:abc'" in errors["config.security.publicKey"]
+
+
+def test_bad_hex_bytes_value_is_a_validation_error():
+    errors = errors_for({"config": {"security": {"privateKey": "0xzz"}}})
+    assert "can not be set to '0xzz'" in errors["config.security.privateKey"]
+
+
+def test_unknown_enum_value_lists_the_choices():
+    errors = errors_for({"config": {"lora": {"region": "MARS"}}})
+    assert "Choices are:" in errors["config.lora.region"]
@@ -0,0 +1,191 @@
+import base64
+import binascii
+import curses
+import logging
+import os
+
+from meshtastic.protobuf import channel_pb2
+
+from ui.colors import get_color
+from ui.dialog import dialog
+from utilities.channel_set import channel_set_diff, psk_label, url_slots
+from utilities.input_handlers import get_list_input, get_text_input
+from utilities.save_to_radio import apply_pending_changes, describe_write_results, stage_edit, write_results_ok
+
+Role = channel_pb2.Channel.Role
+max_channel_name_bytes = 11  # What the firmware keeps of a channel name
+
+# (heading, width, formatter) for each column of the table
+columns = [
+    ("#", 2, lambda index, channel: str(index + 1)),
+    ("ROLE", 9, lambda index, channel: Role.Name(channel.role)),
+    ("NAME", 12, lambda index, channel: channel.settings.name or "-"),
+    ("KEY", 10, lambda index, channel: psk_label(channel.settings.psk)),
+    ("UP", 3, lambda index, channel: "yes" if channel.settings.uplink_enabled else "no"),
+    ("DOWN", 4, lambda index, channel: "yes" if channel.settings.downlink_enabled else "no"),
+    ("PREC", 4, lambda index, channel: str(channel.settings.module_settings.position_precision)),
+]
+
+# (label, path below ("channel", index)) of the fields that can be edited
+edit_fields = [
+    ("Name", ("settings", "name")),
+    ("Key", ("settings", "psk")),
+    ("Role", ("role",)),
+    ("Uplink", ("settings", "uplink_enabled")),
+    ("Downlink", ("settings", "downlink_enabled")),
+    ("Position precision", ("settings", "module_settings", "position_precision")),
+]
+
+
+def format_row(values):
+    return " ".join(f"{value:<{width}.{width}}" for value, (_, width, _) in zip(values, columns))
+
+
+def changed_channels(pending):
+    return [key for kind, key in pending.writes() if kind == "channel"]
+
+
+def draw_channel_editor(stdscr, channels, selected, changed, url):
+    height, width = stdscr.getmaxyx()
+
+    stdscr.erase()
+    stdscr.attrset(get_color("window_frame"))
+    stdscr.box()
+    stdscr.addstr(1, 2, " Main Menu > Channels > Edit All Channels"[:width - 4], get_color("settings_breadcrumbs", bold=True))
+    stdscr.addstr(3, 4, format_row([heading for heading, _, _ in columns])[:width - 6], get_color("settings_default", bold=True))
+
+    for index, channel in enumerate(channels):
+        if 4 + index >= height - 5:
+            break
+        marker = "*" if index in changed else " "
+        text = marker + " " + format_row([formatter(index, channel) for _, _, formatter in columns])
+        color = get_color("settings_warning" if index in changed else "settings_default", reverse=index == selected)
+        stdscr.addstr(4 + index, 2, text[:width - 4], color)
+
+    if changed:
+        summary = "Writes " + ", ".join(f"Channel {index + 1}" for index in changed)
+    else:
+        summary = "No changes"
+    stdscr.addstr(height - 5, 2, summary[:width - 4], get_color("settings_default"))
+    stdscr.addstr(height - 4, 2, url[:width - 4], get_color("settings_note"))
+    stdscr.addstr(height - 2, 2, "Enter: edit   d: diff   u: undo   Esc: done"[:width - 4], get_color("settings_note"))
+
+    stdscr.noutrefresh()
+    curses.doupdate()
+
+
+def ask_value(stdscr, channel, index, label):
+    """
+    Prompt for a new value of one field.
+    :return: The value, or None if the prompt was cancelled or the input was refused
+    """
+    settings = channel.settings
+    if label == "Name":
+        value = get_text_input(f"Name is currently: {settings.name}")
+        if value is not None and len(value.encode("utf-8")) > max_channel_name_bytes:
+            dialog(stdscr, "Name Too Long", f"Channel names are at most {max_channel_name_bytes} bytes.")
+            return None
+        return value
+
+    if label == "Key":
+        choice = get_list_input(f"Key is currently: {psk_label(settings.psk)}", None, ["Random AES256", "Default", "None", "Enter base64"])
+        if choice == "Enter base64":
+            text = get_text_input("Key in base64")
+            if text is None:
+                return None
+            try:
+                value = base64.b64decode(text, validate=True)
+            except (binascii.Error, ValueError):
+                dialog(stdscr, "Invalid Key", "That isn't valid base64.")
+                return None
+            if len(value) not in (0, 1, 16, 32):
+                dialog(stdscr, "Invalid Key", "A key is 0, 1, 16 or 32 bytes long.")
+                return None
+            return value
+        return {"Random AES256": os.urandom(32), "Default": b"\x01", "None": b""}.get(choice)
+
+    if label == "Role":
+        if index == 0:
+            dialog(stdscr, "Primary Channel", "The first channel is always the primary channel.")
+            return None
+        choice = get_list_input(f"Role is currently: {Role.Name(channel.role)}", None, ["SECONDARY", "DISABLED"])
+        return Role.Value(choice) if choice else None
+
+    if label in ("Uplink", "Downlink"):
+        current = settings.uplink_enabled if label == "Uplink" else settings.downlink_enabled
+        choice = get_list_input(f"{label} is currently: {current}", None, ["True", "False"])
+        return None if choice is None else choice == "True"
+
+    text = get_text_input(f"Position precision is currently: {settings.module_settings.position_precision}")
+    if text is None:
+        return None
+    if not text.strip().isdigit() or int(text) > 32:
+        dialog(stdscr, "Invalid Precision", "Position precision is a number of bits from 0 to 32.")
+        return None
+    return int(text)
+
+
+def write_channels_now(stdscr, interface, pending):
+    """Stage the edits and write the changed channels in one settings transaction, leaving any other staged edits staged."""
+    pending.stage()
+    results = apply_pending_changes(interface, pending, kinds=("channel",))
+    report = describe_write_results(results)
+    if write_results_ok(results):
+        dialog(stdscr, "Channels Written", "\n".join(report))
+    else:
+        report.append("Channels that didn't get through are still staged; Apply Changes retries them.")
+        dialog(stdscr, "Channels Not All Written", "\n".join(report))
+
+
+def channel_editor(stdscr, interface, pending):
+    """
+    Show every channel slot in one table and edit them together. Edits go into the changeset as
+    drafts; when leaving, they are staged for Apply Changes, written right away, or dropped.
+    Either way only the changed channels are written.
+    """
+    node = interface.localNode
+    old_url = node.getURL()
+    old_slots = url_slots(node.channels)
+    selected = 0
+    stdscr.timeout(-1)
+
+    while True:
+        channels = node.channels
+        changed = changed_channels(pending)
+        draw_channel_editor(stdscr, channels, selected, changed, node.getURL())
+
+        key = stdscr.getch()
+        if key == curses.KEY_UP:
+            selected = max(0, selected - 1)
+        elif key == curses.KEY_DOWN:
+            selected = min(len(channels) - 1, selected + 1)
+        elif key in (curses.KEY_ENTER, 10, 13, curses.KEY_RIGHT):
+            label = get_list_input(f"Edit channel {selected + 1}", None, [label for label, _ in edit_fields])
+            if label is None:
+                continue
+            value = ask_value(stdscr, channels[selected], selected, label)
+            if value is not None:
+                stage_edit(interface, pending, ("channel", selected) + dict(edit_fields)[label], value)
+        elif key == ord("d"):
+            lines = channel_set_diff(old_url, node.getURL(), old_slots, url_slots(node.channels)) or ["No changes"]
+            dialog(stdscr, "Channel URL Diff", "\n".join(lines + ["", f"Was: {old_url}", f"Now: {node.getURL()}"]))
+        elif key == ord("u"):
+            if pending.drafts:
+                pending.undo(interface)
+            else:
+                curses.beep()
+        elif key == curses.KEY_RESIZE:
+            curses.update_lines_cols()
+        elif key in (27, curses.KEY_LEFT):
+            if not pending.drafts:
+                break
+            choice = get_list_input("Keep the channel edits?", None, ["Stage", "Write now", "Discard"])
+            if choice == "Stage":
+                pending.stage()
+                break
+            if choice == "Write now":
+                write_channels_now(stdscr, interface, pending)
+                break
+            if choice == "Discard":
+                pending.rollback(interface)
+                break
@@ -1,37 +1,148 @@
 import base64
 import curses
+import functools
 import logging
 import os
 import re
 import sys
 
-from utilities.save_to_radio import save_changes
-from utilities.config_io import config_export, config_import
+from utilities.save_to_radio import new_pending_changes, stage_edit, has_pending_changes, describe_pending_changes, describe_conflicts, apply_pending_changes, discard_pending_changes, describe_write_results, write_results_ok, send_library_call
+from utilities.config_io import config_import, export_config, export_format_for
+from utilities.backup import BackupError, backup_extension, describe_backup, is_backup, read_backup, restore_backup, write_backup
 from utilities.input_handlers import get_repeated_input, get_text_input, get_fixed32_input, get_list_input, get_admin_key_input
-from ui.menus import generate_menu_from_protobuf
+from ui.menus import encode_if_bytes, generate_menu_from_protobuf, peek_menu_item, changed_menu_paths
+from ui.channel_editor import channel_editor
 from ui.colors import get_color
 from ui.dialog import dialog
-from utilities.control_utils import parse_ini_file, transform_menu_path
+from utilities.control_utils import field_path, menu_location, transform_menu_path
+from utilities.changeset import format_path, read_field
+from utilities.localisation import load_translations
+from utilities.node_cache import CachedInterface, save_snapshot
+from utilities.timing import format_summary, summarize
+from utilities.watch import ConfigWatcher
 from ui.user_config import json_editor
 
 # Constants
 width = 80
-save_option = "Save Changes"
+save_option = "Stage Changes"
 max_help_lines = 0
 help_win = None
+menu_win = None  # The menu window and pad are kept across frames and only resized or moved
+menu_pad = None
+pad_rows = []  # (text, attr) currently in each pad row, so unchanged rows aren't rewritten
 sensitive_settings = ["Reboot", "Reset Node DB", "Shutdown", "Factory Reset"]
+device_actions = ["Apply Changes", "Load Config File", "Config URL", "Edit All Channels"] + sensitive_settings
+stale_fields = set()  # Menu paths whose value turned out to differ from the device, or that another client changed
+connection_note = ""  # Shown in the header while the menu is drawn from a snapshot or still loading
+load_progress = None  # LoadProgress of a download that is still running under the live menu
+connection_poll_ms = 250
 
 # Get the parent directory of the script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
 
 # Paths
-locals_dir = os.path.dirname(os.path.abspath(sys.argv[0]))  # Current script directory
-translation_file = os.path.join(locals_dir, "localisations", "en.ini")
 config_folder = os.path.join(parent_dir, "node-configs")
 
-# Load translations
-field_mapping, help_text = parse_ini_file(translation_file)
+# Load translations for the user's locale; main calls set_language() if --lang was given
+field_mapping, help_text = load_translations()
+
+
+def set_language(language):
+    """Switch the menu names and help text to another language, in place so existing references follow."""
+    new_mapping, new_help = load_translations(language)
+    field_mapping.clear()
+    field_mapping.update(new_mapping)
+    help_text.clear()
+    help_text.update(new_help)
+
+
+def row_color(menu_path, option, reverse=False):
+    if option in sensitive_settings:
+        return get_color("settings_sensitive", reverse=reverse)
+    if tuple(menu_path[1:]) + (option,) in stale_fields:
+        return get_color("settings_warning", reverse=reverse)
+    return get_color("settings_default", reverse=reverse)
+
+
+def required_section(menu_path, option):
+    """Return the LoadProgress section that has to arrive before this menu entry can be opened."""
+    path = menu_path[1:] + [option]
+    if path[0] == "User Settings":
+        return "user"
+    if path[0] == "Channels":
+        return "channels"
+    if path[0] == "Radio Settings" and len(path) > 1:
+        return f"config.{path[1]}"
+    if path[0] == "Module Settings" and len(path) > 1:
+        return f"module_config.{path[1]}"
+    return None
+
+
+def loading_note(interface, connection):
+    if connection is None:
+        return ""
+    config_count, module_count = connection.progress.counts()
+    state = "cached" if isinstance(interface, CachedInterface) else getattr(connection, "label", "loading")
+    return f"[{state}: {config_count + module_count} sections]"
+
+
+def place_window(win, height, win_width, y, x):
+    """
+    Return a window with this geometry, reusing win when there is one.
+    A window that moves or changes size blanks its old area in the same frame rather than with its own refresh.
+    """
+    if win is None:
+        return curses.newwin(height, win_width, y, x)
+    if win.getmaxyx() != (height, win_width) or win.getbegyx() != (y, x):
+        win.erase()
+        win.noutrefresh()
+        win.resize(height, win_width)  # Resize first so the move is checked against the new size
+        win.mvwin(y, x)
+    return win
+
+
+def get_menu_pad(rows):
+    """Return the retained menu pad, growing it if this menu has more rows than it can hold."""
+    global menu_pad, pad_rows
+    if menu_pad is None or menu_pad.getmaxyx()[0] < rows:
+        menu_pad = curses.newpad(rows, width - 8)
+        menu_pad.bkgd(get_color("background"))
+        pad_rows = []
+    return menu_pad
+
+
+def draw_pad_row(idx, text, attr):
+    """Write one menu row into the pad, unless it already shows exactly that."""
+    text = text[:menu_pad.getmaxyx()[1]]
+    if idx < len(pad_rows) and pad_rows[idx] == (text, attr):
+        return
+    pad_rows.extend([None] * (idx + 1 - len(pad_rows)))
+    try:
+        menu_pad.addstr(idx, 0, text, attr)
+    except curses.error:
+        pass
+    pad_rows[idx] = (text, attr)
+
+
+def clear_pad_rows(start):
+    """Blank the rows a longer, previously shown menu left behind."""
+    for idx in range(start, len(pad_rows)):
+        if pad_rows[idx] is not None:
+            menu_pad.move(idx, 0)
+            menu_pad.clrtoeol()
+            pad_rows[idx] = None
+
+
+def refresh_menu_pad(menu_win, show_save_option):
+    """Queue the visible part of the pad for the next doupdate."""
+    begin_y, begin_x = menu_win.getbegyx()
+    visible_height = menu_win.getmaxyx()[0] - 5 - (2 if show_save_option else 0)
+    menu_pad.noutrefresh(
+        start_index[-1], 0,
+        begin_y + 3, begin_x + 4,
+        begin_y + 3 + visible_height, begin_x + 4 + menu_pad.getmaxyx()[1] - 1
+    )
 
 
 def display_menu(current_menu, menu_path, selected_index, show_save_option, help_text):
@@ -53,58 +164,62 @@ def display_menu(current_menu, menu_path, selected_index, show_save_option, help
     remaining_space = curses.LINES - (start_y + menu_height + 2)  # +2 for padding
     max_help_lines = max(remaining_space, 1)  # Ensure at least 1 lines for help
 
-    menu_win = curses.newwin(menu_height, width, start_y, start_x)
+    # Everything below only changes the window buffers; the terminal is written once by doupdate()
+    global menu_win
+    menu_win = place_window(menu_win, menu_height, width, start_y, start_x)
     menu_win.erase()
     menu_win.bkgd(get_color("background"))
     menu_win.attrset(get_color("window_frame"))
     menu_win.border()
     menu_win.keypad(True)
 
-    menu_pad = curses.newpad(len(current_menu) + 1, width - 8)
-    menu_pad.bkgd(get_color("background"))
+    get_menu_pad(len(current_menu) + 1)
 
     header = " > ".join(word.title() for word in menu_path)
     if len(header) > width - 4:
         header = header[:width - 7] + "..."
     menu_win.addstr(1, 2, header, get_color("settings_breadcrumbs", bold=True))
+    if connection_note and len(header) + len(connection_note) < width - 6:
+        menu_win.addstr(1, width - 2 - len(connection_note), connection_note, get_color("settings_note"))
 
     transformed_path = transform_menu_path(menu_path)
 
     for idx, option in enumerate(current_menu):
-        field_info = current_menu[option]
+        field_info = peek_menu_item(current_menu, option)  # Don't build submenus just to draw their row
         current_value = field_info[1] if isinstance(field_info, tuple) else ""
         full_key = '.'.join(transformed_path + [option])
         display_name = field_mapping.get(full_key, option)
 
         display_option = f"{display_name}"[:width // 2 - 2]
+        if load_progress is not None and not load_progress.has(required_section(menu_path, option)):
+            current_value = "loading..."
         display_value = f"{current_value}"[:width // 2 - 4]
 
-        try:
-            color = get_color("settings_sensitive" if option in sensitive_settings else "settings_default", reverse=(idx == selected_index))
-            menu_pad.addstr(idx, 0, f"{display_option:<{width // 2 - 2}} {display_value}".ljust(width - 8), color)
-        except curses.error:
-            pass
+        color = row_color(menu_path, option, reverse=(idx == selected_index))
+        draw_pad_row(idx, f"{display_option:<{width // 2 - 2}} {display_value}".ljust(width - 8), color)
+    clear_pad_rows(len(current_menu))
 
     if show_save_option:
         save_position = menu_height - 2
         menu_win.addstr(save_position, (width - len(save_option)) // 2, save_option, get_color("settings_save", reverse=(selected_index == len(current_menu))))
 
-    # Draw help window with dynamically updated max_help_lines
-    draw_help_window(start_y, start_x, menu_height, max_help_lines, current_menu, selected_index, transformed_path)
-
-    menu_win.refresh()
-    menu_pad.refresh(
-        start_index[-1], 0,
-        menu_win.getbegyx()[0] + 3, menu_win.getbegyx()[1] + 4,
-        menu_win.getbegyx()[0] + 3 + menu_win.getmaxyx()[0] - 5 - (2 if show_save_option else 0),
-        menu_win.getbegyx()[1] + menu_win.getmaxyx()[1] - 8
-    )
-
     max_index = num_items + (1 if show_save_option else 0) - 1
     visible_height = menu_win.getmaxyx()[0] - 5 - (2 if show_save_option else 0)
 
     draw_arrows(menu_win, visible_height, max_index, start_index, show_save_option)
 
+    # Draw help window with dynamically updated max_help_lines. It goes first so that blanking
+    # its old position can't wipe the menu we queue next.
+    draw_help_window(start_y, start_x, menu_height, max_help_lines, current_menu, selected_index, transformed_path)
+
+    # A dialog may have been drawn over us, so queue every window in full. doupdate() compares
+    # against what is already on the terminal and only sends the cells that differ.
+    menu_win.touchwin()
+    menu_win.noutrefresh()
+    menu_pad.touchwin()
+    refresh_menu_pad(menu_win, show_save_option)
+
+    curses.doupdate()
     return menu_win, menu_pad
 
 
@@ -130,15 +245,9 @@ def update_help_window(help_win, help_text, transformed_path, selected_option, m
     if help_y + help_height > curses.LINES:
         help_y = curses.LINES - help_height
 
-    # Create or update the help window
-    if help_win is None:
-        help_win = curses.newwin(help_height, width, help_y, help_x)
-    else:
-        help_win.erase()
-        help_win.refresh()
-        help_win.resize(help_height, width)
-        help_win.mvwin(help_y, help_x)
-
+    # Create or update the help window. Nothing is written to the terminal until the caller's doupdate()
+    help_win = place_window(help_win, help_height, width, help_y, help_x)
+    help_win.erase()
     help_win.bkgd(get_color("background"))
     help_win.attrset(get_color("window_frame"))
     help_win.border()
@@ -153,100 +262,109 @@ def update_help_window(help_win, help_text, transformed_path, selected_option, m
             except curses.error:
                 pass  # Prevent crashes
 
-    help_win.refresh()
+    help_win.touchwin()
+    help_win.noutrefresh()
     return help_win
 
 
-def get_wrapped_help_text(help_text, transformed_path, selected_option, width, max_lines):
-    """Fetches and formats help text for display, ensuring it fits within the allowed lines."""
-    
-    full_help_key = '.'.join(transformed_path + [selected_option]) if selected_option else None
-    help_content = help_text.get(full_help_key, "No help available.")
+# Help markup, compiled once. Each pattern wraps the text it colours in group 1.
+help_markup_patterns = [
+    (re.compile(r'\[warning\](.*?)\[/warning\]'), ('settings_warning', True, False)),  # Red for warnings
+    (re.compile(r'\[note\](.*?)\[/note\]'), ('settings_note', True, False)),  # Green for notes
+    (re.compile(r'\[underline\](.*?)\[/underline\]'), ('settings_default', False, True)),  # Underline
 
-    wrap_width = max(width - 6, 10)  # Ensure a valid wrapping width
+    (re.compile(r'\\033\[31m(.*?)\\033\[0m'), ('settings_warning', True, False)),  # Red text
+    (re.compile(r'\\033\[32m(.*?)\\033\[0m'), ('settings_note', True, False)),  # Green text
+    (re.compile(r'\\033\[4m(.*?)\\033\[0m'), ('settings_default', False, True))  # Underline
+]
+help_word_pattern = re.compile(r'\S+|\s+')  # Words and runs of spaces, kept separately
+help_layout_cache_size = 512  # Wrapped layouts kept; one per help entry, width and height seen
 
-    # Color replacements
-    color_mappings = {
-        r'\[warning\](.*?)\[/warning\]': ('settings_warning', True, False),  # Red for warnings
-        r'\[note\](.*?)\[/note\]': ('settings_note', True, False),  # Green for notes
-        r'\[underline\](.*?)\[/underline\]': ('settings_default', False, True),  # Underline
-
-        r'\\033\[31m(.*?)\\033\[0m': ('settings_warning', True, False),  # Red text
-        r'\\033\[32m(.*?)\\033\[0m': ('settings_note', True, False),  # Green text
-        r'\\033\[4m(.*?)\\033\[0m': ('settings_default', False, True)  # Underline
-    }
-
-    def extract_ansi_segments(text):
-        """Extracts and replaces ANSI color codes, ensuring spaces are preserved."""
-        matches = []
-        last_pos = 0
-        pattern_matches = []
-
-        # Find all matches and store their positions
-        for pattern, (color, bold, underline) in color_mappings.items():
-            for match in re.finditer(pattern, text):
-                pattern_matches.append((match.start(), match.end(), match.group(1), color, bold, underline))
-
-        # Sort matches by start position to process sequentially
-        pattern_matches.sort(key=lambda x: x[0])
-
-        for start, end, content, color, bold, underline in pattern_matches:
-            # Preserve non-matching text including spaces
-            if last_pos < start:
-                segment = text[last_pos:start]
-                matches.append((segment, "settings_default", False, False))
-            
-            # Append the colored segment
-            matches.append((content, color, bold, underline))
-            last_pos = end
 
-        # Preserve any trailing text
-        if last_pos < len(text):
-            matches.append((text[last_pos:], "settings_default", False, False))
+def extract_ansi_segments(text):
+    """Extracts and replaces ANSI color codes, ensuring spaces are preserved."""
+    matches = []
+    last_pos = 0
+    pattern_matches = []
 
-        return matches
+    # Find all matches and store their positions
+    for pattern, (color, bold, underline) in help_markup_patterns:
+        for match in pattern.finditer(text):
+            pattern_matches.append((match.start(), match.end(), match.group(1), color, bold, underline))
 
-    def wrap_ansi_text(segments, wrap_width):
-        """Wraps text while preserving ANSI formatting and spaces."""
-        wrapped_lines = []
-        line_buffer = []
-        line_length = 0
+    # Sort matches by start position to process sequentially
+    pattern_matches.sort(key=lambda x: x[0])
 
-        for text, color, bold, underline in segments:
-            words = re.findall(r'\S+|\s+', text)  # Capture words and spaces separately
+    for start, end, content, color, bold, underline in pattern_matches:
+        # Preserve non-matching text including spaces
+        if last_pos < start:
+            segment = text[last_pos:start]
+            matches.append((segment, "settings_default", False, False))
 
-            for word in words:
-                word_length = len(word)
+        # Append the colored segment
+        matches.append((content, color, bold, underline))
+        last_pos = end
 
-                if line_length + word_length > wrap_width and word.strip():
-                    # If the word (ignoring spaces) exceeds width, wrap the line
-                    wrapped_lines.append(line_buffer)
-                    line_buffer = []
-                    line_length = 0
+    # Preserve any trailing text
+    if last_pos < len(text):
+        matches.append((text[last_pos:], "settings_default", False, False))
 
-                line_buffer.append((word, color, bold, underline))
-                line_length += word_length
+    return matches
 
-        if line_buffer:
-            wrapped_lines.append(line_buffer)
 
-        return wrapped_lines
+def wrap_ansi_text(segments, wrap_width):
+    """Wraps text while preserving ANSI formatting and spaces."""
+    wrapped_lines = []
+    line_buffer = []
+    line_length = 0
 
-    raw_lines = help_content.split("\\n")  # Preserve new lines
-    wrapped_help = []
+    for text, color, bold, underline in segments:
+        for word in help_word_pattern.findall(text):
+            word_length = len(word)
 
-    for raw_line in raw_lines:
-        color_segments = extract_ansi_segments(raw_line)
-        wrapped_segments = wrap_ansi_text(color_segments, wrap_width)
-        wrapped_help.extend(wrapped_segments)
-        pass
+            if line_length + word_length > wrap_width and word.strip():
+                # If the word (ignoring spaces) exceeds width, wrap the line
+                wrapped_lines.append(tuple(line_buffer))
+                line_buffer = []
+                line_length = 0
+
+            line_buffer.append((word, color, bold, underline))
+            line_length += word_length
+
+    if line_buffer:
+        wrapped_lines.append(tuple(line_buffer))
+
+    return wrapped_lines
+
+
+@functools.lru_cache(maxsize=help_layout_cache_size)
+def layout_help_text(help_content, wrap_width, max_lines):
+    """
+    Parse and wrap one help entry. Memoized, so moving the cursor back and forth through a menu
+    only pays for each entry once. The layout is a tuple of lines, each a tuple of
+    (text, color, bold, underline) segments, and must not be modified.
+    """
+    wrapped_help = []
+    for raw_line in help_content.split("\\n"):  # Preserve new lines
+        wrapped_help.extend(wrap_ansi_text(extract_ansi_segments(raw_line), wrap_width))
 
     # Trim and add ellipsis if needed
     if len(wrapped_help) > max_lines:
-        wrapped_help = wrapped_help[:max_lines]  
-        wrapped_help[-1].append(("...", "settings_default", False, False))  
+        wrapped_help = wrapped_help[:max_lines]
+        wrapped_help[-1] += (("...", "settings_default", False, False),)
+
+    return tuple(wrapped_help)
+
 
-    return wrapped_help
+def get_wrapped_help_text(help_text, transformed_path, selected_option, width, max_lines):
+    """Fetches and formats help text for display, ensuring it fits within the allowed lines."""
+
+    full_help_key = '.'.join(transformed_path + [selected_option]) if selected_option else None
+    help_content = help_text.get(full_help_key, "No help available.")
+
+    wrap_width = max(width - 6, 10)  # Ensure a valid wrapping width
+
+    return layout_help_text(help_content, wrap_width, max_lines)
 
 
 def move_highlight(old_idx, new_idx, options, show_save_option, menu_win, menu_pad, help_win, help_text, menu_path, max_help_lines):
@@ -268,33 +386,29 @@ def move_highlight(old_idx, new_idx, options, show_save_option, menu_win, menu_p
     # Ensure start_index is within bounds
     start_index[-1] = max(0, min(start_index[-1], max_index - visible_height + 1))
 
-    # Clear old selection
+    # Clear old selection; only the two affected rows change
     if show_save_option and old_idx == max_index:
         menu_win.chgat(menu_win.getmaxyx()[0] - 2, (width - len(save_option)) // 2, len(save_option), get_color("settings_save"))
     else:
-        menu_pad.chgat(old_idx, 0, menu_pad.getmaxyx()[1], get_color("settings_sensitive") if options[old_idx] in sensitive_settings else get_color("settings_default"))
+        draw_pad_row(old_idx, pad_rows[old_idx][0], row_color(menu_path, options[old_idx]))
 
     # Highlight new selection
     if show_save_option and new_idx == max_index:
         menu_win.chgat(menu_win.getmaxyx()[0] - 2, (width - len(save_option)) // 2, len(save_option), get_color("settings_save", reverse=True))
     else:
-        menu_pad.chgat(new_idx, 0, menu_pad.getmaxyx()[1], get_color("settings_sensitive", reverse=True) if options[new_idx] in sensitive_settings else get_color("settings_default", reverse=True))
+        draw_pad_row(new_idx, pad_rows[new_idx][0], row_color(menu_path, options[new_idx], reverse=True))
 
-    menu_win.refresh()
-    
-    # Refresh pad only if scrolling is needed
-    menu_pad.refresh(start_index[-1], 0,
-                     menu_win.getbegyx()[0] + 3, menu_win.getbegyx()[1] + 4,
-                     menu_win.getbegyx()[0] + 3 + visible_height, 
-                     menu_win.getbegyx()[1] + menu_win.getmaxyx()[1] - 4)
+    draw_arrows(menu_win, visible_height, max_index, start_index, show_save_option)
 
     # Update help window
     transformed_path = transform_menu_path(menu_path)
     selected_option = options[new_idx] if new_idx < len(options) else None
     help_y = menu_win.getbegyx()[0] + menu_win.getmaxyx()[0]
-    help_win = update_help_window(help_win, help_text, transformed_path, selected_option, max_help_lines, width, help_y, menu_win.getbegyx()[1])
+    update_help_window(help_win, help_text, transformed_path, selected_option, max_help_lines, width, help_y, menu_win.getbegyx()[1])
 
-    draw_arrows(menu_win, visible_height, max_index, start_index, show_save_option)
+    menu_win.noutrefresh()
+    refresh_menu_pad(menu_win, show_save_option)
+    curses.doupdate()
 
 
 def draw_arrows(win, visible_height, max_index, start_index, show_save_option):
@@ -314,39 +428,166 @@ def draw_arrows(win, visible_height, max_index, start_index, show_save_option):
             win.addstr(visible_height + 3, 2, " ", get_color("settings_default"))
         
 
-def settings_menu(stdscr, interface):
+def reconcile_connection(interface, connection, menu):
+    """
+    Swap the snapshot-backed interface for the live one once the background connection finishes.
+    :return: (interface, menu) to continue with; the cached pair if the node could not be reached
+    """
+    global connection_note
+    if connection.interface is None:
+        connection_note = "[offline: cached]"
+        logging.warning("Could not reach the node; showing the cached snapshot read-only")
+        return interface, menu
+
+    live_menu = generate_menu_from_protobuf(connection.interface)
+    stale_fields.update(changed_menu_paths(menu["Main Menu"], live_menu["Main Menu"]))
+    connection_note = ""
+    logging.info(f"Reconciled snapshot with the device, {len(stale_fields)} field(s) were stale")
+    save_snapshot(connection.interface)
+    return connection.interface, live_menu
+
+
+def finish_loading(connection):
+    """Lift the loading restrictions once the live interface has downloaded everything."""
+    global connection_note, load_progress
+    if connection.interface is not None and not connection.progress.complete:
+        connection_note = "[incomplete]"  # What never arrived stays closed rather than showing defaults
+        logging.warning("Part of the config never arrived; those menus stay closed")
+        return
+    load_progress = None
+    if connection.interface is None:
+        connection_note = "[connection lost]"
+        logging.warning("The node went away before its config finished downloading")
+        return
+    connection_note = f"[{connection.label}]" if hasattr(connection, "label") else ""
+    save_snapshot(connection.interface)
+
+
+def menu_value(field, value):
+    """A setting's value the way the menu shows it: enums by name, bytes as base64."""
+    if field is not None and field.enum_type and isinstance(value, int):
+        enum_value = field.enum_type.values_by_number.get(value)
+        return enum_value.name if enum_value else value
+    return encode_if_bytes(value)
+
+
+def stages_edits(menu_path):
+    """Whether edits made at this level of the menu are kept with Stage Changes."""
+    return (
+        len(menu_path) > 2 and ("Radio Settings" in menu_path or "Module Settings" in menu_path)
+    ) or (
+        len(menu_path) == 2 and "User Settings" in menu_path
+    ) or (
+        len(menu_path) == 3 and "Channels" in menu_path
+    )
+
+
+def walk_menu(menu, menu_path, menu_index):
+    """
+    The menus along menu_path, Main Menu first. Where that part of the menu is gone,
+    menu_path and menu_index are cut back to the deepest menu that is still there.
+    """
+    menu_stack = [menu["Main Menu"]]
+    for depth, step in enumerate(menu_path[1:], start=1):
+        next_menu = menu_stack[-1].get(step)
+        if not isinstance(next_menu, dict):
+            del menu_path[depth:], menu_index[depth - 1:], start_index[depth:]
+            break
+        menu_stack.append(next_menu)
+    return menu_stack
+
+
+def patch_menu(menu, interface, paths):
+    """
+    Show new values of settings the node changed in their rows, in place, and mark the rows.
+    Submenus that haven't been built yet read the new values when they are.
+    :param paths: Changeset paths, as from ConfigWatcher.apply()
+    """
+    for path in paths:
+        location = menu_location(path)
+        if location is None:
+            continue
+        location_path, option = location
+        level = menu
+        for step in location_path:
+            level = peek_menu_item(level, step)
+            if not isinstance(level, dict):
+                break
+        else:
+            entry = peek_menu_item(level, option)
+            if isinstance(entry, tuple):
+                level[option] = (entry[0], menu_value(entry[0], read_field(interface, path)))
+        stale_fields.add(tuple(location_path[1:]) + (option,))
+    logging.info(f"The node changed {', '.join(format_path(path) for path in paths)}")
+
+
+def settings_menu(stdscr, interface, connection=None, watch=None):
+    """
+    :param connection: A BackgroundConnection that is still running, either behind a CachedInterface
+                       drawn from a snapshot or behind a live interface whose download hasn't finished
+    :param watch: Follow changes other clients make to the node, polling it this many seconds after each poll
+                  (0 only listens); None doesn't watch. Starts once the live config has loaded.
+    """
+    global connection_note, load_progress
     curses.update_lines_cols()
+    connection_note = loading_note(interface, connection)
+    load_progress = connection.progress if connection and not isinstance(interface, CachedInterface) else None
 
     menu = generate_menu_from_protobuf(interface)
-    current_menu = menu["Main Menu"]
+    menu_stack = [menu["Main Menu"]]  # The menus along menu_path, so going back doesn't walk down from the top
+    current_menu = menu_stack[-1]
     menu_path = ["Main Menu"]
     menu_index = []
     selected_index = 0
-    modified_settings = {}
-    
+    pending_changes = new_pending_changes()
+    watcher = None
+
     need_redraw = True
     show_save_option = False
 
     while True:
+        if watch is not None and watcher is None and connection is None and not isinstance(interface, CachedInterface):
+            watcher = ConfigWatcher(interface, watch)
+
         if(need_redraw):
             options = list(current_menu.keys())
 
-            show_save_option = (
-                len(menu_path) > 2 and ("Radio Settings" in menu_path or "Module Settings" in menu_path)
-            ) or (
-                len(menu_path) == 2 and "User Settings" in menu_path 
-            ) or (
-                len(menu_path) == 3 and "Channels" in menu_path
-            )
+            show_save_option = stages_edits(menu_path)
 
             # Display the menu
             menu_win, menu_pad = display_menu(current_menu, menu_path, selected_index, show_save_option, help_text)
+            menu_win.timeout(connection_poll_ms if connection or watcher else -1)  # Wake up to check on the background connection or watcher
 
             need_redraw = False
 
         # Capture user input
         key = menu_win.getch()
 
+        if key == -1:
+            changed = watcher.apply(pending_changes) if watcher else []
+            if changed:
+                patch_menu(menu, interface, changed)
+                need_redraw = True
+            if connection is None:
+                continue
+            if connection.done.is_set():
+                if isinstance(interface, CachedInterface):
+                    interface, menu = reconcile_connection(interface, connection, menu)
+
+                    # Walk back down to where the user was, stopping if that part of the menu is gone
+                    depth = len(menu_path)
+                    menu_stack = walk_menu(menu, menu_path, menu_index)
+                    current_menu = menu_stack[-1]
+                    selected_index = 0 if len(menu_path) < depth else min(selected_index, len(current_menu) - 1)
+                else:
+                    finish_loading(connection)
+                connection = None
+                need_redraw = True
+            elif loading_note(interface, connection) != connection_note:
+                connection_note = loading_note(interface, connection)
+                need_redraw = True  # More sections landed; update their rows
+            continue
+
         max_index = len(options) + (1 if show_save_option else 0) - 1
         # max_help_lines = 4
 
@@ -364,11 +605,9 @@ def settings_menu(stdscr, interface):
             need_redraw = True
             curses.update_lines_cols()
 
-            menu_win.erase()
-            help_win.erase()
-
-            menu_win.refresh()
-            help_win.refresh()
+            # Blank whatever the old layout left outside the windows; sent with the next frame
+            stdscr.erase()
+            stdscr.noutrefresh()
 
         elif key == ord("\t") and show_save_option:
             old_selected_index = selected_index
@@ -378,43 +617,93 @@ def settings_menu(stdscr, interface):
         elif key == curses.KEY_RIGHT or key == ord('\n'):
             need_redraw = True
             start_index.append(0)
-            menu_win.erase()
-            help_win.erase()
-
-            # draw_help_window(menu_win.getbegyx()[0], menu_win.getbegyx()[1], menu_win.getmaxyx()[0], max_help_lines, current_menu, selected_index, transform_menu_path(menu_path))
-
-            menu_win.refresh()
-            help_win.refresh()
 
             if show_save_option and selected_index == len(options):
-                save_changes(interface, menu_path, modified_settings)
-                modified_settings.clear()
-                logging.info("Changes Saved")
+                pending_changes.stage()
+                logging.info("Changes Staged")
 
+                start_index.pop()  # Pushed by this keypress
                 if len(menu_path) > 1:
                     menu_path.pop()
-                    current_menu = menu["Main Menu"]
-                    for step in menu_path[1:]:
-                        current_menu = current_menu.get(step, {})
-                    selected_index = 0
+                    menu_stack.pop()
+                    current_menu = menu_stack[-1]
+                    selected_index = menu_index.pop() if menu_index else 0
+                    start_index.pop()  # The menu we just left
                 continue
 
             selected_option = options[selected_index]
 
+            if isinstance(interface, CachedInterface) and (
+                selected_option in device_actions or isinstance(peek_menu_item(current_menu, selected_option), tuple)
+            ):
+                dialog(stdscr, "Not Connected", "Showing cached settings. Editing is available once the node answers.")
+                start_index.pop()
+                continue
+
+            if load_progress is not None and (
+                selected_option in (device_actions if connection is not None else []) + ["Export Config File"]
+                or not load_progress.has(required_section(menu_path, selected_option))
+            ):
+                dialog(stdscr, "Still Loading", "This part of the config hasn't arrived from the node yet.")
+                start_index.pop()
+                continue
+
             if selected_option == "Exit":
+                confirm_pending_changes(interface, pending_changes)
                 break
 
+            elif selected_option == "Apply Changes":
+                if not has_pending_changes(pending_changes):
+                    dialog(stdscr, "Apply Changes", "No staged changes to apply.")
+                    start_index.pop()
+                    continue
+                dialog(stdscr, "Staged Changes", "\n".join(describe_pending_changes(pending_changes)))
+                confirmation = get_list_input("Apply staged changes in one transaction?", None, ["Yes", "No", "Discard"])
+                conflicts = pending_changes.conflicts(interface) if confirmation == "Yes" else []
+                if conflicts:
+                    dialog(stdscr, "Changed Since Staged", "\n".join(describe_conflicts(conflicts)))
+                    resolution = get_list_input("Send the staged values or keep the current ones?", None, ["Staged", "Current", "Cancel"])
+                    if resolution == "Staged":
+                        pending_changes.reapply(interface, [path for path, _, _ in conflicts])
+                    elif resolution == "Current":
+                        pending_changes.forget([path for path, _, _ in conflicts])
+                    else:
+                        confirmation = "No"
+                    menu = generate_menu_from_protobuf(interface)
+                    menu_stack = walk_menu(menu, menu_path, menu_index)
+                    current_menu = menu_stack[-1]
+                if confirmation == "Yes" and not has_pending_changes(pending_changes):
+                    dialog(stdscr, "Apply Changes", "Nothing left to apply.")
+                elif confirmation == "Yes":
+                    results = apply_pending_changes(interface, pending_changes)
+                    report = describe_write_results(results)
+                    if write_results_ok(results):
+                        dialog(stdscr, "Changes Applied", "\n".join(report))
+                    else:
+                        report.append("Writes that didn't get through are still staged; Apply Changes retries them.")
+                        dialog(stdscr, "Apply Changes Incomplete", "\n".join(report))
+                elif confirmation == "Discard":
+                    discard_pending_changes(interface, pending_changes)
+                    menu = generate_menu_from_protobuf(interface)
+                    menu_stack = walk_menu(menu, menu_path, menu_index)
+                    current_menu = menu_stack[-1]
+                start_index.pop()
+                continue
+
             elif selected_option == "Export Config File":
                 filename = get_text_input("Enter a filename for the config file")
                 if not filename:
                     logging.info("Export aborted: No filename provided.")
                     start_index.pop()
                     continue  # Go back to the menu
-                if not filename.lower().endswith(".yaml"):
+                export_format = export_format_for(filename, default=None)  # .json and .pb pick those formats
+                if filename.lower().endswith(backup_extension):
+                    export_format = "backup"
+                elif export_format is None:
+                    export_format = "yaml"
                     filename += ".yaml"
 
                 try:
-                    config_text = config_export(interface)
                     yaml_file_path = os.path.join(config_folder, filename)
 
                     if os.path.exists(yaml_file_path):
@@ -424,8 +713,14 @@ def settings_menu(stdscr, interface):
                             start_index.pop()
                             continue  # Return to menu
                     os.makedirs(os.path.dirname(yaml_file_path), exist_ok=True)
-                    with open(yaml_file_path, "w", encoding="utf-8") as file:
-                        file.write(config_text)
+                    if export_format == "backup":
+                        write_backup(interface, yaml_file_path)
+                    elif export_format == "protobuf":
+                        with open(yaml_file_path, "wb") as file:
+                            export_config(interface, file, export_format)
+                    else:
+                        with open(yaml_file_path, "w", encoding="utf-8") as file:
+                            export_config(interface, file, export_format)
                     logging.info(f"Config file saved to {yaml_file_path}")
                     dialog(stdscr, "Config File Saved:", yaml_file_path)
                     start_index.pop()
@@ -441,6 +736,12 @@ def settings_menu(stdscr, interface):
                 
             elif selected_option == "Load Config File":
 
+                # A load writes whole sections from the in-memory config, staged edits included
+                if has_pending_changes(pending_changes):
+                    dialog(stdscr, "Staged Changes", "Apply or discard the staged changes before loading a config file or backup.")
+                    start_index.pop()
+                    continue
+
                 # Check if folder exists and is not empty
                 if not os.path.exists(config_folder) or not any(os.listdir(config_folder)):
                     dialog(stdscr, "", " No config files found. Export a config first.")
@@ -456,9 +757,19 @@ def settings_menu(stdscr, interface):
                 filename = get_list_input("Choose a config file", None, file_list)
                 if filename:
                     file_path = os.path.join(config_folder, filename)
+                    if is_backup(file_path):
+                        restore_from_file(stdscr, interface, file_path)
+                        start_index.pop()
+                        continue
                     overwrite = get_list_input(f"Are you sure you want to load {filename}?", None, ["Yes", "No"])
                     if overwrite == "Yes":
-                        config_import(interface, file_path)
+                        try:
+                            results = config_import(interface, file_path)["results"]
+                        except ValueError as e:
+                            dialog(stdscr, "Config Not Loaded", str(e))
+                        else:
+                            if not write_results_ok(results):
+                                dialog(stdscr, "Config Not Fully Loaded", "\n".join(describe_write_results(results)))
                 start_index.pop()
                 continue
 
@@ -469,15 +780,36 @@ def settings_menu(stdscr, interface):
                     current_value = new_value
                     overwrite = get_list_input(f"Are you sure you want to load this config?", None, ["Yes", "No"])
                     if overwrite == "Yes":
-                        interface.localNode.setURL(new_value)
-                        logging.info(f"New Config URL sent to node")
+                        try:
+                            status, _, reason = send_library_call(interface.localNode, "setURL", new_value)
+                        except SystemExit:  # setURL exits on a URL it can't read
+                            dialog(stdscr, "Config URL Not Sent", "That isn't a channel URL the node can use.")
+                        else:
+                            logging.info(f"New Config URL sent to node: {status}")
+                            if status != "ok":
+                                dialog(stdscr, "Config URL Not Confirmed", f"The node didn't confirm the new channels: {reason or status}")
+                start_index.pop()
+                continue
+
+            elif selected_option == "Edit All Channels":
+                channel_editor(stdscr, interface, pending_changes)
+                menu = generate_menu_from_protobuf(interface)
+                menu_stack = walk_menu(menu, menu_path, menu_index)
+                current_menu = menu_stack[-1]
+                stdscr.erase()
+                stdscr.noutrefresh()
+                start_index.pop()
+                continue
+
+            elif selected_option == "Admin Timing":
+                dialog(stdscr, "Admin Timing This Session", "\n".join(format_summary(summarize())))
                 start_index.pop()
                 continue
 
             elif selected_option == "Reboot":
                 confirmation = get_list_input("Are you sure you want to Reboot?", None,  ["Yes", "No"])
                 if confirmation == "Yes":
-                    interface.localNode.reboot()
+                    send_library_call(interface.localNode, "reboot")
                     logging.info(f"Node Reboot Requested by menu")
                 start_index.pop()
                 continue
@@ -485,7 +817,7 @@ def settings_menu(stdscr, interface):
             elif selected_option == "Reset Node DB":
                 confirmation = get_list_input("Are you sure you want to Reset Node DB?", None,  ["Yes", "No"])
                 if confirmation == "Yes":
-                    interface.localNode.resetNodeDb()
+                    send_library_call(interface.localNode, "resetNodeDb")
                     logging.info(f"Node DB Reset Requested by menu")
                 start_index.pop()
                 continue
@@ -493,7 +825,7 @@ def settings_menu(stdscr, interface):
             elif selected_option == "Shutdown":
                 confirmation = get_list_input("Are you sure you want to Shutdown?", None, ["Yes", "No"])
                 if confirmation == "Yes":
-                    interface.localNode.shutdown()
+                    send_library_call(interface.localNode, "shutdown")
                     logging.info(f"Node Shutdown Requested by menu")
                 start_index.pop()
                 continue
@@ -501,7 +833,7 @@ def settings_menu(stdscr, interface):
             elif selected_option == "Factory Reset":
                 confirmation = get_list_input("Are you sure you want to Factory Reset?", None,  ["Yes", "No"])
                 if confirmation == "Yes":
-                    interface.localNode.factoryReset()
+                    send_library_call(interface.localNode, "factoryReset")
                     logging.info(f"Factory Reset Requested by menu")
                 start_index.pop()
                 continue
@@ -528,27 +860,16 @@ def settings_menu(stdscr, interface):
                     if selected_option in ['longName', 'shortName']:
                         new_value = get_text_input(f"{human_readable_name} is currently: {current_value}")
                         new_value = current_value if new_value is None else new_value
-                        current_menu[selected_option] = (field, new_value)
 
                     elif selected_option == 'isLicensed':
                         new_value = get_list_input(f"{human_readable_name} is currently: {current_value}", str(current_value),  ["True", "False"])
                         new_value = new_value == "True"
-                        current_menu[selected_option] = (field, new_value)
-
-                    for option, (field, value) in current_menu.items():
-                        modified_settings[option] = value
 
                     start_index.pop()
 
                 elif selected_option in ['latitude', 'longitude', 'altitude']:
                     new_value = get_text_input(f"{human_readable_name} is currently: {current_value}")
                     new_value = current_value if new_value is None else new_value
-                    current_menu[selected_option] = (field, new_value)
-
-                    for option in ['latitude', 'longitude', 'altitude']:
-                        if option in current_menu:
-                            modified_settings[option] = current_menu[option][1]
-
                     start_index.pop()
 
                 elif selected_option == "admin_key":
@@ -591,20 +912,13 @@ def settings_menu(stdscr, interface):
                     new_value = current_value if new_value is None else new_value
                     start_index.pop()
                 
-                for key in menu_path[3:]:  # Skip "Main Menu"
-                    modified_settings = modified_settings.setdefault(key, {})
-
-                # Add the new value to the appropriate level
-                modified_settings[selected_option] = new_value
-
-                # Convert enum string to int
-                if field and field.enum_type:
-                    enum_value_descriptor = field.enum_type.values_by_number.get(new_value)
-                    new_value = enum_value_descriptor.name if enum_value_descriptor else new_value
-
-                current_menu[selected_option] = (field, new_value)
+                if new_value is not current_value:  # Prompts hand back current_value when cancelled
+                    path = field_path(menu_path, selected_option)
+                    stage_edit(interface, pending_changes, path, new_value)
+                    current_menu[selected_option] = (field, menu_value(field, read_field(interface, path)))
             else:
                 current_menu = current_menu[selected_option]
+                menu_stack.append(current_menu)
                 menu_path.append(selected_option)
                 menu_index.append(selected_index)
                 selected_index = 0
@@ -613,32 +927,75 @@ def settings_menu(stdscr, interface):
         elif key == curses.KEY_LEFT:
             need_redraw = True
 
-            menu_win.erase()
-            help_win.erase()
-
-            # max_help_lines = 4
-            # draw_help_window(menu_win.getbegyx()[0], menu_win.getbegyx()[1], menu_win.getmaxyx()[0], max_help_lines, current_menu, selected_index, transform_menu_path(menu_path))
-
-            menu_win.refresh()
-            help_win.refresh()
-
-            if len(menu_path) < 2:
-                modified_settings.clear()
-
             # Navigate back to the previous menu
             if len(menu_path) > 1:
                 menu_path.pop()
-                current_menu = menu["Main Menu"]
-                for step in menu_path[1:]:
-                    current_menu = current_menu.get(step, {})
+                menu_stack.pop()
+                current_menu = menu_stack[-1]
                 selected_index = menu_index.pop()
                 start_index.pop()
+
+                # Leaving without Stage Changes drops the edits made since the last stage
+                if not stages_edits(menu_path) and pending_changes.rollback(interface):
+                    menu = generate_menu_from_protobuf(interface)
+                    menu_stack = walk_menu(menu, menu_path, menu_index)
+                    current_menu = menu_stack[-1]
                 
+        elif key in (ord("u"), ord("r")):  # Undo or redo the last edit
+            step = pending_changes.undo(interface) if key == ord("u") else pending_changes.redo(interface)
+            if step is None:
+                curses.beep()
+                continue
+            logging.info(f"{'Undid' if key == ord('u') else 'Redid'} {', '.join(format_path(change.path) for change in step)}")
+            menu = generate_menu_from_protobuf(interface)
+            menu_stack = walk_menu(menu, menu_path, menu_index)
+            current_menu = menu_stack[-1]
+            selected_index = min(selected_index, len(current_menu) - 1)
+            need_redraw = True
+
         elif key == 27:  # Escape key
             menu_win.erase()
             menu_win.refresh()
+            pending_changes.rollback(interface)
+            confirm_pending_changes(interface, pending_changes)
             break
 
+    if watcher:
+        watcher.stop()
+    return interface
+
+
+def restore_from_file(stdscr, interface, file_path):
+    """Show what a backup would change on the node and restore it if confirmed."""
+    try:
+        backup = read_backup(file_path)
+    except (OSError, BackupError) as e:
+        dialog(stdscr, "Can't Restore", str(e))
+        return
+    changes = restore_backup(interface, backup, dry_run=True)["written"]
+    if not changes:
+        dialog(stdscr, "Restore Backup", "The node already matches this backup.")
+        return
+    dialog(stdscr, "Restore Backup", f"Backup of {describe_backup(backup)}\nWould write: {', '.join(changes)}")
+    if get_list_input("Restore these from the backup?", None, ["Yes", "No"]) == "Yes":
+        result = restore_backup(interface, backup)
+        if result["failed"]:
+            dialog(stdscr, "Backup Not Fully Restored", "\n".join(describe_write_results(result["results"])))
+        else:
+            dialog(stdscr, "Restore Backup", "Backup restored to the node.")
+
+
+def confirm_pending_changes(interface, pending_changes):
+    """Offer to apply or discard staged changes before leaving the settings menu."""
+    if not has_pending_changes(pending_changes):
+        return
+    count = len(describe_pending_changes(pending_changes))
+    confirmation = get_list_input(f"Apply {count} staged change(s) before exiting?", None, ["Yes", "No"])
+    if confirmation == "Yes":
+        apply_pending_changes(interface, pending_changes)
+    else:
+        discard_pending_changes(interface, pending_changes)
+
 def set_region(interface):
     node = interface.getNode('^local')
     device_config = node.localConfig
@@ -0,0 +1,136 @@
+import curses
+import time
+
+from ui.colors import get_color
+from ui.control_ui import settings_menu
+from ui.dialog import dialog
+from utilities.config_io import load_profile
+from utilities.drift import resolve_profile
+from utilities.fleet import FleetMonitor, build_targets
+
+dashboard_poll_ms = 250  # How often the table is redrawn while polls are running
+dashboard_refresh_secs = 30  # From the end of one refresh of every node to the start of the next
+
+
+def format_drift(row):
+    if row["drift"] is None:
+        return "-"
+    return "in sync" if not row["drift"] else f"{len(row['drift'])} diff"
+
+
+def format_state(row):
+    if row["state"] == "ok":
+        return f"ok {row['seconds']:.1f}s"
+    if row["state"] in ("connecting", "polling"):
+        return row["state"] + "..."
+    return row["state"]
+
+
+# (heading, width, formatter) for each column of the table
+columns = [
+    ("TARGET", 22, lambda row: row["target"]),
+    ("NODE", 10, lambda row: row["node_id"] or "-"),
+    ("FIRMWARE", 16, lambda row: row["firmware"] or "-"),
+    ("REGION", 8, lambda row: row["region"] or "-"),
+    ("PRESET", 15, lambda row: row["preset"] or "-"),
+    ("CH", 3, lambda row: f"{row['channel_hash']:02x}" if row["channel_hash"] is not None else "-"),
+    ("DRIFT", 8, format_drift),
+    ("STATE", 14, format_state),
+]
+
+
+def format_row(values):
+    return " ".join(f"{value:<{width}.{width}}" for value, (_, width, _) in zip(values, columns))
+
+
+def row_color(row, selected):
+    if row["state"] == "error" or row["drift"]:
+        return get_color("settings_warning", reverse=selected)
+    return get_color("settings_default", reverse=selected)
+
+
+def draw_dashboard(stdscr, monitor, selected, first_row, reference_name):
+    height, width = stdscr.getmaxyx()
+    rows = [monitor.rows[target] for target in monitor.targets]
+
+    stdscr.erase()
+    stdscr.attrset(get_color("window_frame"))
+    stdscr.box()
+
+    ok_count = sum(1 for row in rows if row["state"] == "ok")
+    title = f" Fleet Dashboard  {ok_count}/{len(rows)} nodes"
+    if reference_name:
+        title += f"  reference {reference_name}"
+    if monitor.refresh_seconds is not None:
+        title += f"  refreshed in {monitor.refresh_seconds:.1f}s"
+    stdscr.addstr(1, 2, title[:width - 4], get_color("settings_breadcrumbs", bold=True))
+    stdscr.addstr(3, 2, format_row([heading for heading, _, _ in columns])[:width - 4], get_color("settings_default", bold=True))
+
+    visible = max(1, height - 8)
+    for offset, row in enumerate(rows[first_row:first_row + visible]):
+        index = first_row + offset
+        text = format_row([formatter(row) for _, _, formatter in columns])
+        stdscr.addstr(4 + offset, 2, text[:width - 4], row_color(row, index == selected))
+
+    # Why the selected row is red, then the keys
+    row = rows[selected]
+    if row["error"]:
+        detail = f"{row['target']}: {row['error']}"
+    elif row["drift"]:
+        detail = f"{row['target']} differs from the reference in " + ", ".join(row["drift"])
+    else:
+        detail = ""
+    stdscr.addstr(height - 3, 2, detail[:width - 4], get_color("settings_warning"))
+    stdscr.addstr(height - 2, 2, f"Enter: open settings   r: refresh all (every {dashboard_refresh_secs}s)   Esc: quit"[:width - 4], get_color("settings_note"))
+
+    stdscr.noutrefresh()
+    curses.doupdate()
+
+
+def run_dashboard(stdscr, args):
+    """
+    Connect to every --ports/--hosts target at once and show a live status table,
+    with config drift against the --reference profile if one was given.
+    """
+    reference = load_profile(resolve_profile(args.reference) or args.reference) if args.reference else None
+    monitor = FleetMonitor(build_targets(args.ports, args.hosts), reference, args.partial_profile)
+    monitor.refresh()
+    next_refresh = None  # When the next automatic refresh starts, set once the running one has finished
+    selected = 0
+    first_row = 0
+    stdscr.timeout(dashboard_poll_ms)
+
+    try:
+        while True:
+            if not monitor.busy():
+                if next_refresh is None:
+                    next_refresh = time.monotonic() + dashboard_refresh_secs
+                elif time.monotonic() >= next_refresh:
+                    monitor.refresh()
+                    next_refresh = None
+            visible = max(1, stdscr.getmaxyx()[0] - 8)
+            first_row = min(max(first_row, selected - visible + 1), selected)
+            draw_dashboard(stdscr, monitor, selected, first_row, args.reference)
+
+            key = stdscr.getch()
+            if key == curses.KEY_UP:
+                selected = max(0, selected - 1)
+            elif key == curses.KEY_DOWN:
+                selected = min(len(monitor.targets) - 1, selected + 1)
+            elif key in (curses.KEY_ENTER, 10, 13, curses.KEY_RIGHT):
+                target = monitor.targets[selected]
+                interface = monitor.interfaces.get(target)
+                if interface is None or monitor.rows[target]["state"] != "ok":
+                    dialog(stdscr, "Not Connected", f"{target[1]} isn't connected right now.")
+                    continue
+                monitor.interfaces[target] = settings_menu(stdscr, interface)
+                monitor.refresh([target])  # Pick up whatever was changed in the menu
+            elif key == ord("r"):
+                monitor.refresh()
+                next_refresh = None
+            elif key == curses.KEY_RESIZE:
+                curses.update_lines_cols()
+            elif key in (27, ord("q")):
+                break
+    finally:
+        monitor.close()
@@ -9,6 +9,7 @@ parent_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
 # Paths
 json_file_path = os.path.join(parent_dir, "config.json")
 log_file_path = os.path.join(parent_dir, "client.log")
+timing_file_path = os.path.join(parent_dir, "timing.jsonl")
 db_file_path = os.path.join(parent_dir, "client.db")
 
 def format_json_single_line_arrays(data, indent=4):
@@ -120,6 +121,7 @@ def initialize_config():
     default_config_variables = {
         "db_file_path": db_file_path,
         "log_file_path": log_file_path,
+        "timing_file_path": timing_file_path,
         "message_prefix": ">>",
         "sent_message_prefix": ">> Sent",
         "notification_symbol": "*",
@@ -158,13 +160,14 @@ def initialize_config():
 def assign_config_variables(loaded_config):
     # Assign values to local variables
     
-    global db_file_path, log_file_path, message_prefix, sent_message_prefix
+    global db_file_path, log_file_path, timing_file_path, message_prefix, sent_message_prefix
     global notification_symbol, ack_implicit_str, ack_str, nak_str, ack_unknown_str
     global theme, COLOR_CONFIG
     global node_sort
 
     db_file_path = loaded_config["db_file_path"]
     log_file_path = loaded_config["log_file_path"]
+    timing_file_path = loaded_config["timing_file_path"]
     message_prefix = loaded_config["message_prefix"]
     sent_message_prefix = loaded_config["sent_message_prefix"]
     notification_symbol = loaded_config["notification_symbol"]
@@ -195,6 +198,7 @@ if __name__ == "__main__":
     print("\nLoaded Configuration:")
     print(f"Database File Path: {db_file_path}")
     print(f"Log File Path: {log_file_path}")
+    print(f"Timing File Path: {timing_file_path}")
     print(f"Message Prefix: {message_prefix}")
     print(f"Sent Message Prefix: {sent_message_prefix}")
     print(f"Notification Symbol: {notification_symbol}")
@@ -1,4 +1,3 @@
-from collections import OrderedDict
 from meshtastic.protobuf import config_pb2, module_config_pb2, channel_pb2
 import logging
 import base64
@@ -13,6 +12,62 @@ def encode_if_bytes(value):
         return base64.b64encode(value).decode('utf-8')
     return value
 
+class _Deferred:
+    __slots__ = ("loader",)
+
+    def __init__(self, loader):
+        self.loader = loader
+
+
+class LazyMenu(dict):
+    """
+    A menu level whose submenus are built the first time they are opened and then memoized.
+    Listing the keys never triggers a load, so drawing a menu only costs its own rows.
+    """
+
+    def set_loader(self, key, loader):
+        super().__setitem__(key, _Deferred(loader))
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, _Deferred):
+            value = value.loader()
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+
+def peek_menu_item(menu, key):
+    """Return a menu entry without building it. Unbuilt submenus come back as a placeholder, not a tuple."""
+    return dict.get(menu, key)
+
+
+def menu_values(menu, path=()):
+    """Flatten a menu into {path tuple: value} for every setting, building submenus as needed."""
+    values = {}
+    for key in menu:
+        item = menu[key]
+        if isinstance(item, dict):
+            values.update(menu_values(item, path + (key,)))
+        elif isinstance(item, tuple):
+            values[path + (key,)] = item[1]
+    return values
+
+
+def changed_menu_paths(old_menu, new_menu):
+    """Return the paths in new_menu whose value differs from (or is missing in) old_menu."""
+    old_values = menu_values(old_menu)
+    return {path for path, value in menu_values(new_menu).items() if path not in old_values or old_values[path] != value}
+
+
 def extract_fields(message_instance, current_config=None):
     if isinstance(current_config, dict):  # Handle dictionaries
         return {key: (None, encode_if_bytes(current_config.get(key, "Not Set"))) for key in current_config}
@@ -20,17 +75,17 @@ def extract_fields(message_instance, current_config=None):
     if not hasattr(message_instance, "DESCRIPTOR"):
         return {}
     
-    menu = {}
+    menu = LazyMenu()
     fields = message_instance.DESCRIPTOR.fields
     for field in fields:
         skip_fields = ["sessionkey", "ChannelSettings.channel_num", "ChannelSettings.id", "LoRaConfig.ignore_incoming", "DeviceUIConfig.version"]
         if any(skip_field in field.full_name for skip_field in skip_fields):
             continue
 
-        if field.message_type:  # Nested message
+        if field.message_type:  # Nested message, extracted when first opened
             nested_instance = getattr(message_instance, field.name)
             nested_config = getattr(current_config, field.name, None) if current_config else None
-            menu[field.name] = extract_fields(nested_instance, nested_config)
+            menu.set_loader(field.name, lambda i=nested_instance, c=nested_config: extract_fields(i, c))
         elif field.enum_type:  # Handle enum fields
             current_value = getattr(current_config, field.name, "Not Set") if current_config else "Not Set"
             if isinstance(current_value, int):  # If the value is a number, map it to its name
@@ -47,8 +102,47 @@ def extract_fields(message_instance, current_config=None):
             menu[field.name] = (field, encode_if_bytes(current_value))
     return menu
 
+def add_position_fields(position_menu, current_node_info):
+    """Insert the node's Lat/Lon/Alt right after fixed_position in the position menu."""
+    position = (current_node_info or {}).get("position", {})
+    position_data = {
+        "latitude": (None, position.get("latitude", 0.0)),
+        "longitude": (None, position.get("longitude", 0.0)),
+        "altitude": (None, position.get("altitude", 0))
+    }
+
+    ordered_position_menu = LazyMenu()
+    for key in position_menu:
+        ordered_position_menu[key] = peek_menu_item(position_menu, key)
+        if key == "fixed_position":  # Insert Lat/Lon/Alt **right here**
+            ordered_position_menu.update(position_data)
+
+    return ordered_position_menu
+
+
+def generate_radio_menu(interface, current_node_info):
+    radio = config_pb2.Config()
+    current_radio_config = interface.localNode.localConfig if interface else None
+    radio_menu = extract_fields(radio, current_radio_config)
+    if "position" in radio_menu:
+        radio_menu.set_loader("position", lambda: add_position_fields(
+            extract_fields(radio.position, getattr(current_radio_config, "position", None)), current_node_info))
+    return radio_menu
+
+
+def generate_channels_menu(interface):
+    channels_menu = LazyMenu()
+    channel = channel_pb2.ChannelSettings()
+    if interface:
+        for i, current_channel in enumerate((interface.localNode.channels or [])[:8]):
+            channels_menu.set_loader(f"Channel {i + 1}", lambda c=current_channel: extract_fields(channel, c.settings))
+        channels_menu["Edit All Channels"] = None
+    return channels_menu
+
+
 def generate_menu_from_protobuf(interface):
-    menu_structure = {"Main Menu": {}}
+    """Build the top level of the settings menu. Submenus are only extracted from the protobufs when opened."""
+    menu_structure = {"Main Menu": LazyMenu()}
 
     # Add User Settings
     current_node_info = interface.getMyNodeInfo() if interface else None
@@ -68,53 +162,24 @@ def generate_menu_from_protobuf(interface):
         logging.info("Node Info not available")
         menu_structure["Main Menu"]["User Settings"] = "Node Info not available"
 
-    # Add Channels
-    channel = channel_pb2.ChannelSettings()
-    menu_structure["Main Menu"]["Channels"] = {}
-    if interface:
-        for i in range(8):
-            current_channel = interface.localNode.getChannelByChannelIndex(i)
-            if current_channel:
-                channel_config = extract_fields(channel, current_channel.settings)
-                menu_structure["Main Menu"]["Channels"][f"Channel {i + 1}"] = channel_config
-
-    # Add Radio Settings
-    radio = config_pb2.Config()
-    current_radio_config = interface.localNode.localConfig if interface else None
-    menu_structure["Main Menu"]["Radio Settings"] = extract_fields(radio, current_radio_config)
-
-    # Add Lat/Lon/Alt
-    position_data = {
-        "latitude": (None, current_node_info["position"].get("latitude", 0.0)),
-        "longitude": (None, current_node_info["position"].get("longitude", 0.0)),
-        "altitude": (None, current_node_info["position"].get("altitude", 0))
-    }
-
-    existing_position_menu = menu_structure["Main Menu"]["Radio Settings"].get("position", {})
-    ordered_position_menu = OrderedDict()
-
-    for key, value in existing_position_menu.items():
-        if key == "fixed_position":  # Insert before or after a specific key
-            ordered_position_menu[key] = value
-            ordered_position_menu.update(position_data)  # Insert Lat/Lon/Alt **right here**
-        else:
-            ordered_position_menu[key] = value
-
-    menu_structure["Main Menu"]["Radio Settings"]["position"] = ordered_position_menu
+    # Add Channels, Radio Settings (with Lat/Lon/Alt) and Module Settings
+    menu_structure["Main Menu"].set_loader("Channels", lambda: generate_channels_menu(interface))
+    menu_structure["Main Menu"].set_loader("Radio Settings", lambda: generate_radio_menu(interface, current_node_info))
 
-    # Add Module Settings
     module = module_config_pb2.ModuleConfig()
     current_module_config = interface.localNode.moduleConfig if interface else None
-    menu_structure["Main Menu"]["Module Settings"] = extract_fields(module, current_module_config)
+    menu_structure["Main Menu"].set_loader("Module Settings", lambda: extract_fields(module, current_module_config))
 
     # # Add App Settings
     # menu_structure["Main Menu"]["App Settings"] = {"Open": "app_settings"}
 
     # Additional settings options
     menu_structure["Main Menu"].update({
+        "Apply Changes": None,
         "Export Config File": None,
         "Load Config File": None,
         "Config URL": None,
+        "Admin Timing": None,
         "Reboot": None,
         "Reset Node DB": None,
         "Shutdown": None,
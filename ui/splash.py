@@ -1,6 +1,8 @@
 import curses
 from ui.colors import get_color
 
+splash_poll_secs = 0.1
+
 def draw_splash(stdscr):
     curses.curs_set(0)
 
@@ -24,4 +26,45 @@ def draw_splash(stdscr):
     stdscr.attrset(get_color("window_frame"))
     stdscr.box()
     stdscr.refresh()
-    curses.napms(500)
\ No newline at end of file
+
+
+def draw_progress(stdscr, progress):
+    """Redraw the status lines under the logo with what has arrived so far."""
+    from utilities.loader import config_sections, module_sections  # Not at the top: the splash goes up before meshtastic loads
+    height, width = stdscr.getmaxyx()
+    start_y = height // 2 - 1
+    config_count, module_count = progress.counts()
+
+    if progress.packets == 0:
+        lines = ["connecting..."]
+    else:
+        lines = [
+            "loading node config...",
+            f"{progress.bytes_received / 1024:.1f} kB in {progress.packets} packets",
+            f"config {config_count}/{len(config_sections)}  modules {module_count}/{len(module_sections)}  "
+            f"channels {len(progress.channels)}  nodes {progress.nodes}",
+        ]
+
+    for offset, line in enumerate(lines):
+        y = start_y + 4 + offset
+        if y >= height - 1:
+            break
+        stdscr.move(y, 1)
+        stdscr.clrtoeol()
+        stdscr.addstr(y, max(1, width // 2 - len(line) // 2), line[:width - 2], get_color("splash_text"))
+
+    stdscr.attrset(get_color("window_frame"))
+    stdscr.box()
+    stdscr.refresh()
+
+
+def wait_on_splash(stdscr, connection, ready):
+    """
+    Keep the splash up with live progress until ready() is true or the connection finishes.
+    The download itself runs on the connection's worker thread.
+    """
+    while not connection.done.wait(splash_poll_secs):
+        draw_progress(stdscr, connection.progress)
+        if ready():
+            return
+    draw_progress(stdscr, connection.progress)
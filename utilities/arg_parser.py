@@ -33,5 +33,145 @@ def setup_parser():
         default=None,
         const="any"
     )
+    conn.add_argument(
+        "--mock",
+        help="Connect to a simulated in-process node instead of a radio, for testing and benchmarking.",
+        action="store_true",
+    )
+    connOuter.add_argument(
+        "--mock-latency",
+        help="Seconds each admin message to the simulated node takes.",
+        type=float,
+        default=0.0,
+    )
+    connOuter.add_argument(
+        "--mock-failure-rate",
+        help="Probability (0-1) that the simulated node drops an admin message.",
+        type=float,
+        default=0.0,
+    )
+    connOuter.add_argument(
+        "--dest",
+        help="Configure this node over the mesh, through the one you're connected to: a node id like `!a1b2c3d4`, or its long or short name.",
+        metavar="NODE",
+        default=None,
+    )
+    connOuter.add_argument(
+        "--admin-interval",
+        help="Minimum seconds between admin messages to a --dest node, so the mesh isn't flooded. Defaults to 3.",
+        metavar="SECONDS",
+        type=float,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--lang",
+        help="Language for menu names and help text, e.g. `de`. Defaults to the system locale, then English.",
+        default=None,
+    )
+    parser.add_argument(
+        "--watch",
+        help="Follow changes other apps make to the node while the settings menu is open, asking the node for its config SECONDS after each poll finishes (30 if not given; 0 only listens). A --dest node is polled at most every 600 seconds. Changed rows are highlighted.",
+        metavar="SECONDS",
+        type=float,
+        nargs="?",
+        const=30.0,
+        default=None,
+    )
+
+    fleet = parser.add_argument_group('Provisioning', 'Import one YAML profile into many nodes without the interactive UI.')
+    fleet.add_argument(
+        "--provision",
+        help="The YAML profile to import into every target node.",
+        metavar="PROFILE",
+        default=None,
+    )
+    fleet.add_argument(
+        "--ports",
+        help="Serial ports of the nodes to provision or monitor, e.g. `/dev/ttyUSB0 /dev/ttyUSB1`.",
+        nargs="+",
+        default=[],
+    )
+    fleet.add_argument(
+        "--hosts",
+        help="Hostnames or IP addresses of the nodes to provision or monitor over TCP.",
+        nargs="+",
+        default=[],
+    )
+    fleet.add_argument(
+        "--workers",
+        help="Maximum number of nodes to provision at the same time.",
+        type=int,
+        default=8,
+    )
+    fleet.add_argument(
+        "--validate",
+        help="Check YAML profiles against the config schema without connecting to a device.",
+        metavar="PROFILE",
+        nargs="+",
+        default=None,
+    )
+    fleet.add_argument(
+        "--dry-run",
+        help="With --validate, --provision or --restore, print the writes that would be made instead of sending them.",
+        action="store_true",
+    )
+
+    export = parser.add_argument_group('Export and backup', 'Save or restore the connected node\'s config without the interactive UI.')
+    export.add_argument(
+        "--export",
+        help="Write the config to this file, or `-` for stdout, and exit.",
+        metavar="FILE",
+        default=None,
+    )
+    export.add_argument(
+        "--format",
+        help="Export format. Defaults to the --export file extension (.yaml, .json, .pb), else yaml.",
+        choices=["yaml", "json", "protobuf"],
+        default=None,
+    )
+    export.add_argument(
+        "--sections",
+        help="Only export these sections, e.g. `owner lora mqtt` or `config.lora`. Defaults to everything.",
+        nargs="+",
+        default=None,
+    )
+
+    export.add_argument(
+        "--backup",
+        help="Write a checksummed binary backup of the config, channels and owner to this file, and exit.",
+        metavar="FILE",
+        default=None,
+    )
+    export.add_argument(
+        "--restore",
+        help="Restore a --backup file, writing only what differs from the node, and exit.",
+        metavar="FILE",
+        default=None,
+    )
+
+    dashboard = parser.add_argument_group('Fleet monitoring', 'Watch many nodes at once; the nodes come from --ports and --hosts.')
+    dashboard.add_argument(
+        "--dashboard",
+        help="Show a live status table of every target node instead of a single node's settings.",
+        action="store_true",
+    )
+    dashboard.add_argument(
+        "--reference",
+        help="A golden profile, by path or by name in node-configs/, to report each node's config drift against on the dashboard.",
+        metavar="PROFILE",
+        default=None,
+    )
+    dashboard.add_argument(
+        "--drift",
+        help="Check the --ports/--hosts nodes, or the connected node, against a golden profile and print a JSON drift report.",
+        metavar="PROFILE",
+        default=None,
+    )
+    dashboard.add_argument(
+        "--partial-profile",
+        help="Check only the fields the --drift or --reference profile sets, instead of every field of each section it names.",
+        action="store_true",
+    )
 
     return parser
\ No newline at end of file
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import time
+
+from google.protobuf.json_format import ParseDict
+from google.protobuf.message import DecodeError
+from meshtastic.protobuf import channel_pb2, localonly_pb2, mesh_pb2
+
+from utilities.save_to_radio import admin_message, describe_write_results, send_transaction
+
+# Binary node backups. The raw protobuf messages go into a small container, so bytes fields like
+# psk and admin_key round-trip exactly and restoring is a ParseFromString instead of a walk
+# through setPref. Layout:
+#
+#   header   magic "MTBK", format version (u16), payload length (u32), sha256 of the payload
+#   payload  records of tag (u8), length (u32), bytes
+#
+# Readers skip record tags they don't know, so new records don't need a version bump.
+# Bump backup_version only when existing records change meaning.
+
+backup_magic = b"MTBK"
+backup_version = 1
+backup_extension = ".mtbak"
+
+_header = struct.Struct("<4sHI32s")
+_record = struct.Struct("<BI")
+
+record_info = 1            # JSON: node id, firmware, time of the backup
+record_local_config = 2    # LocalConfig
+record_module_config = 3   # LocalModuleConfig
+record_channel = 4         # Channel, one record per channel slot
+record_owner = 5           # User
+
+
+class BackupError(ValueError):
+    """Raised when a backup is truncated, fails its checksum or has an unknown format version."""
+
+
+def is_backup(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(backup_magic)) == backup_magic
+    except OSError:
+        return False
+
+
+def _owner(interface):
+    user = ParseDict(interface.getMyUser() or {}, mesh_pb2.User(), ignore_unknown_fields=True)
+    return mesh_pb2.User(long_name=user.long_name, short_name=user.short_name, is_licensed=user.is_licensed)
+
+
+def create_backup(interface):
+    """Return the node's config, module config, channels and owner as backup bytes."""
+    node = interface.localNode
+    metadata = getattr(interface, "metadata", None)
+    info = {
+        "node_id": (interface.getMyUser() or {}).get("id"),
+        "firmware": metadata.firmware_version if metadata else None,
+        "saved_at": int(time.time()),
+    }
+
+    records = [
+        (record_info, json.dumps(info).encode("utf-8")),
+        (record_owner, _owner(interface).SerializeToString()),
+        (record_local_config, node.localConfig.SerializeToString()),
+        (record_module_config, node.moduleConfig.SerializeToString()),
+    ]
+    records += [(record_channel, channel.SerializeToString()) for channel in node.channels or []]
+
+    payload = b"".join(_record.pack(tag, len(data)) + data for tag, data in records)
+    return _header.pack(backup_magic, backup_version, len(payload), hashlib.sha256(payload).digest()) + payload
+
+
+def write_backup(interface, path):
+    data = create_backup(interface)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)  # Never leave a half-written backup behind
+    return len(data)
+
+
+def parse_backup(data):
+    """
+    Check and decode backup bytes.
+    :return: Dict with info, owner, local_config, module_config and channels
+    :raises BackupError: If the data isn't an intact backup this version can read
+    """
+    if len(data) < _header.size:
+        raise BackupError("file is too short to be a backup")
+    magic, version, length, digest = _header.unpack_from(data)
+    if magic != backup_magic:
+        raise BackupError("not a backup file")
+    if version > backup_version:
+        raise BackupError(f"backup format {version} is newer than this version of the app understands ({backup_version})")
+    payload = data[_header.size:_header.size + length]
+    if len(payload) != length:
+        raise BackupError("backup is truncated")
+    if hashlib.sha256(payload).digest() != digest:
+        raise BackupError("backup checksum does not match, the file is corrupt")
+
+    backup = {
+        "info": {},
+        "owner": mesh_pb2.User(),
+        "local_config": localonly_pb2.LocalConfig(),
+        "module_config": localonly_pb2.LocalModuleConfig(),
+        "channels": [],
+    }
+    offset = 0
+    try:
+        while offset < length:
+            tag, size = _record.unpack_from(payload, offset)
+            offset += _record.size
+            chunk = payload[offset:offset + size]
+            offset += size
+            if tag == record_info:
+                backup["info"] = json.loads(chunk)
+            elif tag == record_owner:
+                backup["owner"].ParseFromString(chunk)
+            elif tag == record_local_config:
+                backup["local_config"].ParseFromString(chunk)
+            elif tag == record_module_config:
+                backup["module_config"].ParseFromString(chunk)
+            elif tag == record_channel:
+                backup["channels"].append(channel_pb2.Channel.FromString(chunk))
+    except (struct.error, DecodeError, ValueError) as e:
+        raise BackupError(f"backup is damaged: {e}") from None
+    return backup
+
+
+def read_backup(path):
+    with open(path, "rb") as f:
+        return parse_backup(f.read())
+
+
+def backup_diff(interface, backup):
+    """
+    Compare a backup with the node.
+    :return: The parts that differ, as "owner", "config.<section>", "module_config.<section>" or "channel <index>"
+    """
+    node = interface.localNode
+    changes = []
+
+    current_owner = _owner(interface)
+    if backup["owner"].long_name and backup["owner"] != current_owner:
+        changes.append("owner")
+
+    for key, restored, current in (
+        ("config", backup["local_config"], node.localConfig),
+        ("module_config", backup["module_config"], node.moduleConfig),
+    ):
+        for field in restored.DESCRIPTOR.fields:
+            if field.message_type is not None and getattr(restored, field.name) != getattr(current, field.name):
+                changes.append(f"{key}.{field.name}")
+
+    current_channels = node.channels or []
+    for channel in backup["channels"]:
+        if channel.index < len(current_channels) and current_channels[channel.index] != channel:
+            changes.append(f"channel {channel.index}")
+    return changes
+
+
+def restore_backup(interface, backup, dry_run=False):
+    """
+    Write only the parts of the backup that differ from the node, in one settings transaction.
+    :return: Dict with the written changes (all of them with dry_run), those the node didn't confirm,
+        the write results from send_transaction() and the node id the backup was taken from
+    """
+    changes = backup_diff(interface, backup)
+    result = {"written": changes, "failed": [], "results": [], "source": backup["info"].get("node_id")}
+    if result["source"] and result["source"] != (interface.getMyUser() or {}).get("id") and "config.security" in changes:
+        changes.remove("config.security")  # Another node's keys would give this node its identity
+        logging.warning(f"Not restoring the security keys of {result['source']} onto a different node")
+    if dry_run or not changes:
+        return result
+
+    node = interface.localNode
+    writes = []
+    for change in changes:
+        if change == "owner":
+            owner = backup["owner"]
+            p = admin_message(node, "owner", (owner.long_name, owner.short_name, owner.is_licensed))
+            writes.append(("User settings", "setOwner", p, None))
+        elif change.startswith("channel "):
+            channel = next(c for c in backup["channels"] if c.index == int(change.split()[1]))
+            node.channels[channel.index].CopyFrom(channel)
+            writes.append((f"Channel {channel.index + 1}", "writeChannel", admin_message(node, "channel", channel.index), change))
+        else:
+            key, section = change.split(".")
+            restored = backup["local_config"] if key == "config" else backup["module_config"]
+            current = node.localConfig if key == "config" else node.moduleConfig
+            getattr(current, section).CopyFrom(getattr(restored, section))
+            writes.append((f"Config: {section}", "writeConfig", admin_message(node, "section", section), section))
+
+    result["results"] = send_transaction(node, writes)
+    committed = result["results"][-1]["status"] == "ok"
+    result["written"] = [change for change, write in zip(changes, result["results"][1:-1]) if committed and write["status"] == "ok"]
+    result["failed"] = [change for change in changes if change not in result["written"]]
+    if result["failed"]:
+        logging.error(f"Restore from backup of {result['source']} not confirmed for {', '.join(result['failed'])}")
+    else:
+        logging.info(f"Restored {', '.join(changes)} from backup of {result['source']}")
+    return result
+
+
+def describe_backup(backup):
+    info = backup["info"]
+    saved_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(info["saved_at"])) if info.get("saved_at") else "unknown time"
+    return f"{info.get('node_id') or 'unknown node'}, firmware {info.get('firmware') or 'unknown'}, saved {saved_at}"
+
+
+def run_backup(args):
+    """Headless entry point for --backup. Returns a process exit code."""
+    from utilities.interfaces import initialize_interface
+
+    interface = initialize_interface(args)
+    if interface is None:
+        print("Could not connect to a node", file=sys.stderr)
+        return 1
+    try:
+        size = write_backup(interface, args.backup)
+    except OSError as e:
+        print(f"Could not write {args.backup}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        interface.close()
+    print(f"Backed up to {args.backup} ({size} bytes)")
+    return 0
+
+
+def run_restore(args):
+    """Headless entry point for --restore. With --dry-run, only lists what would be written."""
+    from utilities.interfaces import initialize_interface
+
+    try:
+        backup = read_backup(args.restore)
+    except (OSError, BackupError) as e:
+        print(f"Can't restore {args.restore}: {e}", file=sys.stderr)
+        return 2
+
+    interface = initialize_interface(args)
+    if interface is None:
+        print("Could not connect to a node", file=sys.stderr)
+        return 1
+    try:
+        print(f"Backup of {describe_backup(backup)}")
+        result = restore_backup(interface, backup, dry_run=args.dry_run)
+    finally:
+        interface.close()
+
+    if result["failed"]:
+        print("\n".join(describe_write_results(result["results"])), file=sys.stderr)
+        print(f"Not restored: {', '.join(result['failed'])}", file=sys.stderr)
+        return 1
+    if not result["written"]:
+        print("The node already matches the backup")
+    else:
+        print(f"{'Would write' if args.dry_run else 'Wrote'}: {', '.join(result['written'])}")
+    return 0
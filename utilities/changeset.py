@@ -0,0 +1,264 @@
+import base64
+
+from google.protobuf.descriptor import FieldDescriptor
+
+# Staged settings edits as a change set of field changes. Each change is keyed by the path of the
+# field it sets, spelled with protobuf field names from the root it lives under:
+#
+#   ("config", "lora", "hop_limit")              LocalConfig
+#   ("config", "network", "ipv4_config", "ip")   fields of nested messages continue the path
+#   ("module_config", "mqtt", "address")         LocalModuleConfig
+#   ("channel", 0, "settings", "psk")            Channel, by index
+#   ("owner", "long_name")                       the node's user
+#   ("position", "latitude")                     the node's fixed position
+#
+# Changes are applied to the in-memory config as they are recorded, in steps that undo and redo
+# as one. New steps are drafts until stage() is called, and rollback() drops the drafts again.
+# The writes to send follow from the paths alone: one writeConfig per section and one
+# writeChannel per channel whose fields end up different from where they started, so an edit
+# that was changed back or undone sends nothing.
+
+owner_keys = {"long_name": "longName", "short_name": "shortName", "is_licensed": "isLicensed"}
+position_keys = ("latitude", "longitude", "altitude")
+
+
+def format_path(path):
+    return ".".join(str(part) for part in path)
+
+
+def _field_parent(interface, path):
+    """The object holding the field at path and the field's name in it: a protobuf message, or a dict for owner and position."""
+    root = path[0]
+    if root == "owner":
+        return interface.getMyNodeInfo().setdefault("user", {}), owner_keys[path[1]]
+    if root == "position":
+        return interface.getMyNodeInfo().setdefault("position", {}), path[1]
+
+    node = interface.localNode
+    if root == "config":
+        parent, rest = node.localConfig, path[1:]
+    elif root == "module_config":
+        parent, rest = node.moduleConfig, path[1:]
+    elif root == "channel":
+        parent, rest = node.channels[path[1]], path[2:]
+    else:
+        raise KeyError(f"Unknown settings path {format_path(path)}")
+    for name in rest[:-1]:
+        parent = getattr(parent, name)
+    return parent, rest[-1]
+
+
+def read_field(interface, path):
+    parent, name = _field_parent(interface, path)
+    if isinstance(parent, dict):
+        return parent.get(name)
+    value = getattr(parent, name)
+    if parent.DESCRIPTOR.fields_by_name[name].label == FieldDescriptor.LABEL_REPEATED:
+        return list(value)
+    return value
+
+
+def write_field(interface, path, value):
+    parent, name = _field_parent(interface, path)
+    if isinstance(parent, dict):
+        if value is None:
+            parent.pop(name, None)
+        else:
+            parent[name] = value
+        return
+
+    field = parent.DESCRIPTOR.fields_by_name[name]
+
+    def coerce(item):
+        # Bytes fields are shown and typed as base64
+        return base64.b64decode(item) if field.type == FieldDescriptor.TYPE_BYTES and isinstance(item, str) else item
+
+    if field.label == FieldDescriptor.LABEL_REPEATED:
+        repeated = getattr(parent, name)
+        del repeated[:]
+        repeated.extend(coerce(item) for item in value)
+    else:
+        setattr(parent, name, coerce(value))
+
+
+def write_key(path):
+    """The write that sends a path to the node: ("section", name), ("channel", index), ("owner", None) or ("position", None)."""
+    if path[0] in ("config", "module_config"):
+        return "section", path[1]
+    if path[0] == "channel":
+        return "channel", path[1]
+    return path[0], None
+
+
+class FieldChange:
+    """One field set to a new value, with the value it replaced."""
+    __slots__ = ("path", "old", "new")
+
+    def __init__(self, path, old, new):
+        self.path = path
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        return f"FieldChange({format_path(self.path)}: {self.old!r} -> {self.new!r})"
+
+
+class ChangeSet:
+    """
+    Field changes staged against one node, with undo and redo.
+    Steps are tuples of FieldChange; baseline holds each path's value from before its first change.
+    """
+    __slots__ = ("steps", "redo_steps", "baseline", "drafts")
+
+    def __init__(self):
+        self.steps = []
+        self.redo_steps = []  # (step, was a draft), most recently undone last
+        self.baseline = {}
+        self.drafts = 0       # How many of the newest steps haven't been staged yet
+
+    def __len__(self):
+        return len(self.steps)
+
+    def record(self, interface, values):
+        """
+        Set fields on the in-memory config as one step.
+        :param values: {path: new value}
+        :return: The step, or None if every field already had its value
+        """
+        step = []
+        try:
+            for path, value in values.items():
+                old = read_field(interface, path)
+                write_field(interface, path, value)
+                new = read_field(interface, path)  # As stored, e.g. float32 or decoded bytes
+                if new == old:
+                    continue
+                step.append(FieldChange(path, old, new))
+                self.baseline.setdefault(path, old)
+        except Exception:
+            for change in reversed(step):  # Don't leave half a step applied
+                write_field(interface, change.path, change.old)
+            raise
+        if not step:
+            return None
+        self.steps.append(tuple(step))
+        self.redo_steps.clear()
+        self._prune()
+        self.drafts += 1
+        return self.steps[-1]
+
+    def _prune(self):
+        """Drop the baselines of paths no step or redo step sets any more."""
+        used = {change.path for step in self.steps + [step for step, _ in self.redo_steps] for change in step}
+        for path in [path for path in self.baseline if path not in used]:
+            del self.baseline[path]
+
+    def stage(self):
+        """Keep the draft steps; rollback() won't drop them any more."""
+        self.drafts = 0
+
+    def rollback(self, interface):
+        """Undo and forget the draft steps. Returns how many steps were dropped."""
+        dropped = self.drafts
+        if not dropped:
+            return 0
+        for _ in range(dropped):
+            for change in reversed(self.steps.pop()):
+                write_field(interface, change.path, change.old)
+        self.drafts = 0
+        self.redo_steps.clear()
+        self._prune()
+        return dropped
+
+    def undo(self, interface):
+        if not self.steps:
+            return None
+        step = self.steps.pop()
+        for change in reversed(step):
+            write_field(interface, change.path, change.old)
+        self.redo_steps.append((step, self.drafts > 0))
+        self.drafts = max(0, self.drafts - 1)
+        return step
+
+    def redo(self, interface):
+        if not self.redo_steps:
+            return None
+        step, draft = self.redo_steps.pop()
+        for change in step:
+            write_field(interface, change.path, change.new)
+        self.steps.append(step)
+        self.drafts += draft
+        return step
+
+    def expected(self):
+        """Every path's value once the steps are applied: {path: value}."""
+        values = dict(self.baseline)
+        for step in self.steps:
+            for change in step:
+                values[change.path] = change.new
+        return values
+
+    def changed_paths(self):
+        """The paths whose value differs from their baseline, in the order they were first changed."""
+        return [path for path, value in self.expected().items() if value != self.baseline[path]]
+
+    def writes(self):
+        """
+        The minimal writes that send the changes: (kind, key) as from write_key(), owner first,
+        then sections and channels in the order they were first changed, fixed position last.
+        """
+        keys = list(dict.fromkeys(write_key(path) for path in self.changed_paths()))
+        order = {"owner": 0, "section": 1, "channel": 2, "position": 3}
+        return sorted(keys, key=lambda key: order[key[0]])  # sorted() is stable
+
+    def paths_for(self, kind, key):
+        return [path for path in self.baseline if write_key(path) == (kind, key)]
+
+    def conflicts(self, interface):
+        """
+        Staged fields that were changed since by something else, like a loaded config file or a new channel URL.
+        :return: [(path, staged value, current value)]
+        """
+        expected = self.expected()
+        current = {path: read_field(interface, path) for path in self.changed_paths()}
+        return [(path, expected[path], value) for path, value in current.items() if value != expected[path]]
+
+    def rebase(self, path, value):
+        """The node's value of a staged path changed under us: diff the staged value against the new one from now on."""
+        self.baseline[path] = value
+        for step in self.steps + [step for step, _ in reversed(self.redo_steps)]:  # Oldest first
+            for change in step:
+                if change.path == path:
+                    change.old = value
+                    return
+
+    def reapply(self, interface, paths):
+        """Put the staged values back over whatever changed them since."""
+        expected = self.expected()
+        for path in paths:
+            write_field(interface, path, expected[path])
+
+    def forget(self, paths):
+        """Stop tracking paths, e.g. once the node has them, keeping their current values. Clears redo."""
+        paths = set(paths)
+        for path in paths:
+            self.baseline.pop(path, None)
+        kept = []
+        for index, step in enumerate(self.steps):
+            step = tuple(change for change in step if change.path not in paths)
+            if step:
+                kept.append(step)
+            elif index >= len(self.steps) - self.drafts:
+                self.drafts -= 1
+        self.steps = kept
+        self.redo_steps.clear()
+        self._prune()
+
+    def discard(self, interface):
+        """Put every changed field back to its baseline and empty the change set."""
+        for path, value in self.baseline.items():
+            write_field(interface, path, value)
+        self.steps.clear()
+        self.redo_steps.clear()
+        self.baseline.clear()
+        self.drafts = 0
@@ -0,0 +1,68 @@
+import base64
+
+from meshtastic.protobuf import apponly_pb2, channel_pb2
+
+from utilities.drift import field_diff
+
+# Channel sets and their share URLs, for editing every channel at once. A URL holds the enabled
+# channels in slot order plus the LoRa config, but not which slot each one is in: disabled slots
+# are left out, so url_slots() keeps track of that.
+
+psk_names = {0: "none", 1: "default", 16: "AES128", 32: "AES256"}
+
+
+def psk_label(psk):
+    """Short description of a channel key: none, default, default+N for the simple keys, AES128 or AES256."""
+    if len(psk) == 1 and psk[0] > 1:
+        return f"default+{psk[0] - 1}"
+    return psk_names.get(len(psk), f"{len(psk)} bytes")
+
+
+def parse_channel_url(url):
+    """
+    Decode a channel URL the way Node.setURL does.
+    :raises ValueError: If the URL holds no channel set
+    """
+    encoded = url.split("#")[-1] if "#" in url else ""
+    if not encoded:
+        raise ValueError(f"Not a channel URL: {url}")
+    encoded += "=" * (-len(encoded) % 4)
+    channel_set = apponly_pb2.ChannelSet()
+    try:
+        channel_set.ParseFromString(base64.urlsafe_b64decode(encoded))
+    except Exception as e:
+        raise ValueError(f"Not a channel URL: {e}") from None
+    return channel_set
+
+
+def url_slots(channels):
+    """The channel slot of each entry in the URL of channels: Node.getURL() lists the enabled ones in slot order."""
+    return [slot for slot, channel in enumerate(channels) if channel.role != channel_pb2.Channel.Role.DISABLED]
+
+
+def channel_set_diff(old_url, new_url, old_slots=None, new_slots=None):
+    """
+    Compare two channel URLs channel slot by channel slot.
+    :param old_slots: The slot of each entry in old_url, from url_slots(); without it the entries
+        fill slots 0, 1, 2... the way setURL writes them. The same goes for new_slots.
+    :return: Lines like "Channel 2 added", "Channel 1 name: 'a' -> 'b'" or "LoRa hop_limit: 3 -> 5"
+    """
+    old, new = parse_channel_url(old_url), parse_channel_url(new_url)
+    old_settings = dict(zip(old_slots if old_slots is not None else range(len(old.settings)), old.settings))
+    new_settings = dict(zip(new_slots if new_slots is not None else range(len(new.settings)), new.settings))
+    lines = []
+    for slot in sorted(old_settings.keys() | new_settings.keys()):
+        label = f"Channel {slot + 1}"
+        if slot not in old_settings:
+            lines.append(f"{label} added: {new_settings[slot].name or '(no name)'}, key {psk_label(new_settings[slot].psk)}")
+        elif slot not in new_settings:
+            lines.append(f"{label} removed: {old_settings[slot].name or '(no name)'}")
+        else:
+            for change in field_diff(old_settings[slot], new_settings[slot]):
+                if change["field"] == "psk":
+                    lines.append(f"{label} key: {psk_label(old_settings[slot].psk)} -> {psk_label(new_settings[slot].psk)}")
+                else:
+                    lines.append(f"{label} {change['field']}: {change['expected']!r} -> {change['actual']!r}")
+    for change in field_diff(old.lora_config, new.lora_config):
+        lines.append(f"LoRa {change['field']}: {change['expected']!r} -> {change['actual']!r}")
+    return lines
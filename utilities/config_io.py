@@ -1,16 +1,24 @@
 
-import yaml
+import io
+import json
 import logging
+import os
+import sys
+from collections import namedtuple
+from functools import lru_cache
 from typing import List
 from google.protobuf.json_format import MessageToDict
 from meshtastic import BROADCAST_ADDR, mt_config
+from meshtastic.protobuf import clientonly_pb2, localonly_pb2
 from meshtastic.util import camel_to_snake, snake_to_camel, fromStr
 
+from utilities.save_to_radio import admin_message, library_messages, send_transaction
+
 # defs are from meshtastic/python/main
 
 def traverseConfig(config_root, config, interface_config) -> bool:
     """Iterate through current config level preferences and either traverse deeper if preference is a dict or set preference"""
-    snake_name = camel_to_snake(config_root)
+    snake_name = _snake_name(config_root)
     for pref in config:
         pref_name = f"{snake_name}.{pref}"
         if isinstance(config[pref], dict):
@@ -28,84 +36,131 @@ def splitCompoundName(comp_name: str) -> List[str]:
         name.append(comp_name)
     return name
 
-def setPref(config, comp_name, raw_val) -> bool:
-    """Set a channel or preferences value"""
+# Preference paths are resolved through a per-message index built once from the protobuf descriptors,
+# so importing a profile doesn't walk fields_by_name or re-run the name converters for every leaf.
 
-    name = splitCompoundName(comp_name)
-
-    snake_name = camel_to_snake(name[-1])
-    camel_name = snake_to_camel(name[-1])
-    uni_name = camel_name if mt_config.camel_case else snake_name
-    logging.debug(f"snake_name:{snake_name}")
-    logging.debug(f"camel_name:{camel_name}")
-
-    objDesc = config.DESCRIPTOR
-    config_part = config
-    config_type = objDesc.fields_by_name.get(name[0])
-    if config_type and config_type.message_type is not None:
-        for name_part in name[1:-1]:
-            part_snake_name = camel_to_snake((name_part))
-            config_part = getattr(config, config_type.name)
-            config_type = config_type.message_type.fields_by_name.get(part_snake_name)
-    pref = None
-    if config_type and config_type.message_type is not None:
-        pref = config_type.message_type.fields_by_name.get(snake_name)
-    # Others like ChannelSettings are standalone
-    elif config_type:
-        pref = config_type
-
-    if (not pref) or (not config_type):
-        return False
+PrefEntry = namedtuple("PrefEntry", ["field", "parent_path", "convert"])
+
+_pref_indexes = {}
+
+
+@lru_cache(maxsize=None)
+def _snake_name(name: str) -> str:
+    return camel_to_snake(name)
+
+
+@lru_cache(maxsize=None)
+def _camel_name(name: str) -> str:
+    return snake_to_camel(name)
+
+
+@lru_cache(maxsize=4096)
+def _pref_key(comp_name: str) -> str:
+    return ".".join(_snake_name(part) for part in splitCompoundName(comp_name))
+
+
+def _make_converter(field):
+    """Build the raw YAML value -> protobuf value converter for one field."""
+    enum_values = {v.name: v.number for v in field.enum_type.values} if field.enum_type else None
+
+    def convert(raw_val):
+        val = fromStr(raw_val) if isinstance(raw_val, str) else raw_val
+        # pylint: disable=C0123
+        if enum_values is not None and type(val) == str:
+            # We've failed so far to convert this string into an enum, look it up by name
+            if val not in enum_values:
+                raise ValueError(f"does not have an enum called {val}")
+            val = enum_values[val]
+        return val
+
+    return convert
+
+
+def buildPrefIndex(descriptor) -> dict:
+    """Map every fully qualified snake_case preference path under descriptor to its PrefEntry"""
+    index = {}
+
+    def walk(message_descriptor, path, seen):
+        for field in message_descriptor.fields:
+            field_path = path + (field.name,)
+            if field.message_type is not None:
+                if field.message_type.full_name not in seen:
+                    walk(field.message_type, field_path, seen | {field.message_type.full_name})
+            else:
+                index[".".join(field_path)] = PrefEntry(field, field_path[:-1], _make_converter(field))
+
+    walk(descriptor, (), {descriptor.full_name})
+
+    # splitCompoundName turns a bare name into "name.name"; standalone fields are looked up that way
+    for field in descriptor.fields:
+        if field.message_type is None:
+            index[f"{field.name}.{field.name}"] = index[field.name]
+
+    return index
+
+
+def getPrefIndex(config) -> dict:
+    """Return the cached preference index for config's message type, building it on first use"""
+    descriptor = config.DESCRIPTOR
+    index = _pref_indexes.get(descriptor.full_name)
+    if index is None:
+        index = _pref_indexes[descriptor.full_name] = buildPrefIndex(descriptor)
+    return index
+
+
+def lookupPref(config, comp_name):
+    """Resolve a dotted preference name to its PrefEntry, or None if config has no such field"""
+    return getPrefIndex(config).get(_pref_key(comp_name))
 
-    if isinstance(raw_val, str):
-        val = fromStr(raw_val)
-    else:
-        val = raw_val
-    logging.debug(f"valStr:{raw_val} val:{val}")
+
+class PrefError(ValueError):
+    """Raised by applyPref when a preference can't be set; the message says why."""
+
+
+def applyPref(config, comp_name, raw_val) -> PrefEntry:
+    """Set a preference value, raising PrefError with the reason if it can't be set"""
+
+    entry = lookupPref(config, comp_name)
+    if entry is None:
+        raise PrefError(f"{comp_name} is not a known preference")
+
+    pref = entry.field
+    snake_name = pref.name
+    uni_name = _camel_name(snake_name) if mt_config.camel_case else snake_name
+    prefix = f"{'.'.join(entry.parent_path)}." if entry.parent_path else ""
 
     if snake_name == "wifi_psk" and len(str(raw_val)) < 8:
-        logging.info(f"Warning: network.wifi_psk must be 8 or more characters.")
-        return False
+        raise PrefError("network.wifi_psk must be 8 or more characters.")
+
+    try:
+        val = entry.convert(raw_val)
+    except ValueError as e:  # Also binascii.Error, from a malformed base64: or 0x value
+        if pref.enum_type is None:
+            raise PrefError(f"{prefix}{uni_name} can not be set to {raw_val!r}: {e}") from None
+        # Note: We must use the value of the enum (regardless if camel or snake case)
+        choices = ", ".join(sorted(f.name for f in pref.enum_type.values))
+        raise PrefError(
+            f"{prefix}{uni_name} does not have an enum called {raw_val}, so you can not set it. Choices are: {choices}"
+        ) from None
+    logging.debug(f"valStr:{raw_val} val:{val}")
 
-    enumType = pref.enum_type
-    # pylint: disable=C0123
-    if enumType and type(val) == str:
-        # We've failed so far to convert this string into an enum, try to find it by reflection
-        e = enumType.values_by_name.get(val)
-        if e:
-            val = e.number
-        else:
-            logging.info(
-                f"{name[0]}.{uni_name} does not have an enum called {val}, so you can not set it."
-            )
-            logging.info(f"Choices in sorted order are:")
-            names = []
-            for f in enumType.values:
-                # Note: We must use the value of the enum (regardless if camel or snake case)
-                names.append(f"{f.name}")
-            for temp_name in sorted(names):
-                logging.info(f"    {temp_name}")
-            return False
-
-    # repeating fields need to be handled with append, not setattr
-    if pref.label != pref.LABEL_REPEATED:
-        try:
-            if config_type.message_type is not None:
-                config_values = getattr(config_part, config_type.name)
+    config_values = config
+    for part in entry.parent_path:
+        config_values = getattr(config_values, part)
+
+    try:
+        # repeating fields need to be handled with append, not setattr
+        if pref.label != pref.LABEL_REPEATED:
+            try:
                 setattr(config_values, pref.name, val)
-            else:
-                setattr(config_part, snake_name, val)
-        except TypeError:
-            # The setter didn't like our arg type guess try again as a string
-            config_values = getattr(config_part, config_type.name)
-            setattr(config_values, pref.name, str(val))
-    elif type(val) == list:
-        new_vals = [fromStr(x) for x in val]
-        config_values = getattr(config, config_type.name)
-        getattr(config_values, pref.name)[:] = new_vals
-    else:
-        config_values = getattr(config, config_type.name)
-        if val == 0:
+            except TypeError:
+                # The setter didn't like our arg type guess try again as a string
+                setattr(config_values, pref.name, str(val))
+            logging.info(f"Set {prefix}{uni_name} to {raw_val}")
+        elif type(val) == list:
+            new_vals = [fromStr(x) for x in val]
+            getattr(config_values, pref.name)[:] = new_vals
+        elif val == 0:
             # clear values
             logging.info(f"Clearing {pref.name} list")
             del getattr(config_values, pref.name)[:]
@@ -114,168 +169,410 @@ def setPref(config, comp_name, raw_val) -> bool:
             cur_vals = [x for x in getattr(config_values, pref.name) if x not in [0, "", b""]]
             cur_vals.append(val)
             getattr(config_values, pref.name)[:] = cur_vals
-        return True
+    except (TypeError, ValueError) as e:
+        raise PrefError(f"{prefix}{uni_name} can not be set to {raw_val!r}: {e}") from None
+
+    return entry
 
-    prefix = f"{'.'.join(name[0:-1])}." if config_type.message_type is not None else ""
-    logging.info(f"Set {prefix}{uni_name} to {raw_val}")
 
+def setPref(config, comp_name, raw_val) -> bool:
+    """Set a channel or preferences value"""
+    try:
+        applyPref(config, comp_name, raw_val)
+    except PrefError as e:
+        logging.info(f"Warning: {e}")
+        return False
     return True
 
 
+def importSection(config, section, values):
+    """Apply one YAML section to config. Returns True if that changed it, so the section needs writing, or None if config has no such section."""
+    snake_section = camel_to_snake(section)
+    current = getattr(config, snake_section, None)
+    if current is None:
+        return None
 
-def config_import(interface, filename):
-    with open(filename, encoding="utf8") as file:
-        configuration = yaml.safe_load(file)
-        closeNow = True
-
-        interface.getNode('^local', False).beginSettingsTransaction()
-
-        if "owner" in configuration:
-            logging.info(f"Setting device owner to {configuration['owner']}")
-            waitForAckNak = True
-            interface.getNode('^local', False).setOwner(configuration["owner"])
-
-        if "owner_short" in configuration:
-            logging.info(
-                f"Setting device owner short to {configuration['owner_short']}"
-            )
-            waitForAckNak = True
-            interface.getNode('^local', False).setOwner(
-                long_name=None, short_name=configuration["owner_short"]
-            )
-
-        if "ownerShort" in configuration:
-            logging.info(
-                f"Setting device owner short to {configuration['ownerShort']}"
-            )
-            waitForAckNak = True
-            interface.getNode('^local', False).setOwner(
-                long_name=None, short_name=configuration["ownerShort"]
-            )
-
-        if "channel_url" in configuration:
-            logging.info(f"Setting channel url to {configuration['channel_url']}")
-            interface.getNode('^local').setURL(configuration["channel_url"])
-
-        if "channelUrl" in configuration:
-            logging.info(f"Setting channel url to {configuration['channelUrl']}")
-            interface.getNode('^local').setURL(configuration["channelUrl"])
-
-        if "location" in configuration:
-            alt = 0
-            lat = 0.0
-            lon = 0.0
-            localConfig = interface.localNode.localConfig
-
-            if "alt" in configuration["location"]:
-                alt = int(configuration["location"]["alt"] or 0)
-                logging.info(f"Fixing altitude at {alt} meters")
-            if "lat" in configuration["location"]:
-                lat = float(configuration["location"]["lat"] or 0)
-                logging.info(f"Fixing latitude at {lat} degrees")
-            if "lon" in configuration["location"]:
-                lon = float(configuration["location"]["lon"] or 0)
-                logging.info(f"Fixing longitude at {lon} degrees")
-            logging.info("Setting device position")
-            interface.localNode.setFixedPosition(lat, lon, alt)
-
-        if "config" in configuration:
-            localConfig = interface.getNode('^local').localConfig
-            for section in configuration["config"]:
-                traverseConfig(
-                    section, configuration["config"][section], localConfig
-                )
-                interface.getNode('^local').writeConfig(
-                    camel_to_snake(section)
-                )
-
-        if "module_config" in configuration:
-            moduleConfig = interface.getNode('^local').moduleConfig
-            for section in configuration["module_config"]:
-                traverseConfig(
-                    section,
-                    configuration["module_config"][section],
-                    moduleConfig,
-                )
-                interface.getNode('^local').writeConfig(
-                    camel_to_snake(section)
-                )
-
-        interface.getNode('^local', False).commitSettingsTransaction()
-        logging.info("Writing modified configuration to device")
+    original = type(current)()
+    original.CopyFrom(current)
 
+    traverseConfig(section, values, config)
 
+    if getattr(config, snake_section) == original:
+        logging.info(f"Section '{snake_section}' already matches the profile, skipping write.")
+        return False
+    return True
 
-def config_export(interface) -> str:
-    """used in --export-config"""
-    configObj = {}
-
-    owner = interface.getLongName()
-    owner_short = interface.getShortName()
-    channel_url = interface.localNode.getURL()
-    myinfo = interface.getMyNodeInfo()
-    pos = myinfo.get("position")
-    lat = None
-    lon = None
-    alt = None
-    if pos:
-        lat = pos.get("latitude")
-        lon = pos.get("longitude")
-        alt = pos.get("altitude")
 
-    if owner:
-        configObj["owner"] = owner
-    if owner_short:
-        configObj["owner_short"] = owner_short
-    if channel_url:
-        if mt_config.camel_case:
-            configObj["channelUrl"] = channel_url
+def _url_writes(node, url):
+    """The channel and LoRa writes Node.setURL would send for url, as send_transaction() writes."""
+    try:
+        messages = library_messages(node, "setURL", url)
+    except SystemExit:  # setURL exits on a URL it can't read, with only an exit code
+        raise ValueError(f"Can't use channel URL {url!r}") from None
+    writes = []
+    for p in messages:
+        if p.HasField("set_channel"):
+            index = p.set_channel.index
+            writes.append((f"Channel {index + 1}", "writeChannel", p, f"channel {index}"))
         else:
-            configObj["channel_url"] = channel_url
-    # lat and lon don't make much sense without the other (so fill with 0s), and alt isn't meaningful without both
-    if lat or lon:
-        configObj["location"] = {"lat": lat or float(0), "lon": lon or float(0)}
-        if alt:
-            configObj["location"]["alt"] = alt
-
-    config = MessageToDict(interface.localNode.localConfig)	#checkme - Used as a dictionary here and a string below
-    if config:
-        # Convert inner keys to correct snake/camelCase
-        prefs = {}
-        for pref in config:
-            if mt_config.camel_case:
-                prefs[snake_to_camel(pref)] = config[pref]
+            writes.append(("Config: lora", "writeConfig", p, "lora"))
+    return writes
+
+
+def config_import(interface, filename):
+    """
+    Import a profile in any export format in one settings transaction, writing only the config sections
+    that differ from the node. Every write is built with the admin_message() path the staged writes use.
+    :return: Dict with the written, skipped (unchanged), ignored (unknown) and failed section names and the write results
+    :raises ValueError: If the profile's channel URL can't be read; nothing is sent then
+    """
+    written = []
+    skipped = []
+    ignored = []
+    configuration = load_profile(filename)
+    node = interface.getNode('^local', False)
+    writes = []  # (label, operation, AdminMessage, section), as send_transaction() takes them
+
+    # Like the sections, the owner names and channel URL are only written when they differ from the node's
+    long_name = configuration.get("owner")
+    short_name = configuration.get("ownerShort", configuration.get("owner_short"))
+    long_name = None if long_name is None or str(long_name) == interface.getLongName() else str(long_name)
+    short_name = None if short_name is None or str(short_name) == interface.getShortName() else str(short_name)
+    if long_name is not None or short_name is not None:
+        logging.info(f"Setting device owner to {long_name}, short {short_name}")
+        writes.append(("User settings", "setOwner", admin_message(node, "owner", (long_name, short_name, False)), None))
+
+    for key in ("channel_url", "channelUrl"):
+        if key in configuration and not (node.channels and str(configuration[key]) == node.getURL()):
+            logging.info(f"Setting channel url to {configuration[key]}")
+            writes += _url_writes(node, str(configuration[key]))
+
+    sections = []
+    if "config" in configuration:
+        localConfig = node.localConfig
+        for section in configuration["config"]:
+            changed = importSection(localConfig, section, configuration["config"][section])
+            if changed is None:
+                ignored.append(f"config.{section}")
+            elif changed:
+                sections.append(camel_to_snake(section))
+            else:
+                skipped.append(camel_to_snake(section))
+
+    if "module_config" in configuration:
+        moduleConfig = node.moduleConfig
+        for section in configuration["module_config"]:
+            changed = importSection(moduleConfig, section, configuration["module_config"][section])
+            if changed is None:
+                ignored.append(f"module_config.{section}")
+            elif changed:
+                sections.append(camel_to_snake(section))
             else:
-                prefs[pref] = config[pref]
-            # mark base64 encoded fields as such
-            if pref == "security":
-                if 'privateKey' in prefs[pref]:
-                    prefs[pref]['privateKey'] = 'base64:' + prefs[pref]['privateKey']
-                if 'publicKey' in prefs[pref]:
-                    prefs[pref]['publicKey'] = 'base64:' + prefs[pref]['publicKey']
-                if 'adminKey' in prefs[pref]:
-                    for i in range(len(prefs[pref]['adminKey'])):
-                        prefs[pref]['adminKey'][i] = 'base64:' + prefs[pref]['adminKey'][i]
-        if mt_config.camel_case:
-            configObj["config"] = config		#Identical command here and 2 lines below?
+                skipped.append(camel_to_snake(section))
+    writes += [(f"Config: {section}", "writeConfig", admin_message(node, "section", section), section) for section in sections]
+
+    if "location" in configuration:
+        alt = 0
+        lat = 0.0
+        lon = 0.0
+
+        if "alt" in configuration["location"]:
+            alt = int(configuration["location"]["alt"] or 0)
+            logging.info(f"Fixing altitude at {alt} meters")
+        if "lat" in configuration["location"]:
+            lat = float(configuration["location"]["lat"] or 0)
+            logging.info(f"Fixing latitude at {lat} degrees")
+        if "lon" in configuration["location"]:
+            lon = float(configuration["location"]["lon"] or 0)
+            logging.info(f"Fixing longitude at {lon} degrees")
+        current = (interface.getMyNodeInfo() or {}).get("position") or {}
+        # A position section write can clear the fixed position flag, so then it is sent again, after the sections
+        if "position" in sections or (lat, lon, alt) != (current.get("latitude") or 0, current.get("longitude") or 0, current.get("altitude") or 0):
+            logging.info("Setting device position")
+            writes.append(("Fixed position", "setFixedPosition", admin_message(node, "position", (lat, lon, alt)), None))
+
+    if skipped:
+        logging.info(f"Skipped unchanged sections: {', '.join(skipped)}")
+    if ignored:
+        logging.warning(f"Ignored unknown sections: {', '.join(ignored)}")
+
+    if not writes:
+        logging.info("The node already matches the profile, nothing to write")
+        return {"written": [], "skipped": skipped, "ignored": ignored, "failed": [], "results": []}
+
+    logging.info("Writing modified configuration to device")
+    results = send_transaction(node, writes)
+    committed = results[-1]["status"] == "ok"
+    confirmed = [section for (_, _, _, section), result in zip(writes, results[1:-1]) if committed and result["status"] == "ok"]
+    written = [section for section in sections if section in confirmed]
+    failed = [result["write"] for result in results if result["status"] != "ok"]
+    if failed:
+        logging.error(f"Profile writes not confirmed by the node: {', '.join(failed)}")
+    return {"written": written, "skipped": skipped, "ignored": ignored, "failed": failed, "results": results}
+
+
+
+# Export streams the profile, so nothing is buffered when writing to a file or stdout. JSON and
+# protobuf are written one config section at a time, YAML one top-level key at a time: a yaml.dump
+# per section cost more than the whole export used to. The protobuf format writes a
+# DeviceProfile as consecutive serialized fragments; protobuf merges them when parsing.
+
+export_formats = {"yaml": (".yaml", ".yml"), "json": (".json",), "protobuf": (".pb", ".binpb")}
+profile_keys = ["owner", "channel_url", "location", "config", "module_config"]
+config_section_names = [f.name for f in localonly_pb2.LocalConfig.DESCRIPTOR.fields if f.message_type]
+module_section_names = [f.name for f in localonly_pb2.LocalModuleConfig.DESCRIPTOR.fields if f.message_type]
+
+
+def export_format_for(filename, default="yaml"):
+    """Pick the export format from a file name's extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    for name, extensions in export_formats.items():
+        if extension in extensions:
+            return name
+    return default
+
+
+def select_sections(sections=None):
+    """
+    Resolve section names into (profile keys, config sections, module config sections).
+    Names can be profile keys (owner, channel_url, location, config, module_config), section
+    names (lora, mqtt) or qualified section names (config.lora, module_config.mqtt).
+    :raises ValueError: If a name matches nothing
+    """
+    if not sections:
+        return set(profile_keys), set(config_section_names), set(module_section_names)
+
+    keys, config, module = set(), set(), set()
+    for name in sections:
+        prefix, _, section = _snake_name(name).rpartition(".")
+        if not prefix and section in profile_keys:
+            keys.add(section)
+            if section == "config":
+                config.update(config_section_names)
+            elif section == "module_config":
+                module.update(module_section_names)
+        elif prefix in ("", "config") and section in config_section_names:
+            keys.add("config")
+            config.add(section)
+        elif prefix in ("", "module_config") and section in module_section_names:
+            keys.add("module_config")
+            module.add(section)
         else:
-            configObj["config"] = config
+            raise ValueError(f"'{name}' is not a config section")
+    return keys, config, module
+
+
+def _mark_base64_keys(security):
+    """Prefix the security keys with base64: so fromStr decodes them again on import."""
+    for key in ("privateKey", "publicKey"):
+        if key in security:
+            security[key] = "base64:" + security[key]
+    if "adminKey" in security:
+        security["adminKey"] = ["base64:" + key for key in security["adminKey"]]
+
+
+def _section_items(message, names, keep_empty):
+    """Yield (name, dict) for each section of message in names, converting one section at a time."""
+    for field, value in message.ListFields():
+        if field.message_type is None:
+            yield field.json_name, value  # LocalConfig.version
+            continue
+        if field.name not in names:
+            continue
+        section = MessageToDict(value)
+        if field.name == "security":
+            _mark_base64_keys(section)
+        if section or keep_empty:
+            yield field.json_name, section
+
+
+def _profile_header(interface, keys):
+    """The top-level profile entries that aren't config sections."""
+    header = {}
+    if "owner" in keys:
+        owner = interface.getLongName()
+        owner_short = interface.getShortName()
+        if owner:
+            header["owner"] = owner
+        if owner_short:
+            header["owner_short"] = owner_short
+    if "channel_url" in keys:
+        channel_url = interface.localNode.getURL()
+        if channel_url:
+            header["channelUrl" if mt_config.camel_case else "channel_url"] = channel_url
+    if "location" in keys:
+        pos = (interface.getMyNodeInfo() or {}).get("position") or {}
+        lat = pos.get("latitude")
+        lon = pos.get("longitude")
+        alt = pos.get("altitude")
+        # lat and lon don't make much sense without the other (so fill with 0s), and alt isn't meaningful without both
+        if lat or lon:
+            header["location"] = {"lat": lat or float(0), "lon": lon or float(0)}
+            if alt:
+                header["location"]["alt"] = alt
+    return header
+
+
+def _write_yaml(out, interface, keys, config_names, module_names):
+    import yaml
+    header = _profile_header(interface, keys)
+    node = interface.localNode
+    sections = {
+        "config": lambda: _section_items(node.localConfig, config_names, keep_empty=True),
+        "module_config": lambda: _section_items(node.moduleConfig, module_names, keep_empty=False),
+    }
+
+    out.write("# start of Meshtastic configure yaml\n")
+    wrote = False
+    # One dump per top-level key, in sorted order to match a single yaml.dump of the whole profile.
+    # The libyaml emitter writes the same YAML several times faster, when PyYAML was built with it.
+    dumper = getattr(yaml, "CDumper", yaml.Dumper)
+    for key in sorted(list(header) + [key for key in sections if key in keys]):
+        value = header[key] if key in header else dict(sections[key]())
+        if value or key in header:
+            out.write(yaml.dump({key: value}, Dumper=dumper))
+            wrote = True
+    if not wrote:
+        out.write("{}\n")
+
+
+def _write_json(out, interface, keys, config_names, module_names):
+    node = interface.localNode
+    separator = "\n"
+    out.write("{")
+    for key, value in _profile_header(interface, keys).items():
+        out.write(f"{separator}  {json.dumps(key)}: {json.dumps(value)}")
+        separator = ",\n"
+    for key, message, names in (("config", node.localConfig, config_names), ("module_config", node.moduleConfig, module_names)):
+        if key not in keys:
+            continue
+        inner = None
+        for name, section in _section_items(message, names, keep_empty=key == "config"):
+            if inner is None:
+                out.write(f"{separator}  {json.dumps(key)}: {{")
+                separator = ",\n"
+                inner = "\n"
+            out.write(f"{inner}    {json.dumps(name)}: {json.dumps(section)}")
+            inner = ",\n"
+        if inner is not None:
+            out.write("\n  }")
+    out.write("\n}\n")
+
+
+def _write_protobuf(out, interface, keys, config_names, module_names):
+    header = _profile_header(interface, keys)
+    profile = clientonly_pb2.DeviceProfile()
+    if "owner" in header:
+        profile.long_name = header["owner"]
+    if "owner_short" in header:
+        profile.short_name = header["owner_short"]
+    profile.channel_url = header.get("channel_url", header.get("channelUrl", ""))
+    if "location" in header:
+        location = header["location"]
+        profile.fixed_position.latitude_i = int(round(location["lat"] * 1e7))
+        profile.fixed_position.longitude_i = int(round(location["lon"] * 1e7))
+        profile.fixed_position.altitude = int(location.get("alt") or 0)
+    out.write(profile.SerializeToString())
+
+    node = interface.localNode
+    for key, message, names in (("config", node.localConfig, config_names), ("module_config", node.moduleConfig, module_names)):
+        if key not in keys:
+            continue
+        for field, value in message.ListFields():
+            if field.message_type is not None and field.name not in names:
+                continue
+            fragment = clientonly_pb2.DeviceProfile()
+            if field.message_type is None:
+                setattr(getattr(fragment, key), field.name, value)
+            else:
+                getattr(getattr(fragment, key), field.name).CopyFrom(value)
+            out.write(fragment.SerializeToString())
+
+
+export_writers = {"yaml": _write_yaml, "json": _write_json, "protobuf": _write_protobuf}
 
-    module_config = MessageToDict(interface.localNode.moduleConfig)
+
+def export_config(interface, out, fmt="yaml", sections=None):
+    """
+    Stream the node's profile to out one section at a time.
+    :param out: A text file for yaml and json, a binary file for protobuf
+    :param fmt: "yaml", "json" or "protobuf" (a DeviceProfile message)
+    :param sections: Names accepted by select_sections, or None for the whole profile
+    """
+    keys, config_names, module_names = select_sections(sections)
+    export_writers[fmt](out, interface, keys, config_names, module_names)
+
+
+def config_export(interface) -> str:
+    """used in --export-config"""
+    out = io.StringIO()
+    export_config(interface, out)
+    return out.getvalue()
+
+
+def device_profile_to_dict(profile):
+    """Turn a DeviceProfile into the dict shape config_import reads from YAML."""
+    configuration = {}
+    if profile.long_name:
+        configuration["owner"] = profile.long_name
+    if profile.short_name:
+        configuration["owner_short"] = profile.short_name
+    if profile.channel_url:
+        configuration["channel_url"] = profile.channel_url
+    if profile.HasField("fixed_position"):
+        position = profile.fixed_position
+        configuration["location"] = {"lat": round(position.latitude_i * 1e-7, 7), "lon": round(position.longitude_i * 1e-7, 7)}
+        if position.altitude:
+            configuration["location"]["alt"] = position.altitude
+    config = dict(_section_items(profile.config, config_section_names, keep_empty=True))
+    config.pop("version", None)
+    if config:
+        configuration["config"] = config
+    module_config = dict(_section_items(profile.module_config, module_section_names, keep_empty=False))
     if module_config:
-        # Convert inner keys to correct snake/camelCase
-        prefs = {}
-        for pref in module_config:
-            if len(module_config[pref]) > 0:
-                prefs[pref] = module_config[pref]
-        if mt_config.camel_case:
-            configObj["module_config"] = prefs
-        else:
-            configObj["module_config"] = prefs
+        configuration["module_config"] = module_config
+    return configuration
 
-    config_txt = "# start of Meshtastic configure yaml\n"		#checkme - "config" (now changed to config_out)
-                                                                        #was used as a string here and a Dictionary above
-    config_txt += yaml.dump(configObj)
 
-    # logging.info(config_txt)
-    return config_txt
\ No newline at end of file
+def load_profile(filename):
+    """Read a profile in any export format into the dict config_import works from."""
+    if export_format_for(filename) == "protobuf":
+        with open(filename, "rb") as file:
+            return device_profile_to_dict(clientonly_pb2.DeviceProfile.FromString(file.read()))
+    import yaml  # JSON exports are valid YAML too
+    with open(filename, encoding="utf8") as file:
+        return yaml.safe_load(file) or {}
+
+
+def run_export(args):
+    """Headless entry point for --export. Returns a process exit code."""
+    from utilities.interfaces import initialize_interface
+
+    fmt = args.format or export_format_for(args.export)
+    try:
+        select_sections(args.sections)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    interface = initialize_interface(args)
+    if interface is None:
+        print("Could not connect to a node", file=sys.stderr)
+        return 1
+    try:
+        if args.export == "-":
+            out = sys.stdout.buffer if fmt == "protobuf" else sys.stdout
+            export_config(interface, out, fmt, args.sections)
+            out.flush()
+        elif fmt == "protobuf":
+            with open(args.export, "wb") as file:
+                export_config(interface, file, fmt, args.sections)
+        else:
+            with open(args.export, "w", encoding="utf-8") as file:
+                export_config(interface, file, fmt, args.sections)
+    except OSError as e:
+        print(f"Could not write {args.export}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        interface.close()
+    return 0
@@ -0,0 +1,156 @@
+import base64
+import yaml
+from meshtastic.protobuf import apponly_pb2, localonly_pb2
+from meshtastic.util import camel_to_snake
+
+from utilities.config_io import PrefError, applyPref
+
+# Offline checks for YAML profiles. Values are applied to blank LocalConfig/LocalModuleConfig messages
+# through the same applyPref path config_import uses, so no device is needed.
+
+known_top_level_keys = {
+    "owner", "owner_short", "ownerShort", "channel_url", "channelUrl", "location", "config", "module_config",
+}
+
+
+def _walk_section(path, values):
+    """Yield (dotted path, leaf value) pairs for one YAML section."""
+    for key, value in values.items():
+        key_path = f"{path}.{key}"
+        if isinstance(value, dict):
+            yield from _walk_section(key_path, value)
+        else:
+            yield key_path, value
+
+
+def _check_channel_url(url):
+    """Return an error message if url doesn't decode to a ChannelSet, else None."""
+    split_url = url.split("/#")
+    if len(split_url) < 2 or not split_url[-1]:
+        return "is not a Meshtastic channel URL"
+    b64 = split_url[-1]
+    missing_padding = len(b64) % 4
+    if missing_padding:
+        b64 += "=" * (4 - missing_padding)
+    try:
+        channel_set = apponly_pb2.ChannelSet()
+        channel_set.ParseFromString(base64.urlsafe_b64decode(b64))
+    except Exception as e:
+        return f"could not be decoded: {e}"
+    if not channel_set.settings:
+        return "contains no channels"
+    return None
+
+
+def _check_config_block(configuration, key, message, errors, writes):
+    block = configuration.get(key)
+    if block is None:
+        return
+    if not isinstance(block, dict):
+        errors.append((key, "must be a mapping of sections"))
+        return
+
+    for section, values in block.items():
+        snake_section = camel_to_snake(section)
+        section_path = f"{key}.{snake_section}"
+        if snake_section not in message.DESCRIPTOR.fields_by_name:
+            errors.append((section_path, "is not a known config section"))
+            continue
+        if not isinstance(values, dict):
+            errors.append((section_path, "must be a mapping of settings"))
+            continue
+
+        changes = []
+        for pref_path, raw_val in _walk_section(snake_section, values):
+            try:
+                entry = applyPref(message, pref_path, raw_val)
+            except PrefError as e:
+                errors.append((f"{key}.{pref_path}", str(e)))
+                continue
+            field_path = ".".join(entry.parent_path[1:] + (entry.field.name,))
+            changes.append(f"{field_path}={raw_val}")
+        if changes:
+            writes.append(f"writeConfig('{snake_section}'): {', '.join(changes)}")
+
+
+def validate_configuration(configuration):
+    """
+    Check a parsed profile without touching a device.
+    :param configuration: Dict loaded from a YAML profile
+    :return: (errors, writes) where errors is a list of (path, message) and writes lists the calls config_import would make
+    """
+    errors = []
+    writes = []
+
+    if not isinstance(configuration, dict):
+        return [("<profile>", "must be a mapping")], []
+
+    for key in configuration:
+        if key not in known_top_level_keys:
+            errors.append((key, "is not a known profile key"))
+
+    if "owner" in configuration:
+        writes.append(f"setOwner(long_name={configuration['owner']!r})")
+    for key in ("owner_short", "ownerShort"):
+        if key in configuration:
+            short_name = str(configuration[key])
+            if len(short_name) > 4:
+                errors.append((key, f"{short_name!r} is longer than 4 characters and would be truncated"))
+            writes.append(f"setOwner(short_name={short_name!r})")
+
+    for key in ("channel_url", "channelUrl"):
+        if key in configuration:
+            problem = _check_channel_url(str(configuration[key]))
+            if problem:
+                errors.append((key, problem))
+            writes.append(f"setURL({configuration[key]!r})")
+
+    if "location" in configuration:
+        location = configuration["location"] or {}
+        if not isinstance(location, dict):
+            errors.append(("location", "must be a mapping with lat, lon and alt"))
+        else:
+            for coord, cast in (("lat", float), ("lon", float), ("alt", int)):
+                try:
+                    cast(location.get(coord) or 0)
+                except (TypeError, ValueError):
+                    errors.append((f"location.{coord}", f"{location.get(coord)!r} is not a number"))
+            writes.append(
+                f"setFixedPosition(lat={location.get('lat') or 0}, lon={location.get('lon') or 0}, alt={location.get('alt') or 0})"
+            )
+
+    _check_config_block(configuration, "config", localonly_pb2.LocalConfig(), errors, writes)
+    _check_config_block(configuration, "module_config", localonly_pb2.LocalModuleConfig(), errors, writes)
+
+    if writes:
+        writes = ["beginSettingsTransaction()"] + writes + ["commitSettingsTransaction()"]
+    return errors, writes
+
+
+def validate_profile(filename):
+    """Load and check one YAML profile file. Returns (errors, writes) like validate_configuration."""
+    try:
+        with open(filename, encoding="utf8") as file:
+            configuration = yaml.safe_load(file)
+    except (OSError, yaml.YAMLError) as e:
+        return [("<file>", str(e))], []
+    return validate_configuration(configuration)
+
+
+def run_validation(profiles, dry_run=False):
+    """Headless entry point for --validate and --dry-run. Returns a process exit code."""
+    failed = 0
+    for filename in profiles:
+        errors, writes = validate_profile(filename)
+        if errors:
+            failed += 1
+            print(f"{filename}: {len(errors)} error(s)")
+            for path, message in errors:
+                print(f"  {path}: {message}")
+        else:
+            print(f"{filename}: OK")
+        if dry_run and writes:
+            print("  Would send:")
+            for write in writes:
+                print(f"    {write}")
+    return 1 if failed else 0
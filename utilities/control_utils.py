@@ -65,3 +65,37 @@ def transform_menu_path(menu_path):
         transformed_path.append(part)
 
     return transformed_path
+
+
+def field_path(menu_path, option):
+    """
+    The changeset path of a setting in the menu, e.g. ["Main Menu", "Radio Settings", "lora"] and
+    "hop_limit" give ("config", "lora", "hop_limit"). See utilities/changeset.py.
+    """
+    section, rest = menu_path[1], tuple(menu_path[2:])
+    if section == "User Settings":
+        return ("owner", re.sub(r"(?<!^)(?=[A-Z])", "_", option).lower())  # longName -> long_name
+    if section == "Channels":
+        channel_num = int(rest[0].split()[-1]) - 1
+        return ("channel", channel_num, "settings") + rest[1:] + (option,)
+    if section == "Radio Settings" and rest == ("position",) and option in ("latitude", "longitude", "altitude"):
+        return ("position", option)
+    roots = {"Radio Settings": "config", "Module Settings": "module_config"}
+    return (roots[section],) + rest + (option,)
+
+
+def menu_location(path):
+    """
+    Where a changeset path appears in the menu, the inverse of field_path(): (menu path, option),
+    e.g. (["Main Menu", "Radio Settings", "lora"], "hop_limit"). None for fields the menu doesn't show.
+    """
+    if path[0] == "owner":
+        return ["Main Menu", "User Settings"], re.sub(r"_(\w)", lambda match: match.group(1).upper(), path[1])  # long_name -> longName
+    if path[0] == "channel":
+        if len(path) < 4 or path[2] != "settings":
+            return None
+        return ["Main Menu", "Channels", f"Channel {path[1] + 1}"] + list(path[3:-1]), path[-1]
+    if path[0] == "position":
+        return ["Main Menu", "Radio Settings", "position"], path[1]
+    sections = {"config": "Radio Settings", "module_config": "Module Settings"}
+    return ["Main Menu", sections[path[0]]] + list(path[1:-1]), path[-1]
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.message import Message
+from meshtastic.protobuf import localonly_pb2
+from meshtastic.util import camel_to_snake
+
+from utilities.config_io import export_formats, load_profile, traverseConfig
+
+# Drift detection against a golden profile. Both the profile and the node are normalized into
+# per-section values: protobuf messages for config sections (the profile goes through the same
+# traverseConfig path config_import uses, onto a blank message) and a string for the channel URL.
+# Each section gets a short hash of its deterministic serialization, so comparing a
+# node with a profile is one lookup per section, and field-level diffs are only worked out for
+# the sections whose hashes differ.
+#
+# A profile is taken as a full export and every config and module config section is checked
+# whole: an export leaves out fields and sections at their defaults, and those are pinned to the
+# default too. With partial (--partial-profile), only the sections the profile names are checked,
+# each cut down to the fields it names on both sides before it is hashed, so a hand-written
+# profile only pins the settings it mentions. What makes each node itself (owner names and its own key pair) is never checked, so
+# one golden profile can cover a whole fleet.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
+profile_folder = os.path.join(parent_dir, "node-configs")
+
+fingerprint_length = 16  # Hex digits of sha256 kept per section
+identity_fields = {"config.security": ("private_key", "public_key")}
+
+
+def resolve_profile(name):
+    """Find a profile by path, or by name in node-configs/ with or without its extension."""
+    candidates = [name, os.path.join(profile_folder, name)]
+    candidates += [os.path.join(profile_folder, name + ext) for extensions in export_formats.values() for ext in extensions]
+    return next((path for path in candidates if os.path.isfile(path)), None)
+
+
+def _message_sections(key, message):
+    """Yield (name, section) for every section of a LocalConfig or LocalModuleConfig, minus identity fields."""
+    for field in message.DESCRIPTOR.fields:
+        if field.message_type is None:
+            continue  # LocalConfig.version
+        name = f"{key}.{field.name}"
+        section = getattr(message, field.name)
+        if name in identity_fields:
+            section = type(section)()
+            section.CopyFrom(getattr(message, field.name))
+            for identity_field in identity_fields[name]:
+                section.ClearField(identity_field)
+        yield name, section
+
+
+def profile_fields(descriptor, values, prefix=()):
+    """The field paths a profile block sets, e.g. [("hop_limit",), ("ipv4_config", "ip")], skipping names the message doesn't have."""
+    paths = []
+    for key, value in values.items():
+        field = descriptor.fields_by_name.get(camel_to_snake(key))
+        if field is None:
+            continue
+        if isinstance(value, dict) and field.message_type is not None and field.label != FieldDescriptor.LABEL_REPEATED:
+            paths += profile_fields(field.message_type, value, prefix + (field.name,))
+        else:
+            paths.append(prefix + (field.name,))
+    return paths
+
+
+def project(message, paths):
+    """A copy of message holding only the fields at paths, so two messages compare on those fields alone."""
+    projected = type(message)()
+    for path in paths:
+        source, target = message, projected
+        for name in path[:-1]:
+            source, target = getattr(source, name), getattr(target, name)
+        name = path[-1]
+        field = source.DESCRIPTOR.fields_by_name[name]
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            getattr(target, name).extend(getattr(source, name))
+        elif field.message_type is not None:
+            getattr(target, name).CopyFrom(getattr(source, name))
+        else:
+            setattr(target, name, getattr(source, name))
+    return projected
+
+
+def profile_sections(configuration, partial=False):
+    """
+    Normalize a profile dict into the sections it checks.
+    :param partial: Check only the fields the profile sets instead of every section
+    :return: ({section: message or string}, {section: field paths}), the messages cut down to those
+        field paths; without partial there are no paths and every section is there whole
+    """
+    sections, fields = {}, {}
+    for key in ("channel_url", "channelUrl"):
+        if key in configuration:
+            sections["channel_url"] = str(configuration[key])
+
+    for key, blank in (("config", localonly_pb2.LocalConfig()), ("module_config", localonly_pb2.LocalModuleConfig())):
+        for section, values in (configuration.get(key) or {}).items():
+            field = blank.DESCRIPTOR.fields_by_name.get(camel_to_snake(section))
+            if field is None or field.message_type is None or not isinstance(values, dict):
+                logging.warning(f"Ignoring profile section {key}.{section} for drift checks")
+                continue
+            traverseConfig(section, values, blank)
+            if partial:
+                name = f"{key}.{field.name}"
+                paths = [path for path in profile_fields(field.message_type, values) if path[-1] not in identity_fields.get(name, ())]
+                fields[name] = paths
+                sections[name] = project(getattr(blank, field.name), paths)
+        if not partial:
+            sections.update(_message_sections(key, blank))
+    return sections, fields
+
+
+def node_sections(interface):
+    """Every section of the node's config as {section: message or string}."""
+    node = interface.localNode
+    sections = {"channel_url": node.getURL() if node.channels else ""}
+    sections.update(_message_sections("config", node.localConfig))
+    sections.update(_message_sections("module_config", node.moduleConfig))
+    return sections
+
+
+def section_hash(value):
+    data = value.SerializeToString(deterministic=True) if isinstance(value, Message) else str(value).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:fingerprint_length]
+
+
+def fingerprint(sections):
+    return {name: section_hash(value) for name, value in sections.items()}
+
+
+def drifted_sections(node_fingerprint, golden_fingerprint):
+    """The golden profile's sections whose hash the node doesn't match."""
+    return [name for name, digest in golden_fingerprint.items() if node_fingerprint.get(name) != digest]
+
+
+def _flatten(values, prefix=""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def field_diff(expected, actual):
+    """
+    List the fields that differ within one section.
+    :return: [{"field", "expected", "actual"}], with None standing for a field at its default
+    """
+    if not isinstance(expected, Message):
+        return [{"field": "", "expected": expected, "actual": actual}]
+    expected_fields = dict(_flatten(MessageToDict(expected, preserving_proto_field_name=True)))
+    actual_fields = dict(_flatten(MessageToDict(actual, preserving_proto_field_name=True)))
+    return [
+        {"field": name, "expected": expected_fields.get(name), "actual": actual_fields.get(name)}
+        for name in sorted(expected_fields.keys() | actual_fields.keys())
+        if expected_fields.get(name) != actual_fields.get(name)
+    ]
+
+
+def load_golden(configuration, partial=False):
+    """Normalize and fingerprint a golden profile once, to check any number of nodes against. See profile_sections() for partial."""
+    sections, fields = profile_sections(configuration, partial)
+    return {"sections": sections, "fields": fields, "fingerprint": fingerprint(sections)}
+
+
+def golden_config_sections(golden):
+    """The bare config and module config section names a golden profile checks, for resync_sections."""
+    return [name.split(".", 1)[1] for name in golden["sections"] if "." in name]
+
+
+def check_drift(interface, golden):
+    """
+    Compare a node with a golden profile from load_golden.
+    :return: Dict with the node's id and full fingerprint, whether it is in sync, and the field diffs of each drifted section
+    """
+    sections = node_sections(interface)
+    node_fingerprint = fingerprint(sections)
+    checked = {name: project(sections[name], paths) for name, paths in golden["fields"].items()}
+    checked_fingerprint = dict(node_fingerprint, **fingerprint(checked))
+    sections.update(checked)
+    drifted = drifted_sections(checked_fingerprint, golden["fingerprint"])
+    return {
+        "node_id": (interface.getMyUser() or {}).get("id"),
+        "in_sync": not drifted,
+        "fingerprint": node_fingerprint,
+        "drift": {name: field_diff(golden["sections"][name], sections.get(name)) for name in drifted},
+    }
+
+
+def drift_paths(report):
+    """Flatten a check_drift report into "section.field" paths, e.g. "config.lora.hop_limit"."""
+    return [f"{section}.{change['field']}".rstrip(".") for section, changes in report["drift"].items() for change in changes]
+
+
+def check_target(target, golden):
+    from utilities.fleet import open_target
+
+    result = {"target": target[1], "transport": target[0], "error": None}
+    interface = None
+    try:
+        interface = open_target(target)
+        result.update(check_drift(interface, golden))
+    except (Exception, SystemExit) as e:  # meshtastic calls sys.exit() on some connection failures
+        logging.error(f"Drift check of {target[1]} failed: {e}")
+        result["error"] = str(e) or e.__class__.__name__
+    finally:
+        if interface is not None:
+            try:
+                interface.close()
+            except Exception as e:
+                logging.warning(f"Error closing interface for {target[1]}: {e}")
+    return result
+
+
+def check_fleet(targets, golden, max_workers=8):
+    """Check every target concurrently. Returns results in target order."""
+    workers = max(1, min(max_workers, len(targets)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda target: check_target(target, golden), targets))
+
+
+def run_drift(args):
+    """Headless entry point for --drift. Prints a JSON report and exits 0 only if every node matches."""
+    from utilities.fleet import build_targets
+    from utilities.interfaces import initialize_interface
+
+    path = resolve_profile(args.drift)
+    if path is None:
+        print(f"Profile not found: {args.drift}", file=sys.stderr)
+        return 2
+    golden = load_golden(load_profile(path), args.partial_profile)
+
+    targets = build_targets(args.ports, args.hosts)
+    if targets:
+        nodes = check_fleet(targets, golden, max_workers=args.workers)
+    else:
+        interface = initialize_interface(args)
+        if interface is None:
+            print("Could not connect to a node", file=sys.stderr)
+            return 1
+        try:
+            nodes = [dict(check_drift(interface, golden), target="local", transport=None, error=None)]
+        finally:
+            interface.close()
+
+    report = {
+        "profile": path,
+        "generated_at": int(time.time()),
+        "profile_fingerprint": golden["fingerprint"],
+        "nodes": nodes,
+    }
+    json.dump(report, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 0 if all(node.get("in_sync") for node in nodes) else 1
@@ -0,0 +1,236 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import meshtastic.serial_interface, meshtastic.tcp_interface
+from meshtastic.protobuf import channel_pb2, config_pb2
+from meshtastic.util import generate_channel_hash
+
+from utilities.config_io import config_import
+from utilities.drift import check_drift, drift_paths, golden_config_sections, load_golden
+from utilities.interfaces import resync_sections
+
+drift_resync_secs = 300  # How often the dashboard re-reads the sections a --reference profile checks; lora is re-read on every refresh
+
+
+def build_targets(ports=None, hosts=None):
+    """Turn the --ports and --hosts lists into (transport, address) pairs, dropping duplicates."""
+    targets = []
+    for port in ports or []:
+        if ("serial", port) not in targets:
+            targets.append(("serial", port))
+    for host in hosts or []:
+        if ("tcp", host) not in targets:
+            targets.append(("tcp", host))
+    return targets
+
+
+def open_target(target):
+    """Open an interface to a single fleet target."""
+    transport, address = target
+    if transport == "serial":
+        return meshtastic.serial_interface.SerialInterface(address)
+    return meshtastic.tcp_interface.TCPInterface(address)
+
+
+def provision_node(target, filename):
+    """Import the profile into one node and return a result dict with timing."""
+    result = {"target": target[1], "transport": target[0], "ok": False, "error": None, "seconds": 0.0, "written": [], "skipped": []}
+    start = time.monotonic()
+    interface = None
+    try:
+        interface = open_target(target)
+        summary = config_import(interface, filename)
+        result.update(written=summary["written"], skipped=summary["skipped"])
+        result["ok"] = not summary["failed"]
+        if summary["failed"]:
+            result["error"] = f"not confirmed: {', '.join(summary['failed'])}"
+    except (Exception, SystemExit) as e:  # meshtastic calls sys.exit() on some connection failures
+        logging.error(f"Provisioning {target[1]} failed: {e}")
+        result["error"] = str(e) or e.__class__.__name__
+    finally:
+        if interface is not None:
+            try:
+                interface.close()
+            except Exception as e:
+                logging.warning(f"Error closing interface for {target[1]}: {e}")
+        result["seconds"] = time.monotonic() - start
+    return result
+
+
+def provision_fleet(targets, filename, max_workers=8, on_result=None):
+    """
+    Import one YAML profile into every target using a bounded worker pool.
+    :param targets: List of (transport, address) pairs from build_targets
+    :param filename: Path to the YAML profile
+    :param max_workers: Upper bound on concurrent connections
+    :param on_result: Optional callback invoked with each result as it completes
+    :return: List of result dicts in target order
+    """
+    results = {}
+    workers = max(1, min(max_workers, len(targets)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(provision_node, target, filename): target for target in targets}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+    return [results[target] for target in targets]
+
+
+def format_report(results):
+    """Format provisioning results as a plain-text table."""
+    target_width = max([len("TARGET")] + [len(r["target"]) for r in results])
+    lines = [f"{'TARGET':<{target_width}}  {'TRANSPORT':<9}  {'RESULT':<6}  {'TIME':>8}  {'WRITTEN':>7}  {'SKIPPED':>7}"]
+    for r in results:
+        status = "ok" if r["ok"] else "failed"
+        line = f"{r['target']:<{target_width}}  {r['transport']:<9}  {status:<6}  {r['seconds']:>7.1f}s  {len(r['written']):>7}  {len(r['skipped']):>7}"
+        if r["error"]:
+            line += f"  {r['error']}"
+        lines.append(line)
+
+    ok_count = sum(1 for r in results if r["ok"])
+    wall_time = max((r["seconds"] for r in results), default=0.0)
+    lines.append(f"{ok_count}/{len(results)} nodes provisioned, slowest node {wall_time:.1f}s")
+    return "\n".join(lines)
+
+
+def run_provisioning(args):
+    """Headless entry point for --provision. Returns a process exit code."""
+    targets = build_targets(args.ports, args.hosts)
+    if not targets:
+        print("No targets given. Use --ports and/or --hosts with --provision.")
+        return 2
+    if not os.path.isfile(args.provision):
+        print(f"Profile not found: {args.provision}")
+        return 2
+
+    print(f"Provisioning {len(targets)} node(s) from {args.provision} with up to {args.workers} workers")
+    results = provision_fleet(
+        targets,
+        args.provision,
+        max_workers=args.workers,
+        on_result=lambda r: print(f"  {r['target']}: {'ok' if r['ok'] else 'failed'} ({r['seconds']:.1f}s)", flush=True),
+    )
+    print(format_report(results))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+def preset_name(lora):
+    if not lora.use_preset:
+        return "CUSTOM"
+    return config_pb2.Config.LoRaConfig.ModemPreset.Name(lora.modem_preset)
+
+
+def primary_channel_hash(node):
+    """The one-byte hash other nodes see for the primary channel, or None if channels haven't loaded."""
+    for channel in node.channels or []:
+        if channel.role == channel_pb2.Channel.Role.PRIMARY:
+            # An unnamed primary channel goes by its modem preset's name, e.g. LongFast
+            name = channel.settings.name or "".join(part.capitalize() for part in preset_name(node.localConfig.lora).split("_"))
+            return generate_channel_hash(name, channel.settings.psk)
+    return None
+
+
+def node_status(interface, golden=None):
+    """Summarize one node for the dashboard; drift is None when there is no golden profile from load_golden."""
+    node = interface.localNode
+    lora = node.localConfig.lora
+    metadata = getattr(interface, "metadata", None)
+    return {
+        "node_id": (interface.getMyNodeInfo() or {}).get("user", {}).get("id"),
+        "firmware": metadata.firmware_version if metadata else None,
+        "region": config_pb2.Config.LoRaConfig.RegionCode.Name(lora.region),
+        "preset": preset_name(lora),
+        "channel_hash": primary_channel_hash(node),
+        "drift": drift_paths(check_drift(interface, golden)) if golden is not None else None,
+    }
+
+
+def new_row(target):
+    return {
+        "target": target[1], "transport": target[0], "state": "connecting", "error": None, "seconds": 0.0,
+        "node_id": None, "firmware": None, "region": None, "preset": None, "channel_hash": None, "drift": None,
+    }
+
+
+class FleetMonitor:
+    """
+    Keeps one connection per target open and polls them all at once, one worker per connection,
+    so refreshing the whole fleet takes about as long as the slowest node. Workers replace whole
+    row dicts, so the UI thread can read self.rows at any time.
+    """
+
+    def __init__(self, targets, reference=None, partial=False):
+        """
+        :param reference: Parsed golden profile to check drift against, or None
+        :param partial: Check only the fields the reference sets, see drift.profile_sections()
+        """
+        self.targets = list(targets)
+        self.golden = load_golden(reference, partial) if reference is not None else None
+        self.drift_sections = [s for s in golden_config_sections(self.golden) if s != "lora"] if self.golden else []
+        self.interfaces = {}
+        self._drift_synced = {}  # target: monotonic time its drift sections were last re-read
+        self.rows = {target: new_row(target) for target in self.targets}
+        self.refresh_seconds = None  # Wall time of the last full refresh
+        self._refresh_started = None
+        self._futures = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.targets)), thread_name_prefix="fleet")
+
+    def refresh(self, targets=None):
+        """Start polling the given targets, or all of them, skipping any that are still being polled."""
+        if targets is None:
+            self._refresh_started = time.monotonic()
+        for target in targets or self.targets:
+            future = self._futures.get(target)
+            if future is None or future.done():
+                self.rows[target] = dict(self.rows[target], state="polling" if target in self.interfaces else "connecting")
+                self._futures[target] = self._pool.submit(self.poll, target)
+
+    def busy(self):
+        """True while any poll is running. Records the refresh time when the last one finishes."""
+        busy = any(not future.done() for future in self._futures.values())
+        if not busy and self._refresh_started is not None:
+            self.refresh_seconds = time.monotonic() - self._refresh_started
+            self._refresh_started = None
+        return busy
+
+    def poll(self, target):
+        """Connect to target, or re-read its sections over the open connection, and update its row."""
+        start = time.monotonic()
+        row = dict(self.rows[target], error=None)
+        try:
+            interface = self.interfaces.get(target)
+            if interface is None:
+                interface = self.interfaces[target] = open_target(target)
+                self._drift_synced[target] = time.monotonic()  # Connecting downloads the whole config
+            else:
+                sections = ["lora"]
+                if time.monotonic() - self._drift_synced[target] >= drift_resync_secs:
+                    sections += self.drift_sections
+                    self._drift_synced[target] = time.monotonic()
+                if not resync_sections(interface, sections):
+                    raise TimeoutError("node stopped answering")
+            row.update(node_status(interface, self.golden), state="ok")
+        except (Exception, SystemExit) as e:  # meshtastic calls sys.exit() on some connection failures
+            logging.error(f"Polling {target[1]} failed: {e}")
+            row.update(state="error", error=str(e) or e.__class__.__name__)
+            self.disconnect(target)  # Reconnect from scratch on the next refresh
+        row["seconds"] = time.monotonic() - start
+        self.rows[target] = row
+        return row
+
+    def disconnect(self, target):
+        interface = self.interfaces.pop(target, None)
+        if interface is not None:
+            try:
+                interface.close()
+            except Exception as e:
+                logging.warning(f"Error closing interface for {target[1]}: {e}")
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for target in list(self.interfaces):
+            self.disconnect(target)
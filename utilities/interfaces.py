@@ -1,22 +1,219 @@
+import json
 import logging
-import meshtastic.serial_interface, meshtastic.tcp_interface, meshtastic.ble_interface
+import os
+import threading
+import time
+from meshtastic.protobuf import admin_pb2
+from utilities.mock_interface import MockInterface
 
-def initialize_interface(args, interface = None):
+# Get the parent directory of the script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
+
+# Last transport that worked for each node, so a bare launch can go straight to it
+transport_cache_path = os.path.join(parent_dir, "transports.json")
+
+reboot_timeout_secs = 60  # How long a node may take to come back after a config write that reboots it
+reboot_poll_secs = 5      # How long each try to re-read a section waits while the node is rebooting
+resync_timeout_secs = 30
+
+
+def transport_from_args(args):
+    """Return the (kind, target) the user asked for, or None to autodetect."""
+    if getattr(args, "mock", False):
+        return ("mock", None)
+    if args.ble:
+        return ("ble", args.ble)
+    if args.host:
+        return ("tcp", args.host)
+    if args.port:
+        return ("serial", args.port)
+    return None
+
+
+def open_transport(transport, args=None, progress=None):
+    """
+    :param progress: Optional LoadProgress that is fed every packet of the config download
+    """
+    kind, target = transport
+    if kind == "mock":
+        return MockInterface(latency=getattr(args, "mock_latency", 0.0), failure_rate=getattr(args, "mock_failure_rate", 0.0))
+
+    # Only the chosen transport's module is imported; the BLE one pulls in bleak, which is slow to load
+    track = progress.track if progress else (lambda interface_class: interface_class)
+    if kind == "ble":
+        import meshtastic.ble_interface
+        return track(meshtastic.ble_interface.BLEInterface)(target if target != "any" else None)
+    elif kind == "tcp":
+        import meshtastic.tcp_interface
+        return track(meshtastic.tcp_interface.TCPInterface)(target)
+    import meshtastic.serial_interface
+    return track(meshtastic.serial_interface.SerialInterface)(target)
+
+
+def load_transport_cache():
+    try:
+        with open(transport_cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"last": None, "nodes": {}}
+
+
+def remember_transport(interface, transport):
+    """Record which transport reached this node so the next launch tries it first."""
+    if transport is None or transport[0] == "mock":
+        return
+    node_info = interface.getMyNodeInfo() or {}
+    node_id = node_info.get("user", {}).get("id")
+    if not node_id:
+        return
+
+    cache = load_transport_cache()
+    cache["nodes"][node_id] = {"transport": transport[0], "target": transport[1], "last_connected": int(time.time())}
+    cache["last"] = node_id
     try:
-        if args.ble:
-            return meshtastic.ble_interface.BLEInterface(args.ble if args.ble != "any" else None)
-        elif args.host:
-            return meshtastic.tcp_interface.TCPInterface(args.host)
+        with open(transport_cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=4)
+    except OSError as ex:
+        logging.warning(f"Could not save transport cache: {ex}")
+
+
+def remembered_transport(node_id=None):
+    """Return the cached (kind, target) for node_id, or for the last node we connected to."""
+    cache = load_transport_cache()
+    entry = cache["nodes"].get(node_id or cache.get("last") or "")
+    if not entry:
+        return None
+    return (entry["transport"], entry["target"])
+
+
+def remembered_node_id(transport=None):
+    """Return the node last reached through transport, or the last node we connected to at all."""
+    cache = load_transport_cache()
+    if transport is None:
+        return cache.get("last")
+    for node_id, entry in cache["nodes"].items():
+        if (entry["transport"], entry["target"]) == tuple(transport):
+            return node_id
+    return None
+
+
+def autodetect_interface(args, progress=None):
+    """Use a serial device that is plugged in, then the remembered transport, then TCP to meshtastic.local."""
+    from meshtastic.util import findPorts
+
+    ports = findPorts(True)
+    remembered = remembered_transport()
+    if len(ports) > 1 and remembered and remembered[0] == "serial" and remembered[1] in ports:
+        ports = [remembered[1]]  # Several devices plugged in: the one we used last
+    if len(ports) == 1:
+        try:
+            return open_transport(("serial", ports[0]), args, progress), ("serial", ports[0])
+        except PermissionError as ex:
+            logging.error(f"You probably need to add yourself to the `dialout` group to use a serial connection. {ex}")
+        except Exception as ex:
+            logging.error(f"Unexpected error initializing interface: {ex}")
+    elif ports:
+        logging.error(f"Several serial devices found, pick one with --port: {', '.join(ports)}")
+
+    if remembered and not (remembered[0] == "serial" and remembered[1] in ports):  # A port we just tried is no better the second time
+        try:
+            logging.info(f"Trying remembered transport {remembered[0]}:{remembered[1]}")
+            return open_transport(remembered, args, progress), remembered
+        except Exception as ex:
+            logging.warning(f"Remembered transport {remembered[0]}:{remembered[1]} failed: {ex}")
+    return open_transport(("tcp", "meshtastic.local"), args, progress), ("tcp", "meshtastic.local")
+
+
+def initialize_interface(args, interface = None, progress=None, remote=True):
+    """
+    :param remote: With --dest, return the remote node's RemoteInterface with its config fetched
+                   instead of the connected node's interface
+    """
+    try:
+        transport = transport_from_args(args)
+        if transport is None:
+            interface, transport = autodetect_interface(args, progress)
         else:
             try:
-                return meshtastic.serial_interface.SerialInterface(args.port)
+                interface = open_transport(transport, args, progress)
             except PermissionError as ex:
                 logging.error(f"You probably need to add yourself to the `dialout` group to use a serial connection. {ex}")
-            except Exception as ex:
-                logging.error(f"Unexpected error initializing interface: {ex}")
-            if interface.devPath is None:
-                return meshtastic.tcp_interface.TCPInterface("meshtastic.local")
-    
+                return None
+        remember_transport(interface, transport)
+        if remote and getattr(args, "dest", None):
+            from utilities.remote import initialize_remote
+            return initialize_remote(interface, args)
+        return interface
+
     except Exception as ex:
         logging.critical(f"Fatal error initializing interface: {ex}")
-    
\ No newline at end of file
+
+
+def resync_sections(interface, sections, timeout=resync_timeout_secs):
+    """
+    Re-read only the given config sections over the live session.
+    :return: True if the node answered for every section before the timeout
+    """
+    node = interface.localNode
+    for section in sections:
+        p = admin_pb2.AdminMessage()
+        if section in node.localConfig.DESCRIPTOR.fields_by_name:
+            p.get_config_request = admin_pb2.AdminMessage.ConfigType.Value(section.upper() + "_CONFIG")
+        elif section in node.moduleConfig.DESCRIPTOR.fields_by_name:
+            p.get_module_config_request = node.moduleConfig.DESCRIPTOR.fields_by_name[section].index
+        else:
+            logging.warning(f"Can't resync unknown config section '{section}'")
+            continue
+
+        answered = threading.Event()
+
+        # Node.onResponseRequestSettings prints the section to stdout, which would land on top of the curses screen
+        def on_response(packet, section=section):
+            admin = packet.get("decoded", {}).get("admin")
+            if admin is None:
+                return  # Routing error; let the wait time out
+            raw = admin["raw"]
+            if raw.HasField("get_config_response"):
+                getattr(node.localConfig, section).CopyFrom(getattr(raw.get_config_response, section))
+            elif raw.HasField("get_module_config_response"):
+                getattr(node.moduleConfig, section).CopyFrom(getattr(raw.get_module_config_response, section))
+            answered.set()
+
+        node._sendAdmin(p, wantResponse=True, onResponse=on_response)
+        if not answered.wait(timeout):
+            logging.warning(f"No response re-reading '{section}' within {timeout}s")
+            return False
+    return True
+
+
+def reconnect_after_write(interface, args, sections):
+    """
+    Keep using the session after a write that reboots the node, re-reading only the sections that changed.
+    Falls back to a full reconnect through the remembered transport if the session didn't survive.
+    """
+    # Poll until the node answers again instead of guessing how long its reboot takes
+    deadline = time.monotonic() + reboot_timeout_secs
+    while interface.isConnected.is_set() and time.monotonic() < deadline:
+        if resync_sections(interface, sections, timeout=reboot_poll_secs):
+            logging.info(f"Reused live session, re-synced {', '.join(sections)}")
+            return interface
+
+    logging.info("Live session did not survive the reboot, reconnecting")
+    try:
+        interface.close()
+    except Exception as ex:
+        logging.warning(f"Error closing interface: {ex}")
+
+    transport = transport_from_args(args)
+    if transport is None:
+        node_id = (interface.getMyNodeInfo() or {}).get("user", {}).get("id")
+        transport = remembered_transport(node_id)
+    if transport is None:
+        return initialize_interface(args)
+    try:
+        new_interface = open_transport(transport, args)
+        remember_transport(new_interface, transport)
+        return new_interface
+    except Exception as ex:
+        logging.critical(f"Fatal error reconnecting: {ex}")
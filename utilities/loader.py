@@ -0,0 +1,110 @@
+import logging
+import threading
+
+from meshtastic.protobuf import localonly_pb2, mesh_pb2
+
+from utilities.interfaces import initialize_interface
+
+# Connecting and downloading the node's config on a worker thread, so the splash and the
+# settings menu stay responsive. LoadProgress watches every FromRadio packet the interface
+# handles and records which config sections have landed.
+
+config_sections = [field.name for field in localonly_pb2.LocalConfig.DESCRIPTOR.fields if field.name != "version"]
+module_sections = [field.name for field in localonly_pb2.LocalModuleConfig.DESCRIPTOR.fields if field.name != "version"]
+
+
+class LoadProgress:
+    """Counters for the config download. Written by the interface's reader thread, read by the UI."""
+
+    def __init__(self):
+        self.interface = None   # Set on the first packet, before the interface constructor returns
+        self.bytes_received = 0
+        self.packets = 0
+        self.nodes = 0
+        self.channels = []
+        self.sections = set()   # "user", "channels", "config.<name>" and "module_config.<name>"
+        self.complete = False
+
+    def track(self, interface_class):
+        """Return a subclass of interface_class that reports each FromRadio packet here."""
+        progress = self
+
+        class Tracked(interface_class):
+            def _handleFromRadio(self, fromRadioBytes):
+                super()._handleFromRadio(fromRadioBytes)
+                try:
+                    progress.on_from_radio(self, fromRadioBytes)
+                except Exception as ex:  # Never let progress reporting break the reader thread
+                    logging.warning(f"Load progress tracking failed: {ex}")
+
+        Tracked.__name__ = Tracked.__qualname__ = interface_class.__name__
+        return Tracked
+
+    def on_from_radio(self, interface, data):
+        self.interface = interface
+        self.bytes_received += len(data)
+        self.packets += 1
+
+        from_radio = mesh_pb2.FromRadio()
+        from_radio.ParseFromString(data)
+        variant = from_radio.WhichOneof("payload_variant")
+
+        if variant == "node_info":
+            self.nodes += 1
+            if interface.myInfo is not None and from_radio.node_info.num == interface.myInfo.my_node_num:
+                self.sections.add("user")
+        elif variant == "channel":
+            self.channels.append(from_radio.channel)
+        elif variant == "config":
+            self.sections.add("config." + from_radio.config.WhichOneof("payload_variant"))
+        elif variant == "moduleConfig":
+            self.sections.add("module_config." + from_radio.moduleConfig.WhichOneof("payload_variant"))
+        elif variant == "config_complete_id":
+            self.complete = True
+
+        # The node sends its channels as one run. Hand them to the Node as soon as the run ends
+        # instead of at config_complete, which only comes after the whole node DB. It has to be
+        # meshtastic's own list: config_complete installs that one, and edits made in between
+        # must land in it.
+        if variant != "channel" and self.channels and "channels" not in self.sections:
+            interface.localNode.setChannels(interface._localChannels)
+            self.sections.add("channels")
+
+    def has(self, section):
+        return self.complete or section is None or section in self.sections
+
+    def counts(self):
+        """Return (config, module config) sections received so far."""
+        sections = list(self.sections)
+        return (
+            sum(1 for s in sections if s.startswith("config.")),
+            sum(1 for s in sections if s.startswith("module_config.")),
+        )
+
+
+class BackgroundConnection:
+    """Runs initialize_interface on a worker thread, reporting the download through self.progress."""
+
+    def __init__(self, args):
+        self.interface = None
+        self.progress = LoadProgress()
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(args,), name="node-connect", daemon=True)
+        self._thread.start()
+
+    def _run(self, args):
+        try:
+            self.interface = initialize_interface(args, progress=self.progress, remote=False)  # main opens --dest itself
+            if self.interface is not None:
+                self.progress.interface = self.interface
+                self.progress.complete = True
+        except (Exception, SystemExit) as ex:  # meshtastic calls sys.exit() on some connection failures
+            logging.error(f"Background connection failed: {ex}")
+        finally:
+            self.done.set()
+
+    def usable_interface(self):
+        """The interface once the node's own info has arrived, even if the download is still running."""
+        if self.progress.has("user"):
+            return self.progress.interface
+        return None
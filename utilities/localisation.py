@@ -0,0 +1,128 @@
+import hashlib
+import locale
+import logging
+import marshal
+import os
+
+from utilities.control_utils import parse_ini_file
+
+# Each localisations/<lang>.ini is compiled once into a marshalled catalogue under
+# localisations/__pycache__. A catalogue is reused while the .ini keeps its mtime and size,
+# or, if those changed (a git checkout, say), while its content hash still matches.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
+
+localisation_dir = os.path.join(parent_dir, "localisations")
+catalogue_dir = os.path.join(localisation_dir, "__pycache__")
+catalogue_format = 1  # Bump when the catalogue layout changes
+default_language = "en"
+missing_help = "No help available."  # What parse_ini_file stores for entries without help
+
+
+def ini_path(language):
+    return os.path.join(localisation_dir, f"{language}.ini")
+
+
+def catalogue_path(language):
+    return os.path.join(catalogue_dir, f"{language}.catalogue")
+
+
+def available_languages():
+    try:
+        return sorted(name[:-4] for name in os.listdir(localisation_dir) if name.endswith(".ini"))
+    except OSError:
+        return []
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _write_catalogue(language, stat, digest, field_mapping, help_text):
+    path = catalogue_path(language)
+    try:
+        os.makedirs(catalogue_dir, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(marshal.dumps((catalogue_format, stat.st_mtime_ns, stat.st_size, digest, field_mapping, help_text)))
+        os.replace(path + ".tmp", path)
+    except OSError as ex:  # A read-only install still works, it just parses the .ini each time
+        logging.info(f"Could not write localisation catalogue {path}: {ex}")
+
+
+def load_catalogue(language):
+    """
+    Return (field_mapping, help_text) for one language, compiling its .ini if the catalogue is stale.
+    :raises OSError: If there is no .ini for the language
+    """
+    source = ini_path(language)
+    stat = os.stat(source)
+
+    cached = None
+    try:
+        with open(catalogue_path(language), "rb") as f:
+            cached = marshal.loads(f.read())  # marshal.load() on a file reads it in tiny chunks
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    if cached and cached[0] == catalogue_format:
+        _, mtime_ns, size, digest, field_mapping, help_text = cached
+        if (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size):
+            return field_mapping, help_text
+        if _file_hash(source) == digest:
+            _write_catalogue(language, stat, digest, field_mapping, help_text)  # Only the mtime moved
+            return field_mapping, help_text
+
+    field_mapping, help_text = parse_ini_file(source)
+    _write_catalogue(language, stat, _file_hash(source), field_mapping, help_text)
+    return field_mapping, help_text
+
+
+def detect_language(requested=None):
+    """
+    Pick the catalogue to use: the requested language if there is one for it, otherwise the
+    user's locale, otherwise English. "de_DE.UTF-8" and "de-DE" both select de.ini.
+    """
+    languages = available_languages()
+    candidates = [requested] if requested else []
+    candidates += [locale.getlocale(locale.LC_MESSAGES)[0] if hasattr(locale, "LC_MESSAGES") else None]
+    candidates += [os.environ.get(name) for name in ("LC_ALL", "LC_MESSAGES", "LANG")]
+
+    for candidate in candidates:
+        if not candidate:
+            continue
+        code = candidate.split(".")[0].replace("-", "_")
+        for language in (code, code.split("_")[0].lower()):
+            if language in languages:
+                return language
+    if requested:
+        logging.warning(f"No translation for '{requested}', using {default_language}")
+    return default_language
+
+
+def load_translations(language=None):
+    """
+    Return (field_mapping, help_text) for the detected or requested language.
+    Keys the translation leaves out, or leaves without a name or help, fall back to English one by one.
+    """
+    language = detect_language(language)
+    field_mapping, help_text = load_catalogue(default_language)
+    if language == default_language:
+        return field_mapping, help_text
+
+    try:
+        translated_mapping, translated_help = load_catalogue(language)
+    except OSError as ex:
+        logging.warning(f"Could not load {language} translations: {ex}")
+        return field_mapping, help_text
+
+    field_mapping = dict(field_mapping)
+    help_text = dict(help_text)
+    for key, name in translated_mapping.items():
+        if name != key.rsplit(".", 1)[-1]:  # parse_ini_file uses the bare key when no name is given
+            field_mapping[key] = name
+    for key, text in translated_help.items():
+        if text != missing_help:
+            help_text[key] = text
+    return field_mapping, help_text
@@ -0,0 +1,228 @@
+import logging
+import random
+import threading
+import time
+
+from google.protobuf.json_format import MessageToDict, ParseDict
+from meshtastic.node import Node
+from meshtastic.protobuf import admin_pb2, channel_pb2, config_pb2, localonly_pb2, mesh_pb2
+from meshtastic.util import Acknowledgment, to_node_num
+
+# An in-process stand-in for a Meshtastic radio. MockInterface exposes the parts of the
+# Serial/TCP/BLE interface API that this app uses, and MockNode is a real meshtastic Node
+# whose admin messages are applied to a simulated device instead of going over a link.
+
+MOCK_NODE_NUM = 0x4D4F434B  # "MOCK"
+MOCK_REMOTE_NUM = 0x524D5445  # "RMTE", a node elsewhere on the simulated mesh
+
+
+def default_device_config():
+    """Return the (LocalConfig, LocalModuleConfig, channels) of a freshly flashed US node."""
+    local_config = localonly_pb2.LocalConfig()
+    local_config.device.role = config_pb2.Config.DeviceConfig.Role.CLIENT
+    local_config.device.node_info_broadcast_secs = 10800
+    local_config.position.position_broadcast_secs = 900
+    local_config.position.gps_mode = config_pb2.Config.PositionConfig.GpsMode.ENABLED
+    local_config.lora.use_preset = True
+    local_config.lora.region = config_pb2.Config.LoRaConfig.RegionCode.US
+    local_config.lora.modem_preset = config_pb2.Config.LoRaConfig.ModemPreset.LONG_FAST
+    local_config.lora.hop_limit = 3
+    local_config.lora.tx_enabled = True
+    local_config.bluetooth.enabled = True
+    local_config.bluetooth.fixed_pin = 123456
+
+    module_config = localonly_pb2.LocalModuleConfig()
+    module_config.telemetry.device_update_interval = 1800
+
+    channels = []
+    for index in range(8):
+        channel = channel_pb2.Channel(index=index)
+        if index == 0:
+            channel.role = channel_pb2.Channel.Role.PRIMARY
+            channel.settings.psk = b"\x01"
+        else:
+            channel.role = channel_pb2.Channel.Role.DISABLED
+        channels.append(channel)
+
+    return local_config, module_config, channels
+
+
+class MockNode(Node):
+    """A meshtastic Node whose admin messages are applied to the simulated device after a configurable delay."""
+
+    def __init__(self, iface, nodeNum, latency=0.0, failure_rate=0.0, seed=None):
+        super().__init__(iface, nodeNum, noProto=False)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # What the simulated radio has actually stored, as opposed to the client's editable copy
+        self.device_config, self.device_module_config, self.device_channels = default_device_config()
+        self.localConfig.CopyFrom(self.device_config)
+        self.moduleConfig.CopyFrom(self.device_module_config)
+        self.channels = [self._copy(channel) for channel in self.device_channels]
+
+        self.admin_log = []     # (admin message type, delivered) in send order
+        self.transactions = 0   # completed beginSettingsTransaction/commitSettingsTransaction pairs
+        self.reboots = 0
+
+    @staticmethod
+    def _copy(message):
+        copy = type(message)()
+        copy.CopyFrom(message)
+        return copy
+
+    def ensureSessionKey(self):
+        pass  # The simulated device doesn't require a session passkey
+
+    def _sendAdmin(self, p, wantResponse=True, onResponse=None, adminIndex=0):
+        if self.latency:
+            time.sleep(self.latency)
+
+        variant = p.WhichOneof("payload_variant")
+        delivered = self._random.random() >= self.failure_rate
+        with self._lock:
+            self.admin_log.append((variant, delivered))
+            if delivered:
+                self._apply(p, variant)
+            else:
+                logging.warning(f"Mock node dropped admin message {variant}")
+
+        if delivered and onResponse and variant in ("get_config_request", "get_module_config_request", "get_channel_request", "get_owner_request"):
+            onResponse(self._config_response(p, variant))
+        elif delivered and onResponse:
+            onResponse({"from": self.nodeNum, "decoded": {"portnum": "ROUTING_APP", "routing": {"errorReason": "NONE"}}})
+
+        return mesh_pb2.MeshPacket(id=self.iface._generatePacketId(), to=self.nodeNum)
+
+    def _config_response(self, p, variant):
+        """Build the decoded packet dict a real node would answer a config request with."""
+        response = admin_pb2.AdminMessage(session_passkey=f"{self.nodeNum:08x}".encode("ascii"))
+        if variant == "get_config_request" and p.get_config_request == admin_pb2.AdminMessage.SESSIONKEY_CONFIG:
+            response.get_config_response.sessionkey.SetInParent()
+        elif variant == "get_config_request":
+            section = admin_pb2.AdminMessage.ConfigType.Name(p.get_config_request)[:-len("_CONFIG")].lower()
+            getattr(response.get_config_response, section).CopyFrom(getattr(self.device_config, section))
+        elif variant == "get_module_config_request":
+            section = self.device_module_config.DESCRIPTOR.fields[p.get_module_config_request].name
+            getattr(response.get_module_config_response, section).CopyFrom(getattr(self.device_module_config, section))
+        elif variant == "get_channel_request":
+            response.get_channel_response.CopyFrom(self.device_channels[p.get_channel_request - 1])
+        else:
+            user = self.iface._getOrCreateByNum(self.nodeNum).get("user", {})
+            ParseDict(user, response.get_owner_response, ignore_unknown_fields=True)
+        # What meshtastic's admin protocol handler does with the passkey in every admin answer
+        self.iface._getOrCreateByNum(self.nodeNum)["adminSessionPassKey"] = response.session_passkey
+        admin = MessageToDict(response)
+        admin["raw"] = response
+        return {"from": self.nodeNum, "decoded": {"admin": admin}}
+
+    def _apply(self, p, variant):
+        """Store an admin message on the simulated device."""
+        if variant == "set_config":
+            section = p.set_config.WhichOneof("payload_variant")
+            getattr(self.device_config, section).CopyFrom(getattr(p.set_config, section))
+        elif variant == "set_module_config":
+            section = p.set_module_config.WhichOneof("payload_variant")
+            getattr(self.device_module_config, section).CopyFrom(getattr(p.set_module_config, section))
+        elif variant == "set_channel":
+            self.device_channels[p.set_channel.index].CopyFrom(p.set_channel)
+        elif variant == "set_owner":
+            user = self.iface._getOrCreateByNum(self.nodeNum).setdefault("user", {})
+            if p.set_owner.long_name:
+                user["longName"] = p.set_owner.long_name
+                user["isLicensed"] = p.set_owner.is_licensed
+            if p.set_owner.short_name:
+                user["shortName"] = p.set_owner.short_name
+        elif variant == "set_fixed_position":
+            self.device_config.position.fixed_position = True
+            self.iface._getOrCreateByNum(self.nodeNum)["position"] = {
+                "latitude": p.set_fixed_position.latitude_i * 1e-7,
+                "longitude": p.set_fixed_position.longitude_i * 1e-7,
+                "altitude": p.set_fixed_position.altitude,
+            }
+        elif variant == "commit_edit_settings":
+            self.transactions += 1
+        elif variant in ("reboot_seconds", "shutdown_seconds", "factory_reset_config", "factory_reset_device"):
+            self.reboots += 1
+
+
+class MockInterface:
+    """
+    Simulated radio connection with the same surface as meshtastic's SerialInterface/TCPInterface.
+    :param latency: Seconds each admin message takes to reach the device
+    :param failure_rate: Probability (0-1) that an admin message is silently dropped
+    :param seed: Seed for the failure injection, for reproducible runs
+    :param remotes: How many other nodes on the simulated mesh answer admin messages, for --dest
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None, nodeNum=MOCK_NODE_NUM, remotes=1):
+        self.devPath = "mock"
+        self.noProto = False
+        self.isConnected = threading.Event()
+        self.myInfo = mesh_pb2.MyNodeInfo(my_node_num=nodeNum)
+        self.metadata = mesh_pb2.DeviceMetadata(firmware_version="2.5.0.mock", hw_model=0)
+
+        node_id = f"!{nodeNum:08x}"
+        node_info = {
+            "num": nodeNum,
+            "user": {"id": node_id, "longName": "Mock Node", "shortName": "MOCK", "isLicensed": False},
+            "position": {"latitude": 45.5, "longitude": -122.6, "altitude": 30},
+        }
+        self.nodesByNum = {nodeNum: node_info}
+        self.nodes = {node_id: node_info}
+
+        self._packet_id = random.Random(seed).randint(1, 0x7FFFFFFF)
+        self._acknowledgment = Acknowledgment()
+        self.localNode = MockNode(self, nodeNum, latency=latency, failure_rate=failure_rate, seed=seed)
+
+        # Simulated devices elsewhere on the mesh, reached through sendData
+        self.remote_devices = {}
+        for offset in range(remotes):
+            remote_num = MOCK_REMOTE_NUM + offset
+            remote_id = f"!{remote_num:08x}"
+            self.nodesByNum[remote_num] = self.nodes[remote_id] = {
+                "num": remote_num,
+                "user": {"id": remote_id, "longName": f"Mock Remote {offset + 1}", "shortName": f"RMT{offset + 1}", "isLicensed": False},
+            }
+            self.remote_devices[remote_num] = MockNode(self, remote_num, latency=latency, failure_rate=failure_rate, seed=seed)
+        self.isConnected.set()
+
+    def _generatePacketId(self):
+        self._packet_id = (self._packet_id + 1) & 0xFFFFFFFF
+        return self._packet_id
+
+    def _getOrCreateByNum(self, nodeNum):
+        return self.nodesByNum.setdefault(nodeNum, {"num": nodeNum})
+
+    def getNode(self, nodeId, requestChannels=True, requestChannelAttempts=3, timeout=300):
+        if nodeId in ("^local", "^all"):
+            return self.localNode
+        raise ValueError(f"Mock interface only simulates the local node, not {nodeId}")
+
+    def sendData(self, data, destinationId, portNum=None, wantAck=False, wantResponse=False, onResponse=None, **kwargs):
+        """Deliver an admin message to a simulated remote node, which answers the way MockNode does."""
+        device = self.remote_devices.get(to_node_num(destinationId))
+        if device is None:
+            logging.warning(f"No simulated node {destinationId} to deliver to")
+            return mesh_pb2.MeshPacket(id=self._generatePacketId(), to=to_node_num(destinationId))
+        return device._sendAdmin(data, wantResponse=wantResponse, onResponse=onResponse)
+
+    def waitForAckNak(self):
+        pass  # Simulated nodes answer before sendData returns
+
+    def getMyNodeInfo(self):
+        return self.nodesByNum.get(self.myInfo.my_node_num)
+
+    def getMyUser(self):
+        return self.getMyNodeInfo().get("user")
+
+    def getLongName(self):
+        return self.getMyUser().get("longName")
+
+    def getShortName(self):
+        return self.getMyUser().get("shortName")
+
+    def close(self):
+        self.isConnected.clear()
@@ -0,0 +1,133 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+
+from meshtastic.node import Node
+from meshtastic.protobuf import channel_pb2, mesh_pb2
+
+import ui.default_config as config
+from utilities.mock_interface import MockInterface
+
+# Snapshots of each node's config, so the menu can be drawn from disk while the real
+# download runs in the background. Bump snapshot_version whenever the layout changes;
+# older files are ignored and rewritten on the next successful connection.
+
+snapshot_version = 1
+
+
+def snapshot_dir():
+    """Snapshots live in node-cache/ next to the message database."""
+    return os.path.join(os.path.dirname(os.path.abspath(config.db_file_path)), "node-cache")
+
+
+def snapshot_path(node_id):
+    return os.path.join(snapshot_dir(), f"{node_id.lstrip('!')}.json")
+
+
+def _encode(message):
+    return base64.b64encode(message.SerializeToString()).decode("ascii")
+
+
+def _decode(message, data):
+    message.ParseFromString(base64.b64decode(data))
+    return message
+
+
+def save_snapshot(interface):
+    """
+    Write the node's current config to its snapshot file.
+    :return: The snapshot path, or None if the interface isn't a live connection
+    """
+    if interface is None or isinstance(interface, (CachedInterface, MockInterface)):
+        return None
+    node_info = interface.getMyNodeInfo() or {}
+    node_id = node_info.get("user", {}).get("id")
+    node = interface.localNode
+    if not node_id or node.channels is None:
+        return None
+
+    snapshot = {
+        "version": snapshot_version,
+        "node_id": node_id,
+        "saved_at": int(time.time()),
+        "my_node_num": interface.myInfo.my_node_num,
+        "node_info": node_info,
+        "metadata": _encode(interface.metadata) if getattr(interface, "metadata", None) else None,
+        "local_config": _encode(node.localConfig),
+        "module_config": _encode(node.moduleConfig),
+        "channels": [_encode(channel) for channel in node.channels],
+    }
+
+    path = snapshot_path(node_id)
+    try:
+        os.makedirs(snapshot_dir(), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(path + ".tmp", path)  # Never leave a half-written snapshot behind
+    except OSError as ex:
+        logging.warning(f"Could not save node snapshot: {ex}")
+        return None
+    return path
+
+
+def load_snapshot(node_id):
+    """Return the snapshot dict for node_id, or None if there isn't a usable one."""
+    if not node_id:
+        return None
+    try:
+        with open(snapshot_path(node_id), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("version") != snapshot_version:
+        logging.info(f"Ignoring snapshot for {node_id} with version {snapshot.get('version')}")
+        return None
+    return snapshot
+
+
+class CachedInterface:
+    """
+    Read-only stand-in for a node, built from its snapshot. It has the interface surface the
+    menus need, and its Node is created with noProto so nothing can be sent through it.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.devPath = None
+        self.noProto = True
+        self.isConnected = threading.Event()  # Never set; this is not a connection
+        self.myInfo = mesh_pb2.MyNodeInfo(my_node_num=snapshot["my_node_num"])
+        self.metadata = mesh_pb2.DeviceMetadata()
+        if snapshot.get("metadata"):
+            _decode(self.metadata, snapshot["metadata"])
+
+        node_info = snapshot["node_info"]
+        self.nodesByNum = {self.myInfo.my_node_num: node_info}
+        self.nodes = {snapshot["node_id"]: node_info}
+
+        self.localNode = Node(self, self.myInfo.my_node_num, noProto=True)
+        _decode(self.localNode.localConfig, snapshot["local_config"])
+        _decode(self.localNode.moduleConfig, snapshot["module_config"])
+        self.localNode.channels = [_decode(channel_pb2.Channel(), data) for data in snapshot["channels"]]
+
+    def getNode(self, nodeId, requestChannels=True, requestChannelAttempts=3, timeout=300):
+        return self.localNode
+
+    def getMyNodeInfo(self):
+        return self.nodesByNum.get(self.myInfo.my_node_num)
+
+    def getMyUser(self):
+        return self.getMyNodeInfo().get("user")
+
+    def getLongName(self):
+        return self.getMyUser().get("longName")
+
+    def getShortName(self):
+        return self.getMyUser().get("shortName")
+
+    def close(self):
+        pass
+
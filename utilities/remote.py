@@ -0,0 +1,431 @@
+import base64
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+from google.protobuf.json_format import MessageToDict
+from meshtastic.node import Node
+from meshtastic.protobuf import admin_pb2, channel_pb2, mesh_pb2
+from meshtastic.util import to_node_num
+
+from utilities.loader import LoadProgress, config_sections, module_sections
+from utilities.node_cache import snapshot_dir
+from utilities.timing import count_message, timed
+
+# Administering a node over the mesh. RemoteInterface wraps the connection to the local radio so
+# that its localNode is the remote node: the menus, staged saves, config_import, backups and
+# exports all work on the remote node without knowing it is remote.
+#
+# Every admin packet to a remote node goes through the connection's AdminQueue, one at a time
+# and at least admin_interval_secs apart, so a full config download doesn't flood the channel.
+# Sections are cached per node in node-cache/remote-<id>.json. Writing a section drops its
+# cache entry, and entries older than remote_cache_max_age_secs are fetched again.
+
+admin_interval_secs = 3.0          # Minimum gap between admin packets on the mesh
+remote_request_timeout_secs = 60   # How long one remote config request waits for its answer
+remote_cache_max_age_secs = 24 * 3600
+session_key_max_age_secs = 240     # The firmware drops an admin session key after 300 s; get a new one before then
+remote_cache_version = 1
+channel_slots = 8
+
+_queues = weakref.WeakKeyDictionary()  # One AdminQueue per radio connection
+_queues_lock = threading.Lock()
+
+
+class AdminQueue:
+    """
+    Sends admin packets in the order they were submitted, one at a time and at least
+    interval seconds apart. Callers block until their packet has gone out.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._last_sent = 0.0
+        self._thread = threading.Thread(target=self._run, name="admin-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, send, *args, **kwargs):
+        """Queue one send and wait for it. Returns what send returned, or raises what it raised."""
+        future = Future()
+        self._queue.put((future, send, args, kwargs))
+        return future.result()
+
+    def waiting(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            future, send, args, kwargs = self._queue.get()
+            delay = self._last_sent + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                future.set_result(send(*args, **kwargs))
+            except BaseException as e:  # meshtastic calls sys.exit() on some failures
+                future.set_exception(e)
+            finally:
+                self._last_sent = time.monotonic()
+
+
+def admin_queue(interface, interval=None):
+    """The AdminQueue shared by everything that sends over this connection."""
+    with _queues_lock:
+        if interface not in _queues:
+            _queues[interface] = AdminQueue(admin_interval_secs if interval is None else interval)
+        elif interval is not None:
+            _queues[interface].interval = interval
+        return _queues[interface]
+
+
+class RemoteCache:
+    """A remote node's config sections as fetched, keyed like LoadProgress sections ("user", "channels", "config.lora")."""
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.path = os.path.join(snapshot_dir(), f"remote-{node_id.lstrip('!')}.json")
+        self.sections = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == remote_cache_version:
+                self.sections = cached.get("sections", {})
+        except (OSError, ValueError):
+            pass
+
+    def get(self, section):
+        """The cached data of a section, or None if it isn't cached or is too old."""
+        entry = self.sections.get(section)
+        if entry is None or time.time() - entry["fetched_at"] > remote_cache_max_age_secs:
+            return None
+        return entry["data"]
+
+    def put(self, section, data):
+        with self._lock:
+            self.sections[section] = {"data": data, "fetched_at": int(time.time())}
+        self.save()
+
+    def invalidate(self, section):
+        with self._lock:
+            dropped = self.sections.pop(section, None) is not None
+        if dropped:
+            logging.info(f"Dropped cached {section} of {self.node_id}")
+            self.save()
+
+    def save(self):
+        with self._lock:
+            data = {"version": remote_cache_version, "node_id": self.node_id, "sections": dict(self.sections)}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as ex:
+            logging.warning(f"Could not save remote config cache: {ex}")
+
+
+def _encode(message):
+    return base64.b64encode(message.SerializeToString()).decode("ascii")
+
+
+def _decode(message, data):
+    message.ParseFromString(base64.b64decode(data))
+    return message
+
+
+def written_section(p):
+    """The cache section an admin message overwrites, if any."""
+    variant = p.WhichOneof("payload_variant")
+    if variant == "set_config":
+        return "config." + p.set_config.WhichOneof("payload_variant")
+    if variant == "set_module_config":
+        return "module_config." + p.set_module_config.WhichOneof("payload_variant")
+    if variant == "set_channel":
+        return "channels"
+    if variant == "set_owner":
+        return "user"
+    return None
+
+
+class RemoteNode(Node):
+    """A meshtastic Node reached over the mesh. Its admin packets go through the connection's AdminQueue."""
+
+    def __init__(self, iface, nodeNum, cache, interval=None):
+        super().__init__(iface, nodeNum, noProto=False)
+        self.cache = cache
+        self.queue = admin_queue(iface, interval)
+        self.session_key_at = None  # When the node last answered with a session key, time.monotonic()
+
+    def _sendAdmin(self, p, wantResponse=True, onResponse=None, adminIndex=0):
+        section = written_section(p)
+        if section:
+            self.cache.invalidate(section)
+        return self.queue.submit(super()._sendAdmin, p, wantResponse=wantResponse, onResponse=onResponse, adminIndex=adminIndex)
+
+    def onAckNak(self, p):
+        # Node.onAckNak prints, which would land on the curses screen or in an export on stdout
+        reason = p["decoded"]["routing"]["errorReason"]
+        if reason != "NONE":
+            logging.warning(f"{self.node_id} refused an admin message: {reason}")
+            self.iface._acknowledgment.receivedNak = True
+        else:
+            self.iface._acknowledgment.receivedAck = True
+
+    @property
+    def node_id(self):
+        return f"!{self.nodeNum:08x}"
+
+    def request(self, p, timeout=None):
+        """
+        Send an admin request and wait for the node's answer.
+        :return: The AdminMessage it answered with, or None on a NAK or timeout
+        """
+        answered = threading.Event()
+        answer = []
+
+        def on_response(packet):
+            admin = packet.get("decoded", {}).get("admin")
+            if admin is not None:
+                self.session_key_at = time.monotonic()  # Every admin answer carries a new session key
+                answer.append(admin["raw"])
+                answered.set()
+            else:
+                routing = packet.get("decoded", {}).get("routing", {})
+                logging.warning(f"{self.node_id} refused {p.WhichOneof('payload_variant')}: {routing.get('errorReason')}")
+                answered.set()
+
+        count_message(p)
+        self._sendAdmin(p, wantResponse=True, onResponse=on_response)
+        if not answered.wait(remote_request_timeout_secs if timeout is None else timeout):
+            logging.warning(f"No answer from {self.node_id} to {p.WhichOneof('payload_variant')}")
+            return None
+        return answer[0] if answer else None
+
+    def ensureSessionKey(self, renew=False):
+        """
+        Get a session key if there is none, it is about to expire, or renew is set.
+        Node.ensureSessionKey prints and blocks on the interface's shared ACK flag; this asks the way the other requests do.
+        """
+        if (
+            renew
+            or self.iface._getOrCreateByNum(self.nodeNum).get("adminSessionPassKey") is None
+            or self.session_key_at is None
+            or time.monotonic() - self.session_key_at > session_key_max_age_secs
+        ):
+            self.request(admin_pb2.AdminMessage(get_config_request=admin_pb2.AdminMessage.SESSIONKEY_CONFIG))
+
+    def fetch_section(self, section):
+        """Request one section from the node and store it on this Node. Returns the data to cache, or None."""
+        operation = {"user": "getOwner", "channels": "getChannels"}.get(section) or ("getConfig" if section.startswith("config.") else "getModuleConfig")
+        with timed(operation, self, section.split(".", 1)[-1] if "." in section else None):
+            return self._fetch_section(section)
+
+    def _fetch_section(self, section):
+        if section == "user":
+            raw = self.request(admin_pb2.AdminMessage(get_owner_request=True))
+            if raw is None or not raw.HasField("get_owner_response"):
+                return None
+            self.set_user(raw.get_owner_response)
+            return _encode(raw.get_owner_response)
+
+        if section == "channels":
+            channels = []
+            for index in range(channel_slots):
+                raw = self.request(admin_pb2.AdminMessage(get_channel_request=index + 1))
+                if raw is None or not raw.HasField("get_channel_response"):
+                    return None
+                channels.append(raw.get_channel_response)
+            self.channels = channels
+            return [_encode(channel) for channel in channels]
+
+        key, name = section.split(".", 1)
+        p = admin_pb2.AdminMessage()
+        if key == "config":
+            p.get_config_request = admin_pb2.AdminMessage.ConfigType.Value(name.replace("_", "").upper() + "_CONFIG")
+        else:
+            p.get_module_config_request = self.moduleConfig.DESCRIPTOR.fields_by_name[name].index
+        raw = self.request(p)
+        if raw is None:
+            return None
+        response = raw.get_config_response if key == "config" else raw.get_module_config_response
+        if response.WhichOneof("payload_variant") != name:
+            return None
+        target = self.localConfig if key == "config" else self.moduleConfig
+        getattr(target, name).CopyFrom(getattr(response, name))
+        return _encode(getattr(target, name))
+
+    def load_cached(self, section, data):
+        """Put a cached section on this Node."""
+        if section == "user":
+            self.set_user(_decode(mesh_pb2.User(), data))
+        elif section == "channels":
+            self.channels = [_decode(channel_pb2.Channel(), channel) for channel in data]
+        else:
+            key, name = section.split(".", 1)
+            target = self.localConfig if key == "config" else self.moduleConfig
+            _decode(getattr(target, name), data)
+
+    def set_user(self, user):
+        """Store the node's owner where getMyUser() looks for it, in the shape the mesh node DB uses."""
+        info = self.iface._getOrCreateByNum(self.nodeNum)
+        info["user"] = {**(info.get("user") or {}), **MessageToDict(user), "id": self.node_id}
+
+
+class RemoteInterface:
+    """
+    The radio connection seen from a remote node: localNode and getNode('^local') are the RemoteNode,
+    everything else is the connection's own.
+    """
+
+    def __init__(self, interface, node_num, interval=None):
+        self.connection = interface
+        node_id = f"!{node_num:08x}"
+        self.localNode = RemoteNode(interface, node_num, RemoteCache(node_id), interval)
+        self.myInfo = mesh_pb2.MyNodeInfo(my_node_num=node_num)
+        self.metadata = None  # Only known for the node we're plugged into
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def getNode(self, nodeId, requestChannels=True, requestChannelAttempts=3, timeout=300):
+        if nodeId == "^local" or nodeId in (self.localNode.nodeNum, self.localNode.node_id):
+            return self.localNode
+        return self.connection.getNode(nodeId, requestChannels, requestChannelAttempts, timeout)
+
+    def getMyNodeInfo(self):
+        return self.connection._getOrCreateByNum(self.localNode.nodeNum)
+
+    def getMyUser(self):
+        return self.getMyNodeInfo().get("user")
+
+    def getLongName(self):
+        return (self.getMyUser() or {}).get("longName")
+
+    def getShortName(self):
+        return (self.getMyUser() or {}).get("shortName")
+
+    def close(self):
+        self.connection.close()
+
+
+def resolve_destination(interface, dest):
+    """
+    Turn --dest into a node number: a node id (!a1b2c3d4 or 0x...), a long or short name from the node DB,
+    or the number of a node in the node DB. Default short names are four hex digits, so a bare number only
+    counts when no node has it as its name.
+    :raises ValueError: If nothing matches
+    """
+    if dest.startswith("!") or dest.lower().startswith("0x"):
+        return to_node_num(dest)
+    nodes = interface.nodesByNum or {}
+    matches = [
+        num for num, info in nodes.items()
+        if dest in ((info.get("user") or {}).get("longName"), (info.get("user") or {}).get("shortName"))
+    ]
+    if len(matches) > 1:
+        raise ValueError(f"more than one node is called '{dest}'")
+    if matches:
+        return matches[0]
+    numbers = set()
+    for base in (10, 16):
+        try:
+            numbers.add(int(dest, base))
+        except ValueError:
+            pass
+    numbers &= nodes.keys()
+    if len(numbers) == 1:
+        return numbers.pop()
+    raise ValueError(f"no node called '{dest}' in the node DB" if not numbers else f"'{dest}' is more than one node's number, use its !id")
+
+
+def remote_sections():
+    """Everything the menu can show, in the order it is fetched: what the menu opens on first, first."""
+    return ["user", "channels"] + [f"config.{name}" for name in config_sections] + [f"module_config.{name}" for name in module_sections]
+
+
+def fetch_remote_config(interface, progress=None, refresh=False):
+    """
+    Fill the RemoteInterface's node from the cache, and from the node for sections that aren't cached.
+    :param progress: LoadProgress to record each section in as it lands
+    :param refresh: Ignore the cache and fetch everything
+    :return: The sections that couldn't be fetched
+    """
+    node = interface.localNode
+    node.ensureSessionKey()
+    missing = []
+    for section in remote_sections():
+        data = None if refresh else node.cache.get(section)
+        if data is not None:
+            node.load_cached(section, data)
+        else:
+            data = node.fetch_section(section)
+            if data is None:
+                missing.append(section)
+                continue
+            node.cache.put(section, data)
+        if progress is not None:
+            progress.sections.add(section)
+    if node.channels is None:
+        node.channels = []
+    if progress is not None:
+        progress.complete = not missing
+    return missing
+
+
+def open_remote(interface, dest, interval=None):
+    """Wrap a connection to administer the node dest over the mesh. Fetches nothing yet."""
+    node_num = resolve_destination(interface, dest)
+    if interface.myInfo is not None and node_num == interface.myInfo.my_node_num:
+        raise ValueError(f"{dest} is the node this connection is plugged into")
+    return RemoteInterface(interface, node_num, interval)
+
+
+class RemoteConnection:
+    """Fetches a remote node's config on a worker thread, with the surface of loader.BackgroundConnection."""
+
+    def __init__(self, interface, dest, interval=None):
+        self.interface = open_remote(interface, dest, interval)
+        self.label = f"remote {self.interface.localNode.node_id}"
+        self.progress = LoadProgress()
+        self.progress.interface = self.interface
+        self.missing = []
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="remote-fetch", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.missing = fetch_remote_config(self.interface, self.progress)
+            if self.missing:
+                logging.warning(f"Could not fetch {', '.join(self.missing)} from {self.interface.localNode.node_id}")
+        except (Exception, SystemExit) as ex:  # meshtastic calls sys.exit() on some failures
+            logging.error(f"Fetching the remote config failed: {ex}")
+        finally:
+            self.done.set()
+
+    def usable_interface(self):
+        return self.interface if self.progress.has("user") else None
+
+
+def initialize_remote(interface, args):
+    """For the headless commands: administer --dest instead of the connected node, with its whole config fetched."""
+    if interface is None or not getattr(args, "dest", None):
+        return interface
+    try:
+        remote = open_remote(interface, args.dest, args.admin_interval)
+    except ValueError as ex:
+        logging.critical(f"Can't administer {args.dest}: {ex}")
+        interface.close()
+        return None
+    missing = fetch_remote_config(remote)
+    if missing:
+        logging.critical(f"Could not fetch {', '.join(missing)} from {args.dest}")
+        interface.close()
+        return None
+    return remote
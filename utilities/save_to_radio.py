@@ -1,159 +1,340 @@
-from meshtastic.protobuf import channel_pb2
-from google.protobuf.message import Message
+from meshtastic.node import Node
+from meshtastic.protobuf import admin_pb2, channel_pb2
 import logging
-import base64
+import random
+import threading
 import time
 
-def save_changes(interface, menu_path, modified_settings):
+from utilities.changeset import ChangeSet, format_path, owner_keys, position_keys, read_field
+from utilities.timing import count_message, count_retry, record_ack, timed
+
+ack_timeout_secs = 8      # How long one admin message waits for its ACK before it is sent again
+write_attempts = 4        # Sends per admin message, the first one included
+backoff_base_secs = 0.5   # Pause before the first retry; doubles with each retry, up to backoff_max_secs
+backoff_max_secs = 8.0
+
+# NAK reasons that can go away by themselves; any other NAK fails the write at once
+retryable_naks = {"NO_ROUTE", "GOT_NAK", "TIMEOUT", "NO_INTERFACE", "MAX_RETRANSMIT", "NO_RESPONSE", "DUTY_CYCLE_LIMIT", "RATE_LIMIT_EXCEEDED"}
+
+
+def new_pending_changes():
+    """Create an empty changeset that collects staged edits until they are applied."""
+    return ChangeSet()
+
+
+def has_pending_changes(pending):
+    return bool(pending.writes())
+
+
+def pending_writes(pending):
+    """The staged writes in the order they are sent, as (label, kind, key)."""
+    labels = {
+        "owner": lambda key: "User settings",
+        "section": lambda key: f"Config: {key}",
+        "channel": lambda key: f"Channel {key + 1}",
+        "position": lambda key: "Fixed position",  # Sent last so a position section write can't clear the flag it sets
+    }
+    return [(labels[kind](key), kind, key) for kind, key in pending.writes()]
+
+
+def describe_pending_changes(pending):
+    """Return one human-readable line per staged write."""
+    return [label for label, _, _ in pending_writes(pending)]
+
+
+def describe_conflicts(conflicts):
+    """One line per conflict from ChangeSet.conflicts()."""
+    return [f"{format_path(path)}: staged {staged!r}, now {current!r}" for path, staged, current in conflicts]
+
+
+def stage_edit(interface, pending, path, value):
     """
-    Save changes to the device based on modified settings.
+    Apply one edit to the in-memory node config and record it in the changeset as a draft.
     :param interface: Meshtastic interface instance
-    :param menu_path: Current menu path
-    :param modified_settings: Dictionary of modified settings
+    :param pending: Changeset from new_pending_changes()
+    :param path: Field path of the setting, as described in utilities/changeset.py
+    :param value: New value
+    :return: The recorded step, or None if nothing changed or the value couldn't be set
     """
+    values = {path: value}
     try:
-        if not modified_settings:
-            logging.info("No changes to save. modified_settings is empty.")
-            return
-        
-        node = interface.getNode('^local')
-        admin_key_backup = None
-        if 'admin_key' in modified_settings:
-            # Get reference to security config
-            security_config = node.localConfig.security
-            admin_keys = modified_settings['admin_key']
-
-            # Filter out empty keys
-            valid_keys = [key for key in admin_keys if key and key.strip() and key != b'']
-
-            if not valid_keys:
+        if path == ("config", "security", "admin_key"):
+            value = [key for key in value if key and key.strip()]  # Filter out empty keys
+            if not value:
                 logging.warning("No valid admin keys provided. Skipping admin key update.")
-            else:
-                # Clear existing keys if needed
-                if security_config.admin_key:
-                    logging.info("Clearing existing admin keys...")
-                    del security_config.admin_key[:]
-                    node.writeConfig("security")
-                    time.sleep(2)  # Give time for device to process
-
-                # Append new keys
-                for key in valid_keys:
-                    logging.info(f"Adding admin key: {key}")
-                    security_config.admin_key.append(key)
-                node.writeConfig("security")
-                logging.info("Admin keys updated successfully!")
-            
-            # Backup 'admin_key' before removing it
-            admin_key_backup = modified_settings.get('admin_key', None)
-            # Remove 'admin_key' from modified_settings to prevent interference
-            del modified_settings['admin_key']
-
-            # Return early if there are no other settings left to process
-            if not modified_settings:
-                return
-
-        if menu_path[1] ==  "Radio Settings" or menu_path[1] == "Module Settings":
-            config_category = menu_path[2].lower() # for radio and module configs
-
-            if {'latitude', 'longitude', 'altitude'} & modified_settings.keys():
-                lat = float(modified_settings.get('latitude', 0.0))
-                lon = float(modified_settings.get('longitude', 0.0))
-                alt = int(modified_settings.get('altitude', 0))
-
-                interface.localNode.setFixedPosition(lat, lon, alt)
-                logging.info(f"Updated {config_category} with Latitude: {lat} and Longitude {lon} and Altitude {alt}")
-                return
-
-        elif menu_path[1] == "User Settings":  # for user configs
-            config_category = "User Settings"
-            long_name = modified_settings.get("longName")
-            short_name = modified_settings.get("shortName")
-            is_licensed = modified_settings.get("isLicensed")
-            is_licensed = is_licensed == "True" or is_licensed is True  # Normalize boolean
-
-            node.setOwner(long_name, short_name, is_licensed)
-
-            logging.info(f"Updated {config_category} with Long Name: {long_name}, Short Name: {short_name}, Licensed Mode: {is_licensed}")
-
-            return
-        
-        elif menu_path[1] == "Channels":    # for channel configs
-            config_category = "Channels"
-
-            try:
-                channel = menu_path[-1]
-                channel_num = int(channel.split()[-1]) - 1
-            except (IndexError, ValueError) as e:
-                channel_num = None
-
-            channel = node.channels[channel_num]
-            for key, value in modified_settings.items():
-                if key == 'psk':  # Special case: decode Base64 for psk
-                    channel.settings.psk = base64.b64decode(value)
-                elif key == 'position_precision':  # Special case: module_settings
-                    channel.settings.module_settings.position_precision = value
-                else:
-                    setattr(channel.settings, key, value)  # Use setattr for other fields
-
-            if channel_num == 0:
-                channel.role = channel_pb2.Channel.Role.PRIMARY
-            else:
-                channel.role = channel_pb2.Channel.Role.SECONDARY
-
-            node.writeChannel(channel_num)
-
-            logging.info(f"Updated Channel {channel_num} in {config_category}")
-            logging.info(node.channels)
-            return
+                return None
+            values[path] = value
+        elif path[0] == "position":
+            values[path] = int(value) if path[1] == "altitude" else float(value)
+        elif path[0] == "channel" and path[2] != "role":  # Editing a channel enables it
+            channel_num = path[1]
+            values[("channel", channel_num, "role")] = channel_pb2.Channel.Role.PRIMARY if channel_num == 0 else channel_pb2.Channel.Role.SECONDARY
+
+        step = pending.record(interface, values)
+    except Exception as e:
+        logging.error(f"Failed to stage {format_path(path)}: {e}")
+        return None
+    if step:
+        logging.info(f"Staged {', '.join(f'{format_path(change.path)} = {change.new!r}' for change in step)}")
+    return step
+
+
+def discard_pending_changes(interface, pending):
+    """Restore the in-memory config to what it was before anything was staged."""
+    pending.discard(interface)
+    logging.info("Discarded staged changes")
+
 
+class _MessageCapture:
+    """Stands in for a Node so that meshtastic's own Node methods build an admin message without sending it."""
+
+    def __init__(self, node):
+        self.node = node
+        self.messages = []
+
+    def __getattr__(self, name):
+        method = getattr(Node, name, None)
+        if callable(method):
+            return method.__get__(self)  # So the writes a method makes through self, like setURL's writeChannel, are captured too
+        return getattr(self.node, name)
+
+    def ensureSessionKey(self):
+        pass  # apply_pending_changes gets the key once, before the transaction
+
+    def _sendAdmin(self, p, *args, **kwargs):
+        self.messages.append(p)
+
+
+def library_messages(node, method, *args):
+    """The AdminMessages meshtastic's Node.<method>(*args) would send, built by that method."""
+    capture = _MessageCapture(node)
+    getattr(Node, method)(capture, *args)
+    return capture.messages
+
+
+def library_message(node, method, *args):
+    return library_messages(node, method, *args)[-1]
+
+
+def admin_message(node, kind, value=None):
+    """Build the AdminMessage for one write with the matching meshtastic Node method."""
+    if kind == "begin":
+        return library_message(node, "beginSettingsTransaction")
+    if kind == "commit":
+        return library_message(node, "commitSettingsTransaction")
+    if kind == "channel":
+        return library_message(node, "writeChannel", value)
+    if kind == "owner":
+        long_name, short_name, is_licensed = value
+        # setOwner exits on blank names and prints when it shortens one, so hand it neither
+        long_name = long_name.strip() if long_name and long_name.strip() else None
+        short_name = short_name.strip()[:4] if short_name and short_name.strip() else None
+        return library_message(node, "setOwner", long_name, short_name, is_licensed)
+    if kind == "position":
+        lat, lon, alt = value
+        return library_message(node, "setFixedPosition", float(lat), float(lon), int(alt))
+    if kind == "section":
+        # Node.writeConfig only knows the sections of its day and exits on newer ones like statusmessage
+        p = admin_pb2.AdminMessage()
+        if value in p.set_config.DESCRIPTOR.fields_by_name:
+            getattr(p.set_config, value).CopyFrom(getattr(node.localConfig, value))
         else:
-            config_category = None
-
-        for config_item, new_value in modified_settings.items():
-            # Check if the category exists in localConfig
-            if hasattr(node.localConfig, config_category):
-                config_subcategory = getattr(node.localConfig, config_category)
-            # Check if the category exists in moduleConfig
-            elif hasattr(node.moduleConfig, config_category):
-                config_subcategory = getattr(node.moduleConfig, config_category)
-            else:
-                logging.warning(f"Config category '{config_category}' not found in config.")
-                continue
-
-            # Check if the config_item exists in the subcategory
-            if hasattr(config_subcategory, config_item):
-                field = getattr(config_subcategory, config_item)
-
-                try:
-                    if isinstance(field, (int, float, str, bool)):  # Direct field types
-                        setattr(config_subcategory, config_item, new_value)
-                        logging.info(f"Updated {config_category}.{config_item} to {new_value}")
-                    elif isinstance(field, Message):  # Handle protobuf sub-messages
-                        if isinstance(new_value, dict):  # If new_value is a dictionary
-                            for sub_field, sub_value in new_value.items():
-                                if hasattr(field, sub_field):
-                                    setattr(field, sub_field, sub_value)
-                                    logging.info(f"Updated {config_category}.{config_item}.{sub_field} to {sub_value}")
-                                else:
-                                    logging.warning(f"Sub-field '{sub_field}' not found in {config_category}.{config_item}")
-                        else:
-                            logging.warning(f"Invalid value for {config_category}.{config_item}. Expected dict.")
-                    else:
-                        logging.warning(f"Unsupported field type for {config_category}.{config_item}.")
-                except AttributeError as e:
-                    logging.error(f"Failed to update {config_category}.{config_item}: {e}")
-            else:
-                logging.warning(f"Config item '{config_item}' not found in config category '{config_category}'.")
-
-        # Write the configuration changes to the node
-        try:
-            node.writeConfig(config_category)
-            logging.info(f"Changes written to config category: {config_category}")
-
-            if admin_key_backup is not None:
-                modified_settings['admin_key'] = admin_key_backup
-        except Exception as e:
-            logging.error(f"Failed to write configuration for category '{config_category}': {e}")
+            getattr(p.set_module_config, value).CopyFrom(getattr(node.moduleConfig, value))
+        return p
+    raise ValueError(f"Unknown admin write '{kind}'")
+
+
+def retry_delay(retry):
+    """Exponential backoff with jitter, so nodes retrying on a shared channel spread out."""
+    return min(backoff_max_secs, backoff_base_secs * 2 ** (retry - 1)) * random.uniform(0.5, 1.0)
+
+
+def is_remote(node):
+    """Whether node is reached over the mesh rather than being the node the connection is plugged into."""
+    return node is not getattr(node.iface, "localNode", node)
+
+
+def send_with_ack(node, p):
+    """
+    Send one admin message. A remote node has to acknowledge it and it is retried with backoff until it
+    does. The node we're plugged into isn't asked for ACKs on admin messages (meshtastic doesn't either),
+    so for it a message that went out over the link counts as sent.
+    :return: (status, attempts, NAK reason or None), status being "ok", "nak" or "no ack"
+    """
+    variant = p.WhichOneof("payload_variant")
+    if not is_remote(node):
+        count_message(p)
+        node._sendAdmin(p)
+        return "ok", 1, None
+
+    reason = None
+    renewed = False
+    for attempt in range(1, write_attempts + 1):
+        if attempt > 1:
+            count_retry()
+            time.sleep(retry_delay(attempt - 1))
 
+        answered = threading.Event()
+        answer = {}
+
+        # meshtastic only passes plain ACKs to response callbacks with this name
+        def onAckNak(packet, answer=answer, answered=answered):
+            answer.update((packet.get("decoded") or {}).get("routing") or {})
+            answered.set()
+
+        count_message(p)
+        sent_at = time.monotonic()
+        sent = node._sendAdmin(p, onResponse=onAckNak)
+        if not answered.wait(ack_timeout_secs):
+            reason = None
+            if sent is not None:
+                getattr(node.iface, "responseHandlers", {}).pop(sent.id, None)  # Don't let a late ACK fire into the next try
+            logging.warning(f"No ACK for {variant} (attempt {attempt}/{write_attempts})")
+            continue
+
+        reason = answer.get("errorReason", "NONE")
+        record_ack((time.monotonic() - sent_at) * 1000, reason)
+        if reason == "NONE":
+            return "ok", attempt, None
+        logging.warning(f"NAK for {variant}: {reason} (attempt {attempt}/{write_attempts})")
+        if reason == "ADMIN_BAD_SESSION_KEY" and not renewed:
+            renewed = True  # The key ran out since it was fetched; try once more with a new one
+            node.ensureSessionKey(renew=True)
+            continue
+        if reason not in retryable_naks:
+            return "nak", attempt, reason
+    return ("nak" if reason else "no ack"), write_attempts, reason
+
+
+def _send_write(node, label, operation, p, section=None):
+    start = time.monotonic()
+    try:
+        with timed(operation, node, section):
+            status, attempts, reason = send_with_ack(node, p)
     except Exception as e:
-        logging.error(f"Error saving changes: {e}")
\ No newline at end of file
+        logging.error(f"Failed to send {label}: {e}")
+        status, attempts, reason = "error", 1, str(e) or e.__class__.__name__
+    return {"write": label, "status": status, "attempts": attempts, "error": reason, "seconds": time.monotonic() - start}
+
+
+def _write_value(interface, kind, key):
+    """What admin_message() needs for a staged write, read from the in-memory config."""
+    if kind == "owner":
+        long_name, short_name, is_licensed = (read_field(interface, ("owner", name)) for name in owner_keys)
+        return long_name, short_name, is_licensed is True or is_licensed == "True"
+    if kind == "position":
+        return tuple(read_field(interface, ("position", name)) or 0 for name in position_keys)
+    return key
+
+
+def send_transaction(node, writes):
+    """
+    Send admin messages inside one settings transaction, each through send_with_ack(). The commit
+    is sent whenever the begin got through, so the node is never left in an open transaction.
+    :param writes: [(label, operation, AdminMessage, section)], operation and section naming the timing span
+    :return: One result dict per write plus the begin and commit, as described in apply_pending_changes()
+    """
+    try:
+        node.ensureSessionKey()
+    except Exception as e:
+        logging.error(f"Failed to get an admin session key: {e}")
+
+    results = [_send_write(node, "Begin transaction", "beginSettingsTransaction", admin_message(node, "begin"))]
+    if results[0]["status"] != "ok":
+        return results + [{"write": label, "status": "not sent", "attempts": 0, "error": None, "seconds": 0.0} for label, _, _, _ in writes]
+
+    for label, operation, p, section in writes:
+        results.append(_send_write(node, label, operation, p, section))
+    results.append(_send_write(node, "Commit transaction", "commitSettingsTransaction", admin_message(node, "commit")))
+    return results
+
+
+def send_library_call(node, method, *args):
+    """
+    Send what meshtastic's Node.<method>(*args) would, e.g. setURL or reboot, through send_with_ack(),
+    timed as one span named after the method. Stops at the first message that doesn't get through.
+    :return: (status, attempts, NAK reason or None) as from send_with_ack()
+    :raises SystemExit: If the method rejects its arguments, as meshtastic's setURL does with a bad URL
+    """
+    with timed(method, node):
+        node.ensureSessionKey()
+        status, attempts, reason = "ok", 0, None
+        for p in library_messages(node, method, *args):
+            status, attempts, reason = send_with_ack(node, p)
+            if status != "ok":
+                break
+    return status, attempts, reason
+
+
+def apply_pending_changes(interface, pending, kinds=None):
+    """
+    Send every staged change inside a single settings transaction so the node commits and reboots once.
+    Over the mesh, each admin message waits for its ACK and is retried with backoff. Writes that don't get
+    through stay staged.
+    :param interface: Meshtastic interface instance
+    :param pending: Changeset from new_pending_changes()
+    :param kinds: Only send the writes of these kinds, e.g. ("channel",); the others stay staged
+    :return: One result per write plus the transaction's begin and commit, as dicts with write, status,
+        attempts, error and seconds. Status is "ok", "nak", "no ack", "error" or "not sent".
+    """
+    writes = [write for write in pending_writes(pending) if kinds is None or write[1] in kinds]
+    if not writes:
+        logging.info("No pending changes to apply.")
+        return []
+
+    node = interface.getNode('^local')
+    operations = {"owner": "setOwner", "section": "writeConfig", "channel": "writeChannel", "position": "setFixedPosition"}
+    messages = []
+    for label, kind, key in writes:
+        section = key if kind == "section" else f"channel {key}" if kind == "channel" else None
+        messages.append((label, operations[kind], admin_message(node, kind, _write_value(interface, kind, key)), section))
+    results = send_transaction(node, messages)
+
+    # Unstage what the node took; an uncommitted transaction leaves everything staged to retry
+    if results[-1]["status"] == "ok":
+        for (label, kind, key), result in zip(writes, results[1:-1]):
+            if result["status"] == "ok":
+                pending.forget(pending.paths_for(kind, key))
+
+    failed = [result["write"] for result in results if result["status"] != "ok"]
+    if failed:
+        logging.error(f"Staged changes not confirmed by the node: {', '.join(failed)}")
+    else:
+        logging.info(f"Applied {len(writes)} staged change(s) in one transaction")
+    return results
+
+
+def write_results_ok(results):
+    return all(result["status"] == "ok" for result in results)
+
+
+def describe_write_results(results):
+    """One line per write result, e.g. "Config: lora    ok after 3 tries"."""
+    lines = []
+    for result in results:
+        tries = f" after {result['attempts']} tries" if result["attempts"] > 1 else ""
+        if result["status"] == "ok":
+            outcome = f"ok{tries} ({result['seconds']:.1f}s)"
+        elif result["status"] == "nak":
+            outcome = f"refused: {result['error']}{tries}"
+        elif result["status"] == "no ack":
+            outcome = f"no ACK{tries}"
+        elif result["status"] == "error":
+            outcome = f"error: {result['error']}"
+        else:
+            outcome = result["status"]
+        lines.append(f"{result['write']:<22} {outcome}")
+    return lines
+
+
+def save_changes(interface, values):
+    """
+    Stage settings and apply them right away.
+    :param interface: Meshtastic interface instance
+    :param values: {field path: new value}, paths as described in utilities/changeset.py
+    :return: Write results from apply_pending_changes()
+    """
+    pending = new_pending_changes()
+    for path, value in values.items():
+        stage_edit(interface, pending, path, value)
+    return apply_pending_changes(interface, pending)
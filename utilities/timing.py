@@ -0,0 +1,154 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+
+# Timing spans for admin operations. The app's own call sites open a span with timed() around each
+# operation (the staged writes in save_to_radio and the config requests in remote) and report what
+# they send through count_message(), count_retry() and record_ack(). Nothing in meshtastic is
+# patched, so traffic the app doesn't time, like the --watch polls, stays out of the numbers.
+# A span records the admin messages and bytes it sent, how often it was retried, and, for nodes
+# that acknowledge admin messages, how long the last ACK took. Spans are appended as JSON lines to
+# the timing file and kept for the session so the menu can show per-operation percentiles.
+
+session_spans = []  # Every span of this session, oldest first
+timing_file_path = None  # Defaults to timing_file_path from config.json on the first span
+
+_lock = threading.Lock()
+_local = threading.local()  # The span open on this thread, if any
+_next_span_id = 1
+
+
+def current_span():
+    return getattr(_local, "span", None)
+
+
+def count_message(p):
+    """Record an admin message the operation in progress on this thread is about to send."""
+    span = current_span()
+    if span is not None:
+        span["messages"] += 1
+        span["bytes"] += p.ByteSize()
+
+
+def count_retry():
+    """Record that the operation in progress on this thread sent a message again."""
+    span = current_span()
+    if span is not None:
+        span["retries"] += 1
+
+
+def record_ack(latency_ms, reason="NONE"):
+    """Record an ACK or NAK the operation in progress on this thread got, latency_ms after sending."""
+    span = current_span()
+    if span is not None:
+        span["ack_ms"] = round(max(span["ack_ms"] or 0.0, latency_ms), 1)
+        if reason != "NONE":
+            span["nak"] = reason
+
+
+def _emit(span):
+    global timing_file_path
+    if timing_file_path is None:
+        import ui.default_config as config
+        timing_file_path = config.timing_file_path
+    if not timing_file_path:
+        return
+    try:
+        with open(timing_file_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(span) + "\n")
+    except OSError as e:
+        logging.warning(f"Could not write timing span to {timing_file_path}: {e}")
+
+
+@contextlib.contextmanager
+def timed(operation, node, section=None):
+    """
+    Time one admin operation on a node as a span.
+    Inside another span on the same thread, the work counts toward that span instead.
+    """
+    if current_span() is not None:
+        yield current_span()
+        return
+
+    global _next_span_id
+    with _lock:
+        span_id = _next_span_id
+        _next_span_id += 1
+    span = {
+        "id": span_id,
+        "op": operation,
+        "section": section,
+        "node": f"!{node.nodeNum:08x}" if isinstance(node.nodeNum, int) else str(node.nodeNum),
+        "started_at": round(time.time(), 3),
+        "duration_ms": None,
+        "messages": 0,
+        "bytes": 0,
+        "retries": 0,
+        "ack_ms": None,
+        "nak": None,
+        "error": None,
+    }
+    _local.span = span
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:  # meshtastic calls sys.exit() on some failures
+        span["error"] = str(e) or e.__class__.__name__
+        raise
+    finally:
+        span["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _local.span = None
+        with _lock:
+            session_spans.append(span)
+        _emit(span)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil without floats
+    return ordered[int(rank) - 1]
+
+
+def summarize(spans=None):
+    """
+    Per-operation statistics for the session.
+    :return: [(operation, count, p50 ms, p95 ms, ACK p50 ms or None, ACK p95 ms or None, retries, bytes)], slowest p95 first
+    """
+    spans = session_spans if spans is None else spans
+    by_operation = {}
+    for span in spans:
+        by_operation.setdefault(span["op"], []).append(span)
+
+    rows = []
+    for operation, group in by_operation.items():
+        durations = [span["duration_ms"] for span in group]
+        acks = [span["ack_ms"] for span in group if span["ack_ms"] is not None]
+        rows.append((
+            operation,
+            len(group),
+            percentile(durations, 50),
+            percentile(durations, 95),
+            percentile(acks, 50) if acks else None,
+            percentile(acks, 95) if acks else None,
+            sum(span["retries"] for span in group),
+            sum(span["bytes"] for span in group),
+        ))
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def format_summary(rows):
+    """The summarize() table as text lines for a dialog."""
+    if not rows:
+        return ["No admin operations yet this session."]
+
+    def ms(value):
+        return "-" if value is None else f"{value:.0f}"
+
+    lines = [f"{'OPERATION':<25} {'N':>3} {'P50':>6} {'P95':>6} {'ACK50':>6} {'ACK95':>6} {'RETRY':>5} {'BYTES':>6}"]
+    for operation, count, p50, p95, ack50, ack95, retries, sent in rows:
+        lines.append(f"{operation:<25} {count:>3} {ms(p50):>6} {ms(p95):>6} {ms(ack50):>6} {ms(ack95):>6} {retries:>5} {sent:>6}")
+    lines.append("Times in ms. ACKs are only timed for --dest nodes, the only ones asked for them.")
+    return lines
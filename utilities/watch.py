@@ -0,0 +1,229 @@
+import logging
+import queue
+import threading
+
+from google.protobuf.descriptor import FieldDescriptor
+from meshtastic.protobuf import admin_pb2, localonly_pb2, mesh_pb2
+from pubsub import pub
+
+from utilities.changeset import format_path, owner_keys, read_field, write_field
+from utilities.loader import config_sections, module_sections
+from utilities.remote import remote_request_timeout_secs
+
+# Watch mode: keeps the open settings menu in step with changes other clients (the phone app,
+# another admin) make to the node. The node doesn't tell one client what another changed, so
+# the watcher listens to everything that carries the node's config and, if asked to, polls for it:
+#
+#   - admin responses published on meshtastic.receive.admin, e.g. answers to RemoteNode requests
+#   - the config, channel and node info packets the node sends after a reboot, seen before
+#     meshtastic copies them over the in-memory config so the old values can be compared
+#   - its own get_*_request polls, one request at a time, each waiting for its answer; the next
+#     poll starts interval seconds after the last one finished. A --dest node is polled at most
+#     every watch_remote_min_interval_secs, as a poll is dozens of admin packets on the mesh.
+#     The polls go out through _sendAdmin, not the timed calls, so they stay out of the timings.
+#
+# Updates are queued by whichever thread receives them and applied by the menu's thread in
+# apply(), which returns the field paths (see utilities/changeset.py) the node changed.
+
+watch_request_gap_secs = 0.2  # Between the requests of one poll; a --dest node is paced by its AdminQueue instead
+watch_answer_timeout_secs = 10  # How long a poll waits for the local node to answer one request
+watch_remote_min_interval_secs = 600
+
+
+def leaves(message, prefix=()):
+    """Every scalar and repeated field of a message as {relative path: value}, descending into nested messages."""
+    if isinstance(message, dict):
+        return {prefix + (key,): value for key, value in message.items()}
+    values = {}
+    for field in message.DESCRIPTOR.fields:
+        value = getattr(message, field.name)
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            values[prefix + (field.name,)] = list(value)
+        elif field.message_type is not None:
+            values.update(leaves(value, prefix + (field.name,)))
+        else:
+            values[prefix + (field.name,)] = value
+    return values
+
+
+def owner_values(user):
+    """The owner fields of a User message, keyed like changeset paths."""
+    return {name: getattr(user, name) for name in owner_keys}
+
+
+def poll_requests():
+    """One get request for everything the menu shows: owner, channels, config and module config sections."""
+    requests = [admin_pb2.AdminMessage(get_owner_request=True)]
+    requests += [admin_pb2.AdminMessage(get_channel_request=index + 1) for index in range(8)]
+    for name in config_sections:
+        if name != "sessionkey":
+            config_type = admin_pb2.AdminMessage.ConfigType.Value(name.replace("_", "").upper() + "_CONFIG")
+            requests.append(admin_pb2.AdminMessage(get_config_request=config_type))
+    for name in module_sections:
+        index = localonly_pb2.LocalModuleConfig.DESCRIPTOR.fields_by_name[name].index
+        requests.append(admin_pb2.AdminMessage(get_module_config_request=index))
+    return requests
+
+
+def admin_update(admin):
+    """The (section key, reported values) an admin response carries, or None."""
+    variant = admin.WhichOneof("payload_variant")
+    if variant == "get_config_response":
+        name = admin.get_config_response.WhichOneof("payload_variant")
+        if name and name != "sessionkey":
+            return ("config", name), getattr(admin.get_config_response, name)
+    elif variant == "get_module_config_response":
+        name = admin.get_module_config_response.WhichOneof("payload_variant")
+        if name:
+            return ("module_config", name), getattr(admin.get_module_config_response, name)
+    elif variant == "get_channel_response":
+        return ("channel", admin.get_channel_response.index), admin.get_channel_response
+    elif variant == "get_owner_response":
+        return ("owner",), owner_values(admin.get_owner_response)
+    return None
+
+
+class ConfigWatcher:
+    """Collects the node's reports of its own config and applies what changed to the in-memory config."""
+
+    def __init__(self, interface, interval=0):
+        """
+        :param interface: A connected interface, or a RemoteInterface
+        :param interval: Seconds from the end of one poll of the whole config to the next; 0 only listens
+        """
+        self.interface = interface
+        self.connection = getattr(interface, "connection", interface)  # What packets arrive on
+        self.node = interface.localNode
+        self.remote = self.connection is not self.interface
+        if self.remote and 0 < interval < watch_remote_min_interval_secs:
+            logging.warning(f"Polling a --dest node every {watch_remote_min_interval_secs}s instead of every {interval:g}s to spare the mesh")
+            interval = watch_remote_min_interval_secs
+        self.interval = interval
+        self.updates = queue.SimpleQueue()  # (section key, reported, in-memory values before meshtastic overwrote them or None)
+        self._stop = threading.Event()
+
+        pub.subscribe(self.on_admin, "meshtastic.receive.admin")
+        self._hooked = self._hook_from_radio()
+        self._thread = None
+        if interval:
+            self._thread = threading.Thread(target=self._poll, name="config-watch", daemon=True)
+            self._thread.start()
+        logging.info(f"Watching {self.node.nodeNum:08x} for config changes" + (f", polling {interval:g}s after each poll" if interval else ""))
+
+    def stop(self):
+        self._stop.set()
+        pub.unsubscribe(self.on_admin, "meshtastic.receive.admin")
+        if self._hooked:
+            del self.connection._handleFromRadio
+
+    def _current(self, key):
+        """The in-memory values of one section, as leaves()."""
+        if key == ("owner",):
+            return {(name,): read_field(self.interface, ("owner", name)) for name in owner_keys}
+        if key[0] == "channel":
+            return leaves(self.node.channels[key[1]])
+        return leaves(getattr(self.node.localConfig if key[0] == "config" else self.node.moduleConfig, key[1]))
+
+    def report(self, key, reported, before=None):
+        self.updates.put((key, leaves(reported), before))
+
+    def on_admin(self, packet, interface):
+        if interface is not self.connection or packet.get("from") != self.node.nodeNum:
+            return
+        admin = (packet.get("decoded") or {}).get("admin") or {}
+        update = admin_update(admin["raw"]) if "raw" in admin else None
+        if update is not None:
+            self.report(*update)
+
+    def _ask(self, p):
+        """Send one poll request and wait for its answer. Returns whether one came."""
+        answered = threading.Event()
+
+        def on_response(packet):
+            # Real interfaces also publish the answer, mock ones don't; the second copy changes nothing
+            self.on_admin(packet, self.connection)
+            answered.set()
+
+        self.node._sendAdmin(p, wantResponse=True, onResponse=on_response)
+        return answered.wait(remote_request_timeout_secs if self.remote else watch_answer_timeout_secs)
+
+    def _from_radio_update(self, data):
+        from_radio = mesh_pb2.FromRadio.FromString(data)
+        variant = from_radio.WhichOneof("payload_variant")
+        if variant == "config":
+            name = from_radio.config.WhichOneof("payload_variant")
+            return (("config", name), getattr(from_radio.config, name)) if name and name != "sessionkey" else None
+        if variant == "moduleConfig":
+            name = from_radio.moduleConfig.WhichOneof("payload_variant")
+            return (("module_config", name), getattr(from_radio.moduleConfig, name)) if name else None
+        if variant == "channel" and self.node.channels and from_radio.channel.index < len(self.node.channels):
+            return ("channel", from_radio.channel.index), from_radio.channel
+        if variant == "node_info" and from_radio.node_info.num == self.node.nodeNum and from_radio.node_info.HasField("user"):
+            return ("owner",), owner_values(from_radio.node_info.user)
+        return None
+
+    def _hook_from_radio(self):
+        """See config packets before meshtastic copies them over the in-memory config. Not for remote nodes or the mock."""
+        handle = getattr(type(self.connection), "_handleFromRadio", None)
+        if handle is None or self.remote:
+            return False
+
+        def _handleFromRadio(fromRadioBytes):
+            update = before = None
+            try:
+                update = self._from_radio_update(fromRadioBytes)
+                before = self._current(update[0]) if update else None
+            except Exception as ex:  # Never let watching break the reader thread
+                logging.warning(f"Config watch failed to read a packet: {ex}")
+            handle(self.connection, fromRadioBytes)
+            if update is not None:
+                self.report(*update, before=before)
+
+        self.connection._handleFromRadio = _handleFromRadio
+        return True
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            for p in poll_requests():
+                if self._stop.is_set():
+                    return
+                try:
+                    if not self._ask(p):
+                        logging.warning(f"Config watch poll got no answer to {p.WhichOneof('payload_variant')}, trying again in {self.interval:g}s")
+                        break
+                except Exception as ex:
+                    logging.warning(f"Config watch poll failed: {ex}")
+                    break
+                if not self.remote:
+                    self._stop.wait(watch_request_gap_secs)
+
+    def apply(self, pending):
+        """
+        Bring the in-memory config up to date with what the node reported since the last call.
+        Fields with staged edits keep their staged value, and the changeset diffs them against
+        the node's new value from now on.
+        :param pending: The menu's ChangeSet
+        :return: Paths of the fields whose value on the node changed
+        """
+        changed = []
+        while True:
+            try:
+                key, reported, before = self.updates.get_nowait()
+            except queue.Empty:
+                return changed
+            try:
+                previous = before if before is not None else self._current(key)
+                for relative, value in reported.items():
+                    path = key + relative
+                    if path in pending.baseline:
+                        if value != pending.baseline[path]:
+                            pending.rebase(path, value)
+                            changed.append(path)
+                            logging.warning(f"{format_path(path)} changed on the node while an edit to it is staged")
+                        # Keep the staged value, or the node's new one if the edit was undone, over what meshtastic copied in
+                        write_field(self.interface, path, pending.expected()[path])
+                    elif value != previous.get(relative) and (value or previous.get(relative) is not None):
+                        write_field(self.interface, path, value)
+                        changed.append(path)
+            except (AttributeError, IndexError, KeyError, TypeError, ValueError) as ex:
+                logging.warning(f"Couldn't apply the node's {format_path(key)}: {ex}")